@@ -2,16 +2,33 @@
 from __future__ import print_function
 from flask import Flask, jsonify
 from flask_login import LoginManager
-from sqlalchemy.exc import OperationalError
-from backend.init_db import db
+from werkzeug.middleware.proxy_fix import ProxyFix
+import os
+from backend.init_db import db, migrate
 from backend.authentication.models import User
-from backend.authentication.views import create_admin_users
+from backend.commands import register_commands
+from backend.metrics import init_metrics
+from backend.logging_config import init_request_ids
+from backend.profiling import init_profiling
+from backend.ratelimit import init_rate_limits
+from backend.sharding import init_sharding
 
 def create_app(config_class='backend.config.Config'):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    if app.config.get('PROXY_FIX_X_FOR'):
+        proxies = app.config['PROXY_FIX_X_FOR']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
 
+    init_sharding(app)
     db.init_app(app)
+    # Batch mode lets SQLite alter tables by copying them
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(__file__), 'migrations'),
+                     render_as_batch=True)
+    init_request_ids(app)
+    init_rate_limits(app)
+    init_profiling(app)
+    init_metrics(app)
 
     login_manager = LoginManager()
     login_manager.login_view = 'auth.login'
@@ -32,11 +49,9 @@ def create_app(config_class='backend.config.Config'):
     from backend.expense_tracker.routes import expense_tracker_bp as expense_tracker_blueprint
     app.register_blueprint(expense_tracker_blueprint, url_prefix='/expense-tracker')
 
-    with app.app_context():
-        try:
-            db.create_all()
-            create_admin_users()
-        except OperationalError as e:
-            app.logger.error(f"OperationalError during database initialization: {e}")
+    register_commands(app)
 
+    # Schema creation and admin seeding are deliberately not run here, so
+    # booting a worker does no database work; run `flask init-db` and
+    # `flask seed-admins` once per deployment instead.
     return app
@@ -1,6 +1,9 @@
 # backend/authentication/models.py
+from datetime import datetime
 from flask_login import UserMixin
+from sqlalchemy import event
 from backend.app_factory import db
+from backend.sharding import place_user, sharding_enabled
 
 class User(UserMixin, db.Model):
     __tablename__ = 'user'
@@ -11,3 +14,24 @@ class User(UserMixin, db.Model):
     is_admin = db.Column(db.Boolean, default=False)
     otp = db.Column(db.String(6), nullable=True)
     otp_created_at = db.Column(db.DateTime, nullable=True)
+    base_currency = db.Column(db.String(3), nullable=False, default='INR')
+
+# Case-insensitive prefix search on the admin user list is a range scan over
+# these expression indexes (see ``prefix_range``)
+db.Index('ix_user_email_lower', db.func.lower(User.email))
+db.Index('ix_user_name_lower', db.func.lower(User.name))
+
+class UserShard(db.Model):
+    """Which shard holds a user's data (see ``backend.sharding``); no row means ``default``."""
+    __tablename__ = 'user_shards'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    shard = db.Column(db.String(50), nullable=False)
+    # Set while ``move_user`` copies the user's rows; their writes are refused meanwhile
+    moving = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+@event.listens_for(User, 'after_insert')
+def assign_shard(mapper, connection, user):
+    if sharding_enabled():
+        connection.execute(UserShard.__table__.insert().values(user_id=user.id, shard=place_user(user.id),
+                                                               updated_at=datetime.utcnow()))
@@ -1,17 +1,22 @@
 # backend/authentication/routes.py
 import re
-from flask import Blueprint, jsonify, request, session, redirect, url_for, render_template
+import csv
+import io
+from flask import Blueprint, Response, jsonify, request, session, redirect, url_for, render_template, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_user, login_required, logout_user, current_user, AnonymousUserMixin
 from backend.app_factory import db
 from backend.logging_config import setup_logging
 from backend.decorators import admin_required
 from backend.authentication.models import User
-from backend.authentication.views import send_otp_email, generate_otp, verify_otp, save_otp, login_with_google, handle_google_callback
+from backend.authentication.views import send_otp_email, generate_otp, verify_otp, save_otp, login_with_google, handle_google_callback, user_page, user_activity_stats, user_to_dict
 
 
 auth_bp = Blueprint('auth', __name__)
 
+MAX_USER_PAGE = 500
+USER_EXPORT_BATCH = 1000
+
 # Setup logging
 logger = setup_logging()
 
@@ -43,18 +48,18 @@ def signup_post():
         user = User.query.filter_by(email=email).first()
 
         if user:
-            logger.warning(f"Signup attempt with existing email: {email}")
+            logger.warning("Signup attempt with existing email: %s", email)
             return jsonify({'message': 'Email already exists'}), 400
 
         new_user = User(email=email, name=name, password=generate_password_hash(password, method='pbkdf2:sha256'))
         db.session.add(new_user)
         db.session.commit()
 
-        logger.info(f"New user {email} signed up successfully.")
+        logger.info("New user %s signed up successfully.", email)
         return jsonify({'message': 'Signup successful! Please log in.'}), 201
 
     except Exception as e:
-        logger.error(f"Error during signup: {e}")
+        logger.error("Error during signup: %s", e)
         return jsonify({'message': 'An error occurred during signup.'}), 500
 
 @auth_bp.route('/login', methods=['GET'])
@@ -88,21 +93,21 @@ def login_post():
         user = User.query.filter_by(email=email).first()
 
         if not user or not check_password_hash(user.password, password):
-            logger.warning(f"Failed login attempt for email: {email}")
+            logger.warning("Failed login attempt for email: %s", email)
             if request.is_json:
                 return jsonify({'message': 'Please check your login details and try again.'}), 400
             else:
                 return render_template('login.html', error='Invalid email or password.')
 
         login_user(user, remember=remember)
-        logger.info(f"User {email} logged in successfully.")
+        logger.info("User %s logged in successfully.", email)
         if request.is_json:
             return jsonify({'message': 'Login successful!'}), 200
         else:
             return redirect(url_for('auth.profile'))
 
     except Exception as e:
-        logger.error(f"Error during login: {e}")
+        logger.error("Error during login: %s", e)
         if request.is_json:
             return jsonify({'message': 'An error occurred during login.'}), 500
         else:
@@ -141,13 +146,14 @@ def get_user_profile():
         user_profile = {
             'id': user.id,
             'name': user.name,
-            'email': user.email
+            'email': user.email,
+            'base_currency': user.base_currency
         }
-        logger.info(f"User profile fetched successfully for email: {user.email}")
+        logger.info("User profile fetched successfully for email: %s", user.email)
         return jsonify(user_profile), 200
 
     except Exception as e:
-        logger.error(f"Error fetching user profile: {e}")
+        logger.error("Error fetching user profile: %s", e)
         return jsonify({'message': 'An error occurred while fetching user profile.'}), 500
 
 @auth_bp.route('/forgot_password', methods=['POST'])
@@ -259,12 +265,54 @@ def reset_password():
 @login_required
 @admin_required
 def list_users():
+    limit = request.args.get('limit', default=50, type=int)
+    after = request.args.get('after', type=int)
+    prefix = request.args.get('q', '').strip()
+    include_stats = request.args.get('stats', 'false').lower() == 'true'
+
+    if not 1 <= limit <= MAX_USER_PAGE:
+        return jsonify({'message': f'Limit must be between 1 and {MAX_USER_PAGE}.'}), 400
+
     try:
-        users = User.query.all()
-        user_list = [{'id': user.id, 'name': user.name, 'email': user.email} for user in users]
-        logger.info("Admin user listed all users.")
-        return jsonify(user_list), 200
+        users, next_cursor = user_page(limit, after=after, prefix=prefix or None)
+        stats = user_activity_stats([user.id for user in users]) if include_stats else None
+        user_list = [user_to_dict(user, stats) for user in users]
+        logger.info("Admin user listed %d users.", len(user_list))
+        return jsonify({'users': user_list, 'next_cursor': next_cursor}), 200
 
     except Exception as e:
-        logger.error(f"Error listing users: {e}")
+        logger.error("Error listing users: %s", e)
         return jsonify({'message': 'An error occurred while listing users.'}), 500
+
+@auth_bp.route('/admin/users/export', methods=['GET'])
+@login_required
+@admin_required
+def export_users():
+    prefix = request.args.get('q', '').strip() or None
+    include_stats = request.args.get('stats', 'false').lower() == 'true'
+
+    def generate():
+        # One page query (and one stats query) per batch, so no cursor is held
+        # open while the client reads and memory stays at one batch
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        header = ['id', 'name', 'email', 'is_admin']
+        if include_stats:
+            header += ['transactions', 'last_activity', 'storage_bytes']
+        writer.writerow(header)
+        after = None
+        while True:
+            users, after = user_page(USER_EXPORT_BATCH, after=after, prefix=prefix)
+            stats = user_activity_stats([user.id for user in users]) if include_stats else None
+            for user in users:
+                writer.writerow([user_to_dict(user, stats)[column] for column in header])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            db.session.expunge_all()
+            if after is None:
+                break
+
+    logger.info("Admin user exported the user list.")
+    return Response(stream_with_context(generate()), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=users.csv'})
@@ -1,9 +1,7 @@
 # backend/authentication/views.py
 import json
 import random
-import logging
-import requests
-import sib_api_v3_sdk
+from functools import lru_cache
 from flask import current_app, request
 from flask_login import current_user, login_user
 from backend.app_factory import db
@@ -11,9 +9,9 @@ from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy.exc import OperationalError
 from backend.authentication.models import User
-from sib_api_v3_sdk.rest import ApiException
 from backend.logging_config import setup_logging
-from oauthlib.oauth2 import WebApplicationClient
+from backend.metrics import track_outbound
+from backend.sharding import use_shard, users_by_shard
 
 logger = setup_logging()
 
@@ -32,26 +30,36 @@ def load_google_auth_config():
         current_app.logger.error("Error decoding the Google auth configuration file.")
         return None
 
-google_auth_config = load_google_auth_config()
+# The config file, oauthlib and requests are only needed once someone signs
+# in with Google, so they are loaded on first use instead of at import time.
+@lru_cache(maxsize=None)
+def get_google_settings():
+    """Return ``(client_id, client_secret, discovery_url)``, or ``None`` if not configured."""
+    google_auth_config = load_google_auth_config()
+    if not google_auth_config:
+        return None
+    return (google_auth_config['google_client_id'], google_auth_config['google_client_secret'],
+            google_auth_config['google_discovery_url'])
 
-if google_auth_config:
-    GOOGLE_CLIENT_ID = google_auth_config['google_client_id']
-    GOOGLE_CLIENT_SECRET = google_auth_config['google_client_secret']
-    GOOGLE_DISCOVERY_URL = google_auth_config['google_discovery_url']
-else:
-    GOOGLE_CLIENT_ID = None
-    GOOGLE_CLIENT_SECRET = None
-    GOOGLE_DISCOVERY_URL = None
+@lru_cache(maxsize=None)
+def get_google_client():
+    settings = get_google_settings()
+    if not settings:
+        return None
+    from oauthlib.oauth2 import WebApplicationClient
 
-# Create a Google OAuth client
-google_client = WebApplicationClient(GOOGLE_CLIENT_ID) if GOOGLE_CLIENT_ID else None
+    return WebApplicationClient(settings[0])
 
 # Function to get Google's provider configuration
 def get_google_provider_cfg():
-    return requests.get(GOOGLE_DISCOVERY_URL).json()
+    import requests
+
+    with track_outbound('google', 'discovery'):
+        return requests.get(get_google_settings()[2]).json()
 
 # Function to handle Google login
 def login_with_google():
+    google_client = get_google_client()
     if not google_client:
         return None, "Google OAuth client is not configured."
 
@@ -67,8 +75,12 @@ def login_with_google():
 
 # Function to handle Google login callback
 def handle_google_callback():
+    import requests
+
+    google_client = get_google_client()
     if not google_client:
         return None, "Google OAuth client is not configured."
+    client_id, client_secret, _ = get_google_settings()
 
     code = request.args.get("code")
     google_provider_cfg = get_google_provider_cfg()
@@ -80,18 +92,20 @@ def handle_google_callback():
         redirect_url=request.base_url,
         code=code
     )
-    token_response = requests.post(
-        token_url,
-        headers=headers,
-        data=body,
-        auth=(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET),
-    )
+    with track_outbound('google', 'token'):
+        token_response = requests.post(
+            token_url,
+            headers=headers,
+            data=body,
+            auth=(client_id, client_secret),
+        )
 
     google_client.parse_request_body_response(json.dumps(token_response.json()))
 
     userinfo_endpoint = google_provider_cfg["userinfo_endpoint"]
     uri, headers, body = google_client.add_token(userinfo_endpoint)
-    userinfo_response = requests.get(uri, headers=headers, data=body)
+    with track_outbound('google', 'userinfo'):
+        userinfo_response = requests.get(uri, headers=headers, data=body)
     user_info = userinfo_response.json()
 
     if user_info.get("email_verified"):
@@ -119,15 +133,24 @@ def handle_google_callback():
     return user, None
 
 def create_admin_users():
+    """Create the admins listed in ``backend/admin_user.json`` that do not exist yet.
+
+    Existing admins are found with one query, so passwords are only hashed
+    for accounts that are actually created. Returns the number created.
+    """
+    created = 0
     try:
         # Load admin users details from JSON file
         json_path = 'backend/admin_user.json'
         with open(json_path, 'r') as f:
             admin_data = json.load(f)
-        
-        for admin_details in admin_data.get('admins', []):
-            admin_user = User.query.filter_by(name=admin_details['name']).first()
-            if admin_user is None:
+
+        admins = admin_data.get('admins', [])
+        names = [admin_details['name'] for admin_details in admins]
+        existing = {name for (name,) in db.session.query(User.name).filter(User.name.in_(names))}
+
+        for admin_details in admins:
+            if admin_details['name'] not in existing:
                 admin_user = User(
                     name=admin_details['name'],
                     email=admin_details['email'],
@@ -135,9 +158,11 @@ def create_admin_users():
                     is_admin=admin_details['is_admin']
                 )
                 db.session.add(admin_user)
-                logger.info(f"Admin user '{admin_details['name']}' created successfully.")
+                existing.add(admin_details['name'])
+                created += 1
+                logger.info("Admin user '%s' created successfully.", admin_details['name'])
             else:
-                logging.info(f"Admin user '{admin_details['name']}' already exists.")
+                logger.info("Admin user '%s' already exists.", admin_details['name'])
         
         db.session.commit()
     except FileNotFoundError:
@@ -145,7 +170,8 @@ def create_admin_users():
     except json.JSONDecodeError:
         logger.error("Error decoding the admin user JSON file.")
     except OperationalError as e:
-        logger.error(f"OperationalError when creating admin users: {e}")
+        logger.error("OperationalError when creating admin users: %s", e)
+    return created
 
 # Function to load email configuration
 def load_email_config():
@@ -171,6 +197,10 @@ def send_otp_email(user, otp):
     if not email_config:
         return
 
+    # Imported on first send; the Brevo SDK is slow to import
+    import sib_api_v3_sdk
+    from sib_api_v3_sdk.rest import ApiException
+
     try:
         api_key = email_config.get('api_key')
 
@@ -194,13 +224,14 @@ def send_otp_email(user, otp):
             )
 
             try:
-                api_response = api_instance.send_transac_email(send_smtp_email)
-                current_app.logger.info(f"OTP email sent successfully: {api_response}")
+                with track_outbound('brevo', 'send_transac_email'):
+                    api_response = api_instance.send_transac_email(send_smtp_email)
+                current_app.logger.info("OTP email sent successfully: %s", api_response)
             except ApiException as e:
-                current_app.logger.error(f"Exception when calling TransactionalEmailsApi->send_transac_email: {e}")
+                current_app.logger.error("Exception when calling TransactionalEmailsApi->send_transac_email: %s", e)
 
     except Exception as e:
-        current_app.logger.error(f"Failed to send OTP email: {str(e)}")
+        current_app.logger.error("Failed to send OTP email: %s", e)
 
 # Function to save hashed OTP and timestamp in the user's record
 def save_otp(user, otp):
@@ -217,3 +248,67 @@ def verify_otp(user, otp):
         if otp_age <= timedelta(minutes=10):
             return True
     return False
+
+# Rough per-row size used to estimate how much storage a user's transactions take
+TRANSACTION_ROW_BYTES = 64
+
+def prefix_range(prefix):
+    """Return ``(low, high)`` such that ``low <= s < high`` iff ``s`` starts with ``prefix``.
+
+    Unlike ``LIKE 'prefix%'``, a range comparison can always use a plain
+    b-tree index.
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def user_page(limit, after=None, prefix=None):
+    """Return ``(users, next_cursor)`` for one keyset-paginated page of users by id.
+
+    ``prefix`` matches the start of the email or name, case-insensitively.
+    """
+    query = User.query
+    if prefix:
+        low, high = prefix_range(prefix.lower())
+        email, name = db.func.lower(User.email), db.func.lower(User.name)
+        query = query.filter(db.or_(db.and_(email >= low, email < high), db.and_(name >= low, name < high)))
+    if after is not None:
+        query = query.filter(User.id > after)
+    users = query.order_by(User.id).limit(limit + 1).all()
+    return users[:limit], users[limit - 1].id if len(users) > limit else None
+
+def user_activity_stats(user_ids):
+    """Return ``{user_id: stats}`` for the given users from one grouped query per shard.
+
+    Stats are the number of income and expense rows, the latest time one was
+    created, and an estimate of the bytes they occupy. Soft-deleted rows are
+    left out, as they are everywhere the user reads their data.
+    """
+    from backend.expense_tracker.models import Expense, Income
+
+    if not user_ids:
+        return {}
+    stats = {user_id: {'transactions': 0, 'last_activity': None, 'storage_bytes': 0} for user_id in user_ids}
+    for shard, shard_user_ids in users_by_shard(user_ids).items():
+        rows = db.union_all(
+            db.select(Income.user_id, Income.created_at, db.literal(0).label('text_bytes'))
+            .where(Income.user_id.in_(shard_user_ids), Income.deleted_at.is_(None)),
+            db.select(Expense.user_id, Expense.created_at, db.func.length(Expense.description))
+            .where(Expense.user_id.in_(shard_user_ids), Expense.deleted_at.is_(None)),
+        ).subquery()
+        with use_shard(shard):
+            grouped = db.session.execute(
+                db.select(rows.c.user_id, db.func.count(), db.func.max(rows.c.created_at), db.func.sum(rows.c.text_bytes))
+                .group_by(rows.c.user_id)
+            ).all()
+        for user_id, count, last_activity, text_bytes in grouped:
+            stats[user_id] = {
+                'transactions': count,
+                'last_activity': last_activity.isoformat() if last_activity else None,
+                'storage_bytes': count * TRANSACTION_ROW_BYTES + (text_bytes or 0),
+            }
+    return stats
+
+def user_to_dict(user, stats=None):
+    result = {'id': user.id, 'name': user.name, 'email': user.email, 'is_admin': bool(user.is_admin)}
+    if stats is not None:
+        result.update(stats.get(user.id, {}))
+    return result
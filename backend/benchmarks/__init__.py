@@ -0,0 +1,33 @@
+# backend/benchmarks/__init__.py
+import os
+import tempfile
+from backend.config import Config
+
+
+def benchmark_app(database_path=None, shards=0):
+    """Create an app bound to a throwaway SQLite file for benchmarking.
+
+    With ``shards``, that many extra SQLite files are created next to it and
+    configured as ``SHARDS``.
+    """
+    from backend.app_factory import create_app
+
+    if database_path is None:
+        database_path = os.path.join(tempfile.mkdtemp(prefix='budgetbee-bench-'), 'bench.db')
+
+    class BenchmarkConfig(Config):
+        DATABASE_PATH = database_path
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{database_path}'
+        # Benchmarks log in and sign up far faster than any real client
+        RATELIMIT_ENABLED = False
+        SHARDS = {f'shard{i}': f'sqlite:///{os.path.splitext(database_path)[0]}-shard{i}.db'
+                  for i in range(1, shards + 1)}
+
+    app = create_app(BenchmarkConfig)
+    with app.app_context():
+        from backend.init_db import db
+        from backend.sharding import create_shard_schemas
+
+        db.create_all()
+        create_shard_schemas()
+    return app
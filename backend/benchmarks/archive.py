@@ -0,0 +1,107 @@
+# backend/benchmarks/archive.py
+"""Benchmark cold archival of closed years.
+
+Seeds users with expenses spread over several years, then times a month read
+from the live tables, the archive run, and the same kind of month read from
+an archived year. Also reports the size of the Parquet files next to the
+SQLite file the rows came from.
+
+    python -m backend.benchmarks.archive --users 50 --years 5 --per-month 200
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import date
+from sqlalchemy import insert
+from backend.benchmarks import benchmark_app
+from backend.init_db import db
+
+CATEGORIES = ['Food', 'Travel', 'Shopping', 'Bills', 'Health']
+
+
+def seed(users, years, per_month, today):
+    from backend.authentication.models import User
+    from backend.expense_tracker.models import Category, Expense
+
+    rng = random.Random(42)
+    db.session.execute(insert(User), [
+        {'id': u, 'name': f'user{u}', 'email': f'user{u}@bench.local', 'password': 'x'} for u in range(1, users + 1)
+    ])
+    db.session.execute(insert(Category), [
+        {'id': (u - 1) * len(CATEGORIES) + i + 1, 'name': name, 'user_id': u}
+        for u in range(1, users + 1) for i, name in enumerate(CATEGORIES)
+    ])
+    for u in range(1, users + 1):
+        rows = []
+        for year in range(today.year - years + 1, today.year + 1):
+            for month in range(1, 13):
+                rows.extend({'description': f'purchase {rng.randrange(1000)}', 'amount': round(rng.uniform(1, 500), 2),
+                             'currency': 'INR', 'date': date(year, month, rng.randint(1, 28)),
+                             'category_id': (u - 1) * len(CATEGORIES) + rng.randrange(len(CATEGORIES)) + 1,
+                             'user_id': u}
+                            for _ in range(per_month))
+        db.session.execute(insert(Expense), rows)
+        db.session.commit()
+
+
+def time_month_reads(user_ids, year, repeat):
+    from backend.expense_tracker.archive import period_rows
+    from backend.expense_tracker.models import Expense
+
+    start, end = date(year, 6, 1), date(year, 7, 1)
+    timings = []
+    for _ in range(repeat):
+        for user_id in user_ids:
+            started = time.perf_counter()
+            rows = list(period_rows(Expense, user_id, start, end,
+                                    Expense.in_period(user_id, start, end).order_by(Expense.date)))
+            timings.append((time.perf_counter() - started) * 1000)
+            db.session.expunge_all()
+    return statistics.median(timings), len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--years', type=int, default=5, help='Years of history per user, counting the current one.')
+    parser.add_argument('--per-month', type=int, default=200, help='Expenses per user per month.')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from backend.expense_tracker.archive import archive_closed_years
+    from backend.expense_tracker.models import Expense
+
+    today = date.today()
+    app = benchmark_app()
+    app.config['ARCHIVE_DIR'] = os.path.join(os.path.dirname(app.config['DATABASE_PATH']), 'archive')
+    with app.app_context():
+        started = time.perf_counter()
+        seed(args.users, args.years, args.per_month, today)
+        print(f"seeded {Expense.query.count()} expenses in {time.perf_counter() - started:.2f}s")
+
+        user_ids = range(1, args.users + 1)
+        old_year = today.year - args.years + 1
+        median, rows = time_month_reads(user_ids, old_year, args.repeat)
+        print(f"live month read ({old_year}): {median:.2f} ms median, {rows} rows")
+
+        started = time.perf_counter()
+        stats = archive_closed_years(today=today)
+        elapsed = time.perf_counter() - started
+        print(f"archived {stats['expenses']} expenses in {stats['years']} user-years in {elapsed:.2f}s "
+              f"({stats['expenses'] / elapsed:,.0f} rows/s); {Expense.query.count()} rows left live")
+
+        median, rows = time_month_reads(user_ids, old_year, args.repeat)
+        print(f"archived month read ({old_year}): {median:.2f} ms median, {rows} rows")
+        median, rows = time_month_reads(user_ids, today.year, args.repeat)
+        print(f"live month read ({today.year}): {median:.2f} ms median, {rows} rows")
+
+        archive_bytes = sum(os.path.getsize(os.path.join(root, name))
+                            for root, _, names in os.walk(app.config['ARCHIVE_DIR']) for name in names)
+        print(f"archive: {archive_bytes / 1e6:.1f} MB of Parquet; "
+              f"database file: {os.path.getsize(app.config['DATABASE_PATH']) / 1e6:.1f} MB before VACUUM")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# backend/benchmarks/categories.py
+"""Benchmark category merges and renames for users with many transactions.
+
+Seeds users with expenses and income spread over several years and six
+categories each, then times listing a user's categories with their counts,
+renaming one, and merging two of them into a third, one user at a time.
+
+    python -m backend.benchmarks.categories --users 5 --transactions 100000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from sqlalchemy import insert
+from backend.benchmarks import benchmark_app
+from backend.init_db import db
+
+CATEGORIES = ['Food', 'Travel', 'Shopping', 'Bills', 'Health', 'Entertainment']
+
+
+def seed(users, transactions, chunk_size=20000):
+    from backend.authentication.models import User
+    from backend.expense_tracker.models import Category, Expense, Income
+
+    rng = random.Random(42)
+    db.session.execute(insert(User), [
+        {'id': u, 'name': f'user{u}', 'email': f'user{u}@bench.local', 'password': 'x'} for u in range(1, users + 1)
+    ])
+    db.session.execute(insert(Category), [
+        {'id': (u - 1) * len(CATEGORIES) + i + 1, 'name': name, 'user_id': u}
+        for u in range(1, users + 1) for i, name in enumerate(CATEGORIES)
+    ])
+    for u in range(1, users + 1):
+        expenses, income = [], []
+        for _ in range(transactions):
+            row = {'amount': round(rng.uniform(1, 500), 2), 'currency': 'INR',
+                   'date': date(2022, 1, 1) + timedelta(days=rng.randrange(1460)),
+                   'category_id': (u - 1) * len(CATEGORIES) + rng.randrange(len(CATEGORIES)) + 1, 'user_id': u}
+            if rng.random() < 0.1:
+                income.append(row)
+            else:
+                expenses.append({'description': f'purchase {rng.randrange(1000)}', **row})
+        for start in range(0, len(expenses), chunk_size):
+            db.session.execute(insert(Expense), expenses[start:start + chunk_size])
+        for start in range(0, len(income), chunk_size):
+            db.session.execute(insert(Income), income[start:start + chunk_size])
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--transactions', type=int, default=100000, help='Income and expense rows per user.')
+    args = parser.parse_args()
+
+    from backend.expense_tracker.budgets import rebuild_spending_totals
+    from backend.expense_tracker.categories import list_categories, merge_categories, rename_category
+    from backend.expense_tracker.models import Category
+    from backend.expense_tracker.search import rebuild_search_index
+
+    app = benchmark_app()
+    with app.app_context():
+        started = time.perf_counter()
+        seed(args.users, args.transactions)
+        rebuild_spending_totals()
+        rebuild_search_index()
+        print(f"seeded {args.users} users x {args.transactions} transactions in {time.perf_counter() - started:.2f}s")
+
+        timings = {'list': [], 'list with counts': [], 'rename': [], 'merge': []}
+        moved = []
+        for u in range(1, args.users + 1):
+            first = (u - 1) * len(CATEGORIES) + 1
+            for key, stats in (('list', False), ('list with counts', True)):
+                started = time.perf_counter()
+                list_categories(u, stats)
+                timings[key].append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            rename_category(db.session.get(Category, first + 1), 'Trips')
+            db.session.commit()
+            timings['rename'].append((time.perf_counter() - started) * 1000)
+
+            # Shopping and Entertainment into Food
+            started = time.perf_counter()
+            counts, _ = merge_categories(u, [first + 2, first + 5], first)
+            db.session.commit()
+            timings['merge'].append((time.perf_counter() - started) * 1000)
+            moved.append(counts['income'] + counts['expenses'])
+
+        for key, values in timings.items():
+            print(f"{key}: {statistics.median(values):.1f} ms median")
+        print(f"merge moved {statistics.median(moved):,.0f} rows per user "
+              f"({statistics.median(moved) / statistics.median(timings['merge']):,.0f} rows/ms)")
+
+
+if __name__ == '__main__':
+    main()
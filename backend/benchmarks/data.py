@@ -0,0 +1,152 @@
+# backend/benchmarks/data.py
+"""Synthetic data generator for benchmarks.
+
+Creates users with a salary, occasional freelance and interest income, a
+monthly rent and a stream of day-to-day expenses whose categories and amounts
+follow skewed (log-normal) distributions, plus a couple of budgets and a
+recurring rent rule each. Everything is written with bulk Core inserts and
+is reproducible for a given seed.
+
+    python -m backend.benchmarks.data --users 1000 --months 12 --database /tmp/bench.db
+"""
+import argparse
+import calendar
+import math
+import random
+import time
+from datetime import date
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from backend.init_db import db
+
+PASSWORD = 'benchpass1!'
+
+INCOME_CATEGORIES = ['Salary', 'Freelance', 'Interest']
+# name: (share of transactions, median amount, log-normal sigma, merchants)
+EXPENSE_CATEGORIES = {
+    'Food': (0.36, 300, 0.7, ['Swiggy', 'Zomato', 'BigBasket', 'Cafe Coffee Day', 'Dominos', 'local market']),
+    'Transport': (0.20, 150, 0.6, ['Uber', 'Ola', 'metro card', 'fuel', 'parking']),
+    'Shopping': (0.15, 1200, 1.0, ['Amazon', 'Flipkart', 'Myntra', 'Decathlon', 'IKEA']),
+    'Entertainment': (0.10, 500, 0.8, ['Netflix', 'PVR cinema', 'Spotify', 'concert tickets', 'BookMyShow']),
+    'Utilities': (0.08, 1500, 0.4, ['electricity bill', 'internet', 'mobile recharge', 'water bill', 'gas cylinder']),
+    'Health': (0.07, 800, 0.9, ['pharmacy', 'Apollo clinic', 'gym membership', 'lab tests']),
+    'Travel': (0.04, 5000, 1.0, ['IndiGo flight', 'hotel booking', 'IRCTC train', 'MakeMyTrip']),
+}
+RENT_CATEGORY = 'Rent'
+CATEGORY_NAMES = INCOME_CATEGORIES + list(EXPENSE_CATEGORIES) + [RENT_CATEGORY]
+EXPENSE_WEIGHTS = [share for share, _, _, _ in EXPENSE_CATEGORIES.values()]
+
+
+def _add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _lognormal(rng, median, sigma):
+    return round(rng.lognormvariate(math.log(median), sigma), 2)
+
+
+def category_id(user_id, name):
+    """Return the id the generator gives ``user_id``'s category ``name``."""
+    return (user_id - 1) * len(CATEGORY_NAMES) + CATEGORY_NAMES.index(name) + 1
+
+
+def _user_rows(user_id, months, rng):
+    """Return ``(income_rows, expense_rows)`` for one user over ``months``."""
+    salary = round(rng.lognormvariate(math.log(60000), 0.5), -2)
+    activity = min(max(rng.lognormvariate(math.log(40), 0.5), 5), 200)
+    income, expenses = [], []
+    for start in months:
+        days = calendar.monthrange(start.year, start.month)[1]
+        income.append({'amount': salary, 'date': start, 'category_id': category_id(user_id, 'Salary'), 'user_id': user_id})
+        if rng.random() < 0.3:
+            income.append({'amount': _lognormal(rng, 15000, 0.8), 'date': start.replace(day=rng.randint(1, days)),
+                           'category_id': category_id(user_id, 'Freelance'), 'user_id': user_id})
+        if start.month % 3 == 0:
+            income.append({'amount': round(salary * 0.01, 2), 'date': start.replace(day=days),
+                           'category_id': category_id(user_id, 'Interest'), 'user_id': user_id})
+
+        expenses.append({'description': 'Monthly rent', 'amount': round(salary * 0.3, -2), 'date': start.replace(day=5),
+                         'category_id': category_id(user_id, RENT_CATEGORY), 'user_id': user_id})
+        count = max(1, int(rng.gauss(activity, activity ** 0.5)))
+        for name in rng.choices(list(EXPENSE_CATEGORIES), EXPENSE_WEIGHTS, k=count):
+            _, median, sigma, merchants = EXPENSE_CATEGORIES[name]
+            expenses.append({'description': rng.choice(merchants), 'amount': _lognormal(rng, median, sigma),
+                             'date': start.replace(day=rng.randint(1, days)),
+                             'category_id': category_id(user_id, name), 'user_id': user_id})
+    return income, expenses
+
+
+def generate(users, months=12, seed=42, chunk_size=500):
+    """Insert ``users`` synthetic users with ``months`` of history ending this month.
+
+    User 1 is an admin. Every user's password is ``PASSWORD``; it is hashed
+    once and shared so seeding is not dominated by pbkdf2. Returns row counts.
+    """
+    from backend.authentication.models import User
+    from backend.expense_tracker.budgets import rebuild_spending_totals
+    from backend.expense_tracker.models import Budget, Category, Expense, Income, RecurringRule
+
+    rng = random.Random(seed)
+    this_month = date.today().replace(day=1)
+    periods = [_add_months(this_month, offset) for offset in range(-(months - 1), 1)]
+    password = generate_password_hash(PASSWORD, method='pbkdf2:sha256')
+    counts = {'users': users, 'income': 0, 'expenses': 0}
+
+    for offset in range(0, users, chunk_size):
+        ids = range(offset + 1, min(offset + chunk_size, users) + 1)
+        db.session.execute(insert(User), [
+            {'id': i, 'name': f'user{i}', 'email': f'user{i}@bench.local', 'password': password, 'is_admin': i == 1}
+            for i in ids
+        ])
+        db.session.execute(insert(Category), [
+            {'id': category_id(i, name), 'name': name, 'user_id': i} for i in ids for name in CATEGORY_NAMES
+        ])
+
+        income, expenses = [], []
+        for i in ids:
+            user_income, user_expenses = _user_rows(i, periods, rng)
+            income.extend(user_income)
+            expenses.extend(user_expenses)
+        db.session.execute(Income.__table__.insert(), income)
+        db.session.execute(Expense.__table__.insert(), expenses)
+        counts['income'] += len(income)
+        counts['expenses'] += len(expenses)
+
+        db.session.execute(insert(Budget), [
+            {'user_id': i, 'category_id': category_id(i, name), 'limit_amount': limit, 'alert_threshold': 80}
+            for i in ids for name, limit in (('Food', 12000.0), ('Shopping', 8000.0))
+        ])
+        next_month = _add_months(this_month, 1)
+        db.session.execute(insert(RecurringRule), [
+            {'kind': 'expense', 'amount': 20000.0, 'currency': 'INR', 'description': 'Monthly rent', 'frequency': 'monthly',
+             'interval': 1, 'start_date': next_month, 'next_index': 0, 'next_run': next_month, 'active': True,
+             'category_id': category_id(i, RENT_CATEGORY), 'user_id': i}
+            for i in ids
+        ])
+        db.session.commit()
+
+    rebuild_spending_totals()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', default=None, help='SQLite file to use (default: temporary file).')
+    args = parser.parse_args()
+
+    from backend.benchmarks import benchmark_app
+
+    app = benchmark_app(args.database)
+    with app.app_context():
+        started = time.perf_counter()
+        counts = generate(args.users, args.months, args.seed)
+        print(f"generated {counts['users']} users, {counts['income']} income and {counts['expenses']} expense rows "
+              f"in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
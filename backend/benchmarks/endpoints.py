@@ -0,0 +1,364 @@
+# backend/benchmarks/endpoints.py
+"""Benchmark every auth and expense-tracker endpoint through the Flask test client.
+
+For each data size a fresh SQLite database is filled by the synthetic data
+generator, then each endpoint is called ``--repeat`` times (after one warm-up
+call) to record median/p95 latency and throughput, plus one call under
+tracemalloc to record peak Python memory. Results are compared against a
+stored baseline so regressions stand out.
+
+    python -m backend.benchmarks.endpoints --sizes 10,100 --repeat 20
+    python -m backend.benchmarks.endpoints --save-baseline
+
+Outbound email is replaced with a no-op (its latency is tracked separately
+by the ``budgetbee_outbound_duration_seconds`` metric), and the Google OAuth
+endpoints are skipped because they only redirect to Google.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import date
+from unittest import mock
+from backend.benchmarks import benchmark_app
+from backend.benchmarks.data import PASSWORD, _add_months, category_id, generate
+from backend.init_db import db
+from backend.logging_config import setup_logging
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+SKIPPED = ['GET /login/google', 'GET /login/google/callback']
+
+ADMIN_ID = 1
+USER_ID = 2
+# Users 3 and up are handed out to scenarios that log out or delete accounts
+
+# Operations per call in the batch scenario, to compare with that many single PUTs
+BATCH_SIZE = 20
+
+
+class Scenario:
+    """One endpoint call; ``path`` and ``body`` may be callables of ``(i, ctx)``."""
+
+    def __init__(self, name, method, path, body=None, client='user', setup=None, expect=(200,)):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.client = client
+        self.setup = setup
+        self.expect = expect
+
+    def request(self, i, ctx):
+        path = self.path(i, ctx) if callable(self.path) else self.path
+        body = self.body(i, ctx) if callable(self.body) else self.body
+        return path, body
+
+
+def _login(app, user_id):
+    client = app.test_client()
+    response = client.post('/login', json={'email': f'user{user_id}@bench.local', 'password': PASSWORD})
+    assert response.status_code == 200, response.json
+    return client
+
+
+def _logged_in_clients(app, ctx, calls):
+    # Spare users are handed out in order so each scenario gets its own
+    first = ctx['next_spare']
+    ctx['next_spare'] += calls
+    ctx['clients'] = [_login(app, user_id) for user_id in range(first, first + calls)]
+
+
+def _otp_sessions(app, ctx, calls):
+    clients = []
+    for _ in range(calls):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['otp_verified_user_id'] = USER_ID + 1
+        clients.append(client)
+    ctx['clients'] = clients
+
+
+def _spare_rows(model, per_call=1, **values):
+    def setup(app, ctx, calls):
+        with app.app_context():
+            rows = [model(user_id=USER_ID, date=date.today(), **values) for _ in range(calls * per_call)]
+            db.session.add_all(rows)
+            db.session.commit()
+            ctx['ids'] = [row.id for row in rows]
+    return setup
+
+
+def _spare_owned(kind):
+    def setup(app, ctx, calls):
+        client = ctx['user']
+        ids = []
+        for i in range(calls):
+            if kind == 'recurring':
+                response = client.post('/expense-tracker/recurring', json={
+                    'type': 'expense', 'amount': 100, 'category': 'Utilities', 'start_date': '2030-01-01'})
+            else:
+                response = client.post('/expense-tracker/budgets', json={'category': f'Spare {i}', 'limit': 100})
+            ids.append(response.json['id'])
+        ctx['ids'] = ids
+    return setup
+
+
+def _current_revision(app, ctx, calls):
+    from backend.expense_tracker.sync import current_revision
+
+    with app.app_context():
+        ctx['revision'] = current_revision(USER_ID)
+
+
+def scenarios():
+    today = date.today()
+    month = today.strftime('%Y-%m')
+    salary_category = category_id(USER_ID, 'Salary')
+    from backend.expense_tracker.models import Expense, Income
+
+    return [
+        # Authentication
+        Scenario('GET /login', 'GET', '/login', client='anon'),
+        Scenario('POST /signup', 'POST', '/signup', client='anon', expect=(201,),
+                 body=lambda i, ctx: {'email': f'new{i}@bench.local', 'name': 'New user', 'password': PASSWORD}),
+        Scenario('POST /login', 'POST', '/login', client='anon',
+                 body={'email': f'user{USER_ID}@bench.local', 'password': PASSWORD}),
+        Scenario('POST /login (bad password)', 'POST', '/login', client='anon', expect=(400,),
+                 body={'email': f'user{USER_ID}@bench.local', 'password': 'wrong'}),
+        Scenario('GET /user_profile', 'GET', '/user_profile'),
+        Scenario('GET /profile', 'GET', '/profile'),
+        Scenario('GET /admin/users', 'GET', '/admin/users', client='admin'),
+        Scenario('POST /forgot_password', 'POST', '/forgot_password', client='anon',
+                 body={'email': f'user{USER_ID + 1}@bench.local'}),
+        Scenario('POST /verify_otp', 'POST', '/verify_otp', client='anon', expect=(400,),
+                 body={'email': f'user{USER_ID + 1}@bench.local', 'otp': '000000'}),
+        Scenario('POST /reset_password', 'POST', '/reset_password', client='per-call', setup=_otp_sessions,
+                 body=lambda i, ctx: {'new_password': f'{PASSWORD}{i}', 'confirm_password': f'{PASSWORD}{i}'}),
+        Scenario('GET /logout', 'GET', '/logout', client='per-call', setup=_logged_in_clients, expect=(302,)),
+        Scenario('GET /metrics', 'GET', '/metrics', client='anon'),
+
+        # Income
+        Scenario('POST /income', 'POST', '/expense-tracker/income', expect=(201,),
+                 body={'amount': 1000, 'category': 'Salary', 'date': today.isoformat()}),
+        Scenario('GET /monthly-income', 'GET', f'/expense-tracker/monthly-income?month={month}'),
+        Scenario('PUT /income/<id>', 'PUT', lambda i, ctx: f"/expense-tracker/income/{ctx['ids'][i]}",
+                 setup=_spare_rows(Income, amount=10.0, category_id=salary_category),
+                 body=lambda i, ctx: {'amount': 20 + i, 'category': 'Salary', 'date': today.isoformat()}),
+        Scenario('DELETE /income/<id>', 'DELETE', lambda i, ctx: f"/expense-tracker/income/{ctx['ids'][i]}",
+                 setup=_spare_rows(Income, amount=10.0, category_id=salary_category)),
+
+        # Expenses
+        Scenario('POST /expense', 'POST', '/expense-tracker/expense', expect=(201,),
+                 body={'description': 'Swiggy', 'amount': 250, 'category': 'Food', 'date': today.isoformat()}),
+        Scenario('GET /monthly-expenses', 'GET', f'/expense-tracker/monthly-expenses?month={month}'),
+        Scenario('GET /search', 'GET', '/expense-tracker/search?q=swiggy'),
+        Scenario('GET /search (prefix)', 'GET', '/expense-tracker/search?q=fl'),
+        Scenario('PUT /expense/<id>', 'PUT', lambda i, ctx: f"/expense-tracker/expense/{ctx['ids'][i]}",
+                 setup=_spare_rows(Expense, amount=10.0, description='Spare', category_id=category_id(USER_ID, 'Food')),
+                 body=lambda i, ctx: {'description': 'Zomato', 'amount': 20 + i, 'category': 'Food',
+                                      'date': today.isoformat()}),
+        Scenario('DELETE /expense/<id>', 'DELETE', lambda i, ctx: f"/expense-tracker/expense/{ctx['ids'][i]}",
+                 setup=_spare_rows(Expense, amount=10.0, description='Spare', category_id=category_id(USER_ID, 'Food'))),
+        Scenario(f'POST /batch ({BATCH_SIZE} updates)', 'POST', '/expense-tracker/batch',
+                 setup=_spare_rows(Expense, per_call=BATCH_SIZE, amount=10.0, description='Spare',
+                                   category_id=category_id(USER_ID, 'Food')),
+                 body=lambda i, ctx: {'operations': [
+                     {'op': 'update', 'type': 'expense', 'id': row_id,
+                      'data': {'description': 'Zomato', 'amount': 20 + i, 'category': 'Food', 'date': today.isoformat()}}
+                     for row_id in ctx['ids'][i * BATCH_SIZE:(i + 1) * BATCH_SIZE]]}),
+        Scenario('GET /balance', 'GET', f'/expense-tracker/balance?month={month}'),
+        Scenario('GET /sync', 'GET', '/expense-tracker/sync?since=0'),
+        Scenario('GET /sync (caught up)', 'GET', lambda i, ctx: f"/expense-tracker/sync?since={ctx['revision']}",
+                 setup=_current_revision),
+
+        # Recurring rules, budgets, settings
+        Scenario('POST /recurring', 'POST', '/expense-tracker/recurring', expect=(201,),
+                 body={'type': 'income', 'amount': 500, 'category': 'Interest', 'start_date': '2030-01-01'}),
+        Scenario('GET /recurring', 'GET', '/expense-tracker/recurring'),
+        Scenario('DELETE /recurring/<id>', 'DELETE', lambda i, ctx: f"/expense-tracker/recurring/{ctx['ids'][i]}",
+                 setup=_spare_owned('recurring')),
+        Scenario('POST /budgets', 'POST', '/expense-tracker/budgets', body={'category': 'Travel', 'limit': 20000}),
+        Scenario('GET /budgets', 'GET', f'/expense-tracker/budgets?month={month}'),
+        Scenario('DELETE /budgets/<id>', 'DELETE', lambda i, ctx: f"/expense-tracker/budgets/{ctx['ids'][i]}",
+                 setup=_spare_owned('budgets')),
+        Scenario('GET /categories', 'GET', '/expense-tracker/categories'),
+        Scenario('GET /categories (stats)', 'GET', '/expense-tracker/categories?stats=true'),
+        Scenario('POST /categories', 'POST', '/expense-tracker/categories', expect=(201,),
+                 body=lambda i, ctx: {'name': f'Category {i}'}),
+        Scenario('PUT /base-currency', 'PUT', '/expense-tracker/base-currency', body={'currency': 'INR'}),
+        Scenario('POST /feedback', 'POST', '/expense-tracker/feedback', expect=(201,), body={'message': 'Great app'}),
+        Scenario('GET /export-monthly', 'GET', f'/expense-tracker/export-monthly?month={month}'),
+        Scenario('GET /export-yearly', 'GET', f'/expense-tracker/export-yearly?year={today.year}'),
+
+        # Destructive calls run last; once every generated month has been
+        # reset the remaining calls report 404 for an empty month
+        Scenario('POST /reset_income', 'POST', '/expense-tracker/reset_income', expect=(200, 404),
+                 body=lambda i, ctx: {'month': f"{ctx['months'][i % len(ctx['months'])]:%Y-%m}"}),
+        Scenario('POST /reset_expenses', 'POST', '/expense-tracker/reset_expenses', expect=(200, 404),
+                 body=lambda i, ctx: {'month': f"{ctx['months'][i % len(ctx['months'])]:%Y-%m}"}),
+        Scenario('POST /reset_expenses/undo', 'POST', '/expense-tracker/reset_expenses/undo', expect=(200, 404),
+                 body=lambda i, ctx: {'month': f"{ctx['months'][i % len(ctx['months'])]:%Y-%m}"}),
+        Scenario('DELETE /delete_account', 'DELETE', '/expense-tracker/delete_account', client='per-call',
+                 setup=_logged_in_clients),
+    ]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_scenario(app, scenario, ctx, repeat):
+    # Call 0 warms up, calls 1..repeat are timed, the last one is traced
+    calls = repeat + 2
+    if scenario.setup:
+        scenario.setup(app, ctx, calls)
+
+    def call(i):
+        client = ctx['clients'][i] if scenario.client == 'per-call' else ctx[scenario.client]
+        path, body = scenario.request(i, ctx)
+        started = time.perf_counter()
+        response = client.open(path, method=scenario.method, json=body)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        return elapsed, response.status_code in scenario.expect
+
+    call(0)
+    timings, errors = [], 0
+    for i in range(1, repeat + 1):
+        elapsed, ok = call(i)
+        timings.append(elapsed * 1000)
+        errors += not ok
+
+    tracemalloc.start()
+    try:
+        call(repeat + 1)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(_percentile(timings, 0.95), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'rps': round(len(timings) / (sum(timings) / 1000), 1),
+        'peak_kb': round(peak / 1024, 1),
+        'errors': errors,
+    }
+
+
+def run_size(users, months, repeat, selected=None):
+    # Spare users for per-call scenarios come after the two working accounts
+    spare = 2 * (repeat + 2)
+    app = benchmark_app()
+    with app.app_context():
+        started = time.perf_counter()
+        counts = generate(users + spare, months)
+        print(f"\n{users} users (+{spare} spare): {counts['income']} income, {counts['expenses']} expense rows, "
+              f"generated in {time.perf_counter() - started:.1f}s")
+
+    this_month = date.today().replace(day=1)
+    ctx = {
+        'anon': app.test_client(),
+        'user': _login(app, USER_ID),
+        'admin': _login(app, ADMIN_ID),
+        'next_spare': users + 1,
+        'months': [_add_months(this_month, -offset) for offset in range(months)],
+    }
+    results = {}
+    for scenario in scenarios():
+        if selected and scenario.name not in selected:
+            continue
+        results[scenario.name] = result = run_scenario(app, scenario, ctx, repeat)
+        print(f"  {scenario.name:<32} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+              f"{result['rps']:>8.1f} req/s  peak {result['peak_kb']:>9.1f} KiB"
+              + (f"  {result['errors']} unexpected statuses" if result['errors'] else ''))
+    return results
+
+
+def compare(results, baseline, tolerance, min_ms=0.5, min_kb=64):
+    """Return regressions of ``results`` against ``baseline`` as printable lines.
+
+    Latency and memory count as regressed when they grow by more than
+    ``tolerance`` and by more than a small absolute noise floor.
+    """
+    regressions = []
+    for size, scenarios_ in results.items():
+        for name, result in scenarios_.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            for key, floor in (('p50_ms', min_ms), ('p95_ms', min_ms), ('peak_kb', min_kb)):
+                old, new = base[key], result[key]
+                if new > old * (1 + tolerance) and new - old > floor:
+                    regressions.append(f'{size} users, {name}: {key} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)'
+                                       if old else f'{size} users, {name}: {key} {old} -> {new}')
+            if result['errors'] > base['errors']:
+                regressions.append(f"{size} users, {name}: unexpected statuses {base['errors']} -> {result['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,100', help='Comma-separated user counts to benchmark.')
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', action='append', help='Run only the named scenario (repeatable).')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='Overwrite the baseline with these results.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown (default 25%%).')
+    parser.add_argument('--output', help='Also write the results to this JSON file.')
+    args = parser.parse_args()
+
+    # Per-request log lines (including slow-request warnings) would drown the report
+    setup_logging().setLevel(logging.ERROR)
+
+    results = {}
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch('backend.authentication.routes.send_otp_email'))
+        stack.enter_context(mock.patch('backend.expense_tracker.routes.send_feedback_email'))
+        for size in (int(s) for s in args.sizes.split(',')):
+            results[str(size)] = run_size(size, args.months, args.repeat, args.only)
+    print(f"\nskipped: {', '.join(SKIPPED)}")
+
+    report = {
+        'meta': {'python': platform.python_version(), 'machine': platform.machine(), 'months': args.months,
+                 'repeat': args.repeat},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'baseline written to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'no baseline at {args.baseline}; run with --save-baseline to create one')
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('meta', {}).get('months') != args.months or baseline.get('meta', {}).get('repeat') != args.repeat:
+        print('warning: baseline was recorded with different --months/--repeat settings')
+    regressions = compare(results, baseline.get('results', {}), args.tolerance)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) against {args.baseline}:')
+        for line in regressions:
+            print(f'  {line}')
+        return 1
+    print(f'\nno regressions against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# backend/benchmarks/forecast.py
+"""Benchmark cash-flow forecasts computed in batch.
+
+Seeds users with a few expenses a day over the forecast history window and a
+monthly salary rule each, then times forecasting every user in batches, one
+user at a time for a sample, and a cached hit.
+
+    python -m backend.benchmarks.forecast --users 10000 --batch-size 1000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from sqlalchemy import insert
+from backend.benchmarks import benchmark_app
+from backend.init_db import db
+
+
+def seed(users, days, per_day, today, chunk_size=500):
+    from backend.authentication.models import User
+    from backend.expense_tracker.models import Category, RecurringRule, Expense
+
+    rng = random.Random(42)
+    start = today - timedelta(days=days - 1)
+    for offset in range(0, users, chunk_size):
+        ids = range(offset + 1, min(offset + chunk_size, users) + 1)
+        db.session.execute(insert(User), [
+            {'id': u, 'name': f'user{u}', 'email': f'user{u}@bench.local', 'password': 'x'} for u in ids
+        ])
+        db.session.execute(insert(Category), [
+            {'id': 2 * u - 1 + k, 'name': name, 'user_id': u} for u in ids for k, name in enumerate(('Food', 'Salary'))
+        ])
+        db.session.execute(insert(RecurringRule), [
+            {'kind': 'income', 'amount': 50000.0, 'frequency': 'monthly', 'interval': 1, 'start_date': today.replace(day=1),
+             'next_index': 1, 'next_run': (today.replace(day=1) + timedelta(days=32)).replace(day=1), 'active': True,
+             'category_id': 2 * u, 'user_id': u}
+            for u in ids
+        ])
+        db.session.execute(insert(Expense), [
+            {'description': 'purchase', 'amount': round(rng.uniform(1, 300), 2), 'currency': 'INR',
+             'date': start + timedelta(days=day), 'category_id': 2 * u - 1, 'user_id': u}
+            for u in ids for day in range(days) for _ in range(rng.randint(0, 2 * per_day))
+        ])
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--per-day', type=int, default=1, help='Average expenses per user per day.')
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--sample', type=int, default=200, help='Users forecast one at a time for comparison.')
+    args = parser.parse_args()
+
+    from backend.authentication.models import User
+    from backend.expense_tracker.forecast import forecast_users, iter_forecasts, user_forecast
+    from backend.expense_tracker.models import Expense
+
+    today = date.today()
+    app = benchmark_app()
+    with app.app_context():
+        started = time.perf_counter()
+        seed(args.users, 7 * app.config['FORECAST_WEEKS'], args.per_day, today)
+        print(f"seeded {args.users} users, {Expense.query.count()} expenses in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        count = sum(1 for _ in iter_forecasts(today=today, months=args.months, batch_size=args.batch_size))
+        elapsed = time.perf_counter() - started
+        print(f"batch: {count} users in {elapsed:.2f}s ({count / elapsed:,.0f} users/s, batches of {args.batch_size})")
+
+        timings = []
+        for user_id in range(1, args.sample + 1):
+            started = time.perf_counter()
+            forecast_users([(user_id, 'INR')], today, args.months)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"one at a time: {statistics.median(timings):.2f} ms median per user "
+              f"({1000 / statistics.median(timings):,.0f} users/s)")
+
+        user = db.session.get(User, 1)
+        user_forecast(user, args.months)
+        timings = []
+        for _ in range(args.sample):
+            started = time.perf_counter()
+            user_forecast(user, args.months)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"cached: {statistics.median(timings):.3f} ms median (includes the revision lookup)")
+
+
+if __name__ == '__main__':
+    main()
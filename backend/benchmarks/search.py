@@ -0,0 +1,78 @@
+# backend/benchmarks/search.py
+"""Benchmark full-text expense search latency for a user with many expenses.
+
+    python -m backend.benchmarks.search --expenses 100000 --users 5
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from sqlalchemy import insert
+from backend.benchmarks import benchmark_app
+from backend.init_db import db
+
+WORDS = ['amazon', 'uber', 'coffee', 'grocery', 'rent', 'netflix', 'pharmacy', 'fuel', 'dinner', 'books',
+         'electricity', 'internet', 'gym', 'flight', 'hotel', 'taxi', 'market', 'pizza', 'shoes', 'gift']
+SYLLABLES = ['ka', 'lo', 'mi', 'ten', 'ra', 'zu', 'pe', 'vor', 'sa', 'ni', 'bel', 'do', 'qua', 'fi', 'gro', 'hu']
+# A long tail of merchant-like words behind the common ones, sampled with
+# Zipf-like weights so term frequencies resemble real descriptions.
+VOCABULARY = WORDS + sorted({a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES})
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+CATEGORIES = ['Food', 'Travel', 'Shopping', 'Bills', 'Health', 'Entertainment']
+QUERIES = ['amazon', 'amaz', 'coffee dinner', 'foo', 'elec', 'netflix gift', 'tr']
+
+
+def seed(users, expenses_per_user, chunk_size=20000):
+    from backend.authentication.models import User
+    from backend.expense_tracker.models import Category, Expense
+
+    rng = random.Random(42)
+    db.session.execute(insert(User), [
+        {'id': u, 'name': f'user{u}', 'email': f'user{u}@bench.local', 'password': 'x'} for u in range(1, users + 1)
+    ])
+    db.session.execute(insert(Category), [
+        {'id': (u - 1) * len(CATEGORIES) + i + 1, 'name': name, 'user_id': u}
+        for u in range(1, users + 1) for i, name in enumerate(CATEGORIES)
+    ])
+    rows = []
+    for u in range(1, users + 1):
+        for _ in range(expenses_per_user):
+            rows.append({'description': ' '.join(rng.choices(VOCABULARY, WEIGHTS, k=3)), 'amount': round(rng.uniform(1, 500), 2),
+                         'date': date(2020, 1, 1) + timedelta(days=rng.randrange(1800)),
+                         'category_id': (u - 1) * len(CATEGORIES) + rng.randrange(len(CATEGORIES)) + 1, 'user_id': u})
+            if len(rows) >= chunk_size:
+                db.session.execute(Expense.__table__.insert(), rows)
+                rows = []
+    if rows:
+        db.session.execute(Expense.__table__.insert(), rows)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--expenses', type=int, default=100000, help='Expenses per user.')
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    from backend.expense_tracker.search import search_expenses
+
+    app = benchmark_app()
+    with app.app_context():
+        started = time.perf_counter()
+        seed(args.users, args.expenses)
+        print(f"seeded {args.users * args.expenses} expenses in {time.perf_counter() - started:.2f}s")
+
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                results, _ = search_expenses(1, query, page=1, per_page=20)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{query!r:>16}: median {statistics.median(timings):.2f} ms, "
+                  f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.2f} ms, {len(results)} results")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# backend/benchmarks/sharding.py
+"""Benchmark write throughput with and without sharding.
+
+Several writer processes each add expenses for their own users, one row per
+commit, as concurrent API requests would. With a single SQLite file every
+commit waits on the same writer lock; with ``--shards N`` the users are spread
+over N more files and their writes stop contending. Each layout is seeded in
+its own temporary directory.
+
+    python -m backend.benchmarks.sharding --workers 8 --shards 0 3 7
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import date
+from sqlalchemy import insert
+from backend.benchmarks import benchmark_app
+from backend.init_db import db
+
+
+def seed(users):
+    from backend.authentication.models import User, UserShard
+    from backend.expense_tracker.models import Category
+    from backend.sharding import place_user, sharding_enabled, use_shard
+
+    ids = range(1, users + 1)
+    db.session.execute(insert(User), [
+        {'id': i, 'name': f'user{i}', 'email': f'user{i}@bench.local', 'password': 'x'} for i in ids
+    ])
+    placement = {i: place_user(i) for i in ids}
+    if sharding_enabled():
+        db.session.execute(insert(UserShard), [{'user_id': i, 'shard': shard} for i, shard in placement.items()])
+    db.session.commit()
+    for shard in set(placement.values()):
+        with use_shard(shard):
+            db.session.execute(insert(Category), [
+                {'id': i, 'name': 'Food', 'user_id': i} for i, placed in placement.items() if placed == shard
+            ])
+            db.session.commit()
+
+
+def write(database_path, shards, user_ids, writes):
+    from backend.expense_tracker.models import Expense
+    from backend.sharding import shard_for, use_shard
+
+    app = benchmark_app(database_path, shards)
+    with app.app_context():
+        placement = {user_id: shard_for(user_id) for user_id in user_ids}
+        for n in range(writes):
+            for user_id in user_ids:
+                with use_shard(placement[user_id]):
+                    db.session.add(Expense(description=f'coffee {n}', amount=3.5, date=date.today(),
+                                           currency='INR', category_id=user_id, user_id=user_id))
+                    db.session.commit()
+
+
+def run(shards, workers, users, writes):
+    database_path = os.path.join(tempfile.mkdtemp(prefix='budgetbee-bench-'), 'bench.db')
+    app = benchmark_app(database_path, shards)
+    with app.app_context():
+        seed(users)
+
+    ids = list(range(1, users + 1))
+    processes = [multiprocessing.Process(target=write, args=(database_path, shards, ids[i::workers], writes))
+                 for i in range(workers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    if any(process.exitcode for process in processes):
+        raise SystemExit(f'a writer failed with {shards} shards')
+    return users * writes / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent writer processes.')
+    parser.add_argument('--users', type=int, default=64)
+    parser.add_argument('--writes', type=int, default=50, help='Expenses written per user.')
+    parser.add_argument('--shards', type=int, nargs='+', default=[0, 3, 7],
+                        help='Shard counts to compare, besides the default database.')
+    args = parser.parse_args()
+
+    for shards in args.shards:
+        rate = run(shards, args.workers, args.users, args.writes)
+        print(f"{shards + 1} database(s), {args.workers} writers: {rate:,.0f} commits/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# backend/benchmarks/startup.py
+"""Benchmark worker startup: importing the app factory and calling create_app.
+
+Each run happens in a fresh interpreter so nothing is already imported or
+cached. The median of ``--runs`` runs is compared with ``--budget-ms``, and
+the modules that are meant to load lazily must still be absent once the app
+is created. Exits non-zero if either check fails.
+
+    python -m backend.benchmarks.startup --runs 10 --budget-ms 600
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Optional dependencies that should only load when first used
+LAZY_MODULES = ['requests', 'sib_api_v3_sdk', 'oauthlib', 'openpyxl', 'pyarrow', 'numpy']
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from backend.app_factory import create_app
+imported = time.perf_counter()
+create_app()
+created = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'loaded': [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def measure():
+    """Run one cold start in a subprocess and return its timings."""
+    output = subprocess.run([sys.executable, '-c', PROBE], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=600,
+                        help='Maximum median import + create_app time (default 600 ms).')
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    import_ms = statistics.median(run['import_ms'] for run in runs)
+    create_ms = statistics.median(run['create_app_ms'] for run in runs)
+    total_ms = statistics.median(run['import_ms'] + run['create_app_ms'] for run in runs)
+    print(f'import {import_ms:.1f} ms, create_app {create_ms:.1f} ms, total {total_ms:.1f} ms '
+          f'(median of {args.runs}, budget {args.budget_ms:.0f} ms)')
+
+    failed = False
+    loaded = sorted({name for run in runs for name in run['loaded']})
+    if loaded:
+        print(f"eagerly imported: {', '.join(loaded)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f'startup exceeds budget by {total_ms - args.budget_ms:.1f} ms')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# backend/commands.py
+from datetime import datetime
+import click
+
+# Migration matching the schema create_all() built before migrations existed
+BASELINE_REVISION = '0001'
+
+def register_commands(app):
+    """Attach the project's ``flask`` CLI commands to ``app``."""
+
+    @app.cli.command('init-db')
+    @click.option('--dry-run', is_flag=True, help='Run pending migrations in a rolled-back transaction and report the rows they would touch.')
+    def init_db(dry_run):
+        """Bring every shard's schema up to date by running pending migrations."""
+        from flask_migrate import stamp, upgrade
+        from sqlalchemy import inspect
+        from backend.init_db import db
+        from backend.sharding import DEFAULT_SHARD, shard_names
+
+        tables = inspect(db.engine).get_table_names()
+        if 'user' in tables and 'alembic_version' not in tables:
+            # Built by create_all() before migrations existed: adopt it as the baseline
+            if dry_run:
+                click.echo(f"Existing schema would be stamped as revision {BASELINE_REVISION}; "
+                           "run without --dry-run to adopt it.")
+                return
+            stamp(revision=BASELINE_REVISION)
+            click.echo(f"Stamped existing schema as revision {BASELINE_REVISION}.")
+
+        for shard in shard_names():
+            x_arg = ['dry_run=1'] if dry_run else []
+            if shard != DEFAULT_SHARD:
+                click.echo(f"Migrating shard {shard}.")
+                x_arg.append(f'shard={shard}')
+            upgrade(x_arg=x_arg or None)
+        if not dry_run:
+            click.echo("Database initialized.")
+
+    @app.cli.command('seed-admins')
+    def seed_admins():
+        """Create the admin users listed in backend/admin_user.json."""
+        from backend.authentication.views import create_admin_users
+
+        created = create_admin_users()
+        click.echo(f"Created {created} admin users.")
+
+    @app.cli.command('move-user')
+    @click.argument('user_id', type=int)
+    @click.argument('shard')
+    @click.option('--batch-size', default=1000, show_default=True, help='Rows read per query while copying.')
+    def move_user_command(user_id, shard, batch_size):
+        """Move a user's data to another shard while the app keeps running."""
+        from backend.sharding import move_user
+
+        copied = move_user(user_id, shard, batch_size=batch_size)
+        click.echo(f"Moved {copied} rows of user {user_id} to {shard}.")
+
+    @app.cli.command('materialize-recurring')
+    @click.option('--date', 'run_date', default=None, help='Materialize occurrences due by this date (YYYY-MM-DD). Defaults to today.')
+    @click.option('--batch-size', default=1000, show_default=True, help='Rules processed per transaction.')
+    def materialize_recurring(run_date, batch_size):
+        """Create Income/Expense rows for due recurring rules."""
+        from backend.expense_tracker.recurring import materialize_due_rules
+
+        today = datetime.strptime(run_date, '%Y-%m-%d').date() if run_date else None
+        stats = materialize_due_rules(today=today, batch_size=batch_size)
+        click.echo(f"Materialized {stats['income']} income and {stats['expenses']} expense rows "
+                   f"from {stats['rules']} rules ({stats['skipped']} claimed by other workers, "
+                   f"{stats['missing_rate']} skipped for missing FX rates).")
+
+    @app.cli.command('archive-years')
+    @click.option('--keep-years', default=None, type=int, help='Years to keep in the live tables, counting the current one. Defaults to ARCHIVE_KEEP_YEARS.')
+    def archive_years(keep_years):
+        """Move income and expenses from closed years into the compressed archive."""
+        from backend.expense_tracker.archive import archive_closed_years
+
+        stats = archive_closed_years(keep_years=keep_years)
+        click.echo(f"Archived {stats['income']} income and {stats['expenses']} expense rows "
+                   f"in {stats['years']} years of {stats['users']} users.")
+
+    @app.cli.command('purge-deleted')
+    @click.option('--days', default=None, type=int, help='Purge rows deleted more than this many days ago. Defaults to DELETED_RETENTION_DAYS.')
+    @click.option('--batch-size', default=1000, show_default=True, help='Rows deleted per transaction.')
+    def purge_deleted_command(days, batch_size):
+        """Permanently remove soft-deleted income and expenses past their retention."""
+        from backend.expense_tracker.audit import purge_deleted
+
+        stats = purge_deleted(retention_days=days, batch_size=batch_size)
+        click.echo(f"Purged {stats['income']} income and {stats['expenses']} expense rows.")
+
+    @app.cli.command('live-server')
+    @click.option('--host', default='0.0.0.0', show_default=True)
+    @click.option('--port', default=5001, show_default=True)
+    def live_server(host, port):
+        """Stream live balance updates to browsers over Server-Sent Events."""
+        from backend.live_server import run
+
+        run(app, host, port)
+
+    @app.cli.command('check-budgets')
+    @click.option('--month', default=None, help='Month to evaluate (YYYY-MM). Defaults to the current month.')
+    def check_budgets(month):
+        """Report every budget at or above its alert threshold."""
+        from backend.expense_tracker.budgets import iter_budget_alerts
+        from backend.expense_tracker.views import parse_month_range
+
+        start, _ = parse_month_range(month or datetime.now().strftime('%Y-%m'))
+        alerts = 0
+        for user_id, status in iter_budget_alerts(start):
+            alerts += 1
+            click.echo(f"user {user_id}: {status['category']} at {status['percent']}% of {status['limit']}")
+        click.echo(f"{alerts} budget alerts for {start.strftime('%B %Y')}.")
+
+    @app.cli.command('rebuild-budget-totals')
+    def rebuild_budget_totals():
+        """Recompute the per-category monthly spending totals from scratch."""
+        from backend.expense_tracker.budgets import rebuild_spending_totals
+
+        rebuild_spending_totals()
+        click.echo("Budget totals rebuilt.")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Create and repopulate the expense full-text search index."""
+        from backend.expense_tracker.search import rebuild_search_index
+
+        rebuild_search_index()
+        click.echo("Search index rebuilt.")
+
+    @app.cli.command('load-fx-rates')
+    @click.argument('path', required=False)
+    def load_fx_rates(path):
+        """Load FX rates from a date,currency,rate CSV file (defaults to FX_RATES_FILE)."""
+        from flask import current_app
+        from backend.expense_tracker.currency import load_rates
+
+        count = load_rates(path or current_app.config['FX_RATES_FILE'])
+        click.echo(f"Loaded {count} FX rates.")
+
+    @app.cli.command('prune-exports')
+    @click.option('--days', default=None, type=int, help='Delete exports older than this many days. Defaults to EXPORT_RETENTION_DAYS.')
+    def prune_exports_command(days):
+        """Delete old export jobs and their files."""
+        from flask import current_app
+        from backend.expense_tracker.exports import prune_exports
+
+        count = prune_exports(days if days is not None else current_app.config['EXPORT_RETENTION_DAYS'])
+        click.echo(f"Deleted {count} exports.")
@@ -3,7 +3,9 @@ import os
 import binascii
 
 class Config:
-    SECRET_KEY = binascii.hexlify(os.urandom(24)).decode()
+    # Set SECRET_KEY in the environment whenever more than one process serves
+    # the app (several workers, or the live server), so they share sessions
+    SECRET_KEY = os.environ.get('SECRET_KEY') or binascii.hexlify(os.urandom(24)).decode()
 
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     
@@ -12,3 +14,92 @@ class Config:
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{DATABASE_PATH}'
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Horizontal sharding (see backend/sharding.py): extra databases, as
+    # name -> URI, that hold per-user tables next to the main database
+    # (shard "default"). New users are spread across all of them. Each shard
+    # is migrated by `flask init-db`, and `flask move-user` rebalances users.
+    # Several SQLite files give each shard its own writer lock, e.g.
+    # {'shard1': f'sqlite:///{os.path.join(BASE_DIR, "flask_data_shard1.db")}'}
+    SHARDS = {}
+
+    # FX rates are stored as units of each currency per one unit of the pivot
+    FX_PIVOT_CURRENCY = 'USD'
+    FX_RATES_FILE = os.path.join(BASE_DIR, 'fx_rates.csv')
+    FX_CACHE_SECONDS = 3600
+
+    # Requests slower than this are logged with their SQL statements
+    SLOW_REQUEST_THRESHOLD_MS = 500
+
+    # Prometheus /metrics: served to scrapers from METRICS_ALLOWED_IPS
+    # (addresses or networks such as '10.0.0.0/8') or sending
+    # "Authorization: Bearer <METRICS_TOKEN>"; everyone else gets a 403
+    METRICS_ENABLED = True
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+    # Opt-in request profiler: admins send an X-Profile header, or a fraction
+    # of all requests is sampled; the last PROFILE_BUFFER_SIZE runs are kept
+    PROFILING_ENABLED = False
+    PROFILE_SAMPLE_RATE = 0.0
+    PROFILE_BUFFER_SIZE = 20
+    PROFILE_SAMPLE_INTERVAL_MS = 5
+
+    # Background exports: artifacts are written here and reused while the
+    # user's data is unchanged; pending jobs older than the timeout, or whose
+    # worker has not reported progress for the heartbeat timeout, are redone
+    EXPORT_DIR = os.path.join(BASE_DIR, 'exports')
+    EXPORT_WORKERS = 2
+    EXPORT_JOB_TIMEOUT_SECONDS = 3600
+    EXPORT_HEARTBEAT_TIMEOUT_SECONDS = 120
+    EXPORT_RETENTION_DAYS = 7
+
+    # Cold archive: `flask archive-years` moves income and expenses older than
+    # the last ARCHIVE_KEEP_YEARS years (counting the current one) into
+    # compressed Parquet files here; reads of those years use the files
+    ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive')
+    ARCHIVE_KEEP_YEARS = 2
+
+    # Deleted income and expenses are kept, hidden, for DELETED_RETENTION_DAYS
+    # so a reset month can be undone; `flask purge-deleted` then removes them
+    DELETED_RETENTION_DAYS = 30
+
+    # /forecast: weekday baselines come from the last FORECAST_WEEKS weeks,
+    # and the balance band covers FORECAST_CONFIDENCE of outcomes. Each
+    # process caches up to FORECAST_CACHE_SIZE users' forecasts; recurring
+    # rule changes made by other processes show after FORECAST_CACHE_SECONDS
+    FORECAST_WEEKS = 13
+    FORECAST_CONFIDENCE = 0.8
+    FORECAST_CACHE_SIZE = 10000
+    FORECAST_CACHE_SECONDS = 3600
+
+    # Token-bucket throttling: endpoint -> [(scope, requests, per seconds)],
+    # scope being 'ip', 'account' (submitted email) or 'endpoint' (everyone).
+    # Buckets live in process memory unless RATELIMIT_STORAGE_URL names a
+    # Redis-compatible server (requires the "redis" package).
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE_URL = None
+    RATELIMIT_MAX_KEYS = 100000
+    RATE_LIMITS = {
+        'auth.login_post': [('ip', 20, 60), ('account', 5, 300), ('endpoint', 50, 1)],
+        'auth.signup_post': [('ip', 5, 3600), ('endpoint', 20, 1)],
+        'auth.forgot_password': [('ip', 5, 3600), ('account', 3, 3600)],
+        'auth.verify_otp_route': [('ip', 10, 600), ('account', 5, 600)],
+        'auth.reset_password': [('ip', 10, 600)],
+    }
+    # Number of reverse proxies in front of the app. When set, the client
+    # address (and so the 'ip' scope) is taken from X-Forwarded-For instead of
+    # the proxy's own address, which would put every client in one bucket.
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+
+    # Live updates: committed writes are published to `flask live-server`,
+    # which streams them to browsers over Server-Sent Events. Messages reach
+    # every live server on this host through Unix sockets in LIVE_SOCKET_DIR,
+    # or on every host through Redis pub/sub when LIVE_PUBSUB_URL is set
+    # (requires the "redis" package). A stream whose queue of unsent events
+    # fills up is closed so the client reconnects and resyncs.
+    LIVE_ENABLED = True
+    LIVE_SOCKET_DIR = os.path.join(BASE_DIR, 'live')
+    LIVE_PUBSUB_URL = None
+    LIVE_HEARTBEAT_SECONDS = 15
+    LIVE_QUEUE_SIZE = 100
@@ -0,0 +1,274 @@
+# backend/expense_tracker/archive.py
+"""Cold storage for closed years of income and expenses.
+
+``archive_closed_years`` moves each user's rows dated before the years kept
+live (``ARCHIVE_KEEP_YEARS``) out of the live tables into zstd-compressed
+Parquet files under ``ARCHIVE_DIR``: one file per user, year and table, with
+one row group per month. ``ArchivedYear`` records which years were moved.
+
+Readers merge archived rows back in: ``period_rows`` for listings and
+exports, ``period_groups`` for totals, ``period_count`` for row counts. Files
+are memory-mapped, and only the row groups whose date statistics overlap the
+requested range are decoded, so reading a month of an archived year touches
+a single row group. Ranges within the current year never reach the archive.
+
+Archived rows are read-only. They keep their category's name, since category
+ids are renumbered when a user moves between shards. Search and ``/sync``
+only cover the live tables. Running budget totals for archived months are
+kept as they were (see ``rebuild_spending_totals``), so a user's base currency
+is fixed once a year is archived.
+"""
+import heapq
+import os
+import shutil
+from collections import namedtuple
+from datetime import date
+from operator import attrgetter
+from flask import current_app
+from sqlalchemy import delete, func
+from backend.app_factory import db
+from backend.expense_tracker.models import ArchivedYear, Category, DatedEntryMixin, Expense, Income
+from backend.logging_config import setup_logging
+from backend.sharding import moving_user_ids, shard_names, use_shard
+
+
+logger = setup_logging()
+
+MODELS = (Income, Expense)
+COLUMNS = {
+    Income: ('id', 'date', 'amount', 'currency', 'category', 'recurring_rule_id', 'created_at', 'updated_at'),
+    Expense: ('id', 'date', 'amount', 'currency', 'category', 'description', 'recurring_rule_id', 'created_at', 'updated_at'),
+}
+
+ArchivedCategory = namedtuple('ArchivedCategory', 'name')
+
+
+class ArchivedEntry(DatedEntryMixin):
+    """An archived income or expense row, with the attributes views read from live rows."""
+
+    def __init__(self, id, date, amount, currency, category, description=None, **_):
+        self.id = id
+        self.date = date
+        self.amount = amount
+        self.currency = currency
+        self.category = ArchivedCategory(category)
+        self.description = description
+
+
+def _schema(model):
+    import pyarrow as pa
+
+    types = {
+        'id': pa.int64(), 'date': pa.date32(), 'amount': pa.float64(), 'currency': pa.string(),
+        'category': pa.string(), 'description': pa.string(), 'recurring_rule_id': pa.int64(),
+        'created_at': pa.timestamp('us'), 'updated_at': pa.timestamp('us'),
+    }
+    return pa.schema([(name, types[name]) for name in COLUMNS[model]])
+
+
+def user_dir(user_id):
+    return os.path.join(current_app.config['ARCHIVE_DIR'], str(user_id))
+
+
+def _path(user_id, year, generation, model):
+    return os.path.join(user_dir(user_id), f'{year}.{generation}.{model.__tablename__}.parquet')
+
+
+def archive_path(archived, model):
+    return _path(archived.user_id, archived.year, archived.generation, model)
+
+
+def archived_years(user_id, start, end):
+    """Return the user's ``ArchivedYear`` rows overlapping ``[start, end)``, oldest first."""
+    if start >= date(date.today().year, 1, 1):
+        # The current year is never archived, so most requests skip the lookup
+        return []
+    return (ArchivedYear.query
+            .filter(ArchivedYear.user_id == user_id, ArchivedYear.period_start < end, ArchivedYear.period_end > start)
+            .order_by(ArchivedYear.year)
+            .all())
+
+
+def _read(path, start, end, columns=None):
+    """Yield the file's rows dated in ``[start, end)`` as Arrow tables, one row group at a time."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    with pa.memory_map(path) as source:
+        parquet_file = pq.ParquetFile(source)
+        date_column = parquet_file.schema_arrow.get_field_index('date')
+        for index in range(parquet_file.num_row_groups):
+            stats = parquet_file.metadata.row_group(index).column(date_column).statistics
+            if stats is not None and stats.has_min_max and (stats.min >= end or stats.max < start):
+                continue
+            table = parquet_file.read_row_group(index, columns=columns)
+            yield table.filter(pc.and_(pc.greater_equal(table['date'], start), pc.less(table['date'], end)))
+
+
+def read_archived(model, years, start, end):
+    """Yield ``ArchivedEntry`` rows of ``model`` dated in ``[start, end)`` from ``years``, by date."""
+    for archived in years:
+        for table in _read(archive_path(archived, model), start, end):
+            for row in table.to_pylist():
+                yield ArchivedEntry(**row)
+
+
+def merge_archived(archived_rows, live_rows):
+    """Merge two date-sorted row streams into one."""
+    return heapq.merge(archived_rows, live_rows, key=attrgetter('date'))
+
+
+def period_rows(model, user_id, start, end, live_rows):
+    """Return ``live_rows`` (sorted by date) with any archived rows in ``[start, end)`` merged in."""
+    years = archived_years(user_id, start, end)
+    if not years:
+        return live_rows
+    return merge_archived(read_archived(model, years, start, end), live_rows)
+
+
+def period_groups(model, user_id, start, end):
+    """Return archived ``(currency, date, amount)`` sums in ``[start, end)``, as ``fx_rates.total`` takes."""
+    groups = []
+    for archived in archived_years(user_id, start, end):
+        for table in _read(archive_path(archived, model), start, end, columns=['date', 'amount', 'currency']):
+            summed = table.group_by(['currency', 'date']).aggregate([('amount', 'sum')])
+            groups.extend(zip(*(summed[name].to_pylist() for name in ('currency', 'date', 'amount_sum'))))
+    return groups
+
+
+def period_count(model, user_id, start, end, years=None):
+    """Return how many archived ``model`` rows fall in ``[start, end)``."""
+    years = archived_years(user_id, start, end) if years is None else years
+    return sum(table.num_rows for archived in years
+               for table in _read(archive_path(archived, model), start, end, columns=['date']))
+
+
+def _write(path, model, rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _schema(model)
+    months = {}
+    for row in rows:
+        months.setdefault(row['date'].month, []).append(row)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for month in sorted(months):
+            writer.write_table(pa.Table.from_pylist(months[month], schema=schema))
+    return os.path.getsize(path)
+
+
+def _take_live_rows(model, user_id, start, end):
+    """Delete the user's live ``model`` rows in ``[start, end)``, returning them as archive rows."""
+    table = model.__table__
+    columns = [table.c[name] for name in COLUMNS[model] if name != 'category'] + [table.c.category_id]
+    # Taking the rows with DELETE ... RETURNING means an edit made meanwhile
+    # either lands before the delete and is archived, or finds the row gone.
+    # Soft-deleted rows stay in the table until they are purged
+    result = db.session.execute(delete(table)
+                                .where(table.c.user_id == user_id, table.c.date >= start, table.c.date < end,
+                                       table.c.deleted_at.is_(None))
+                                .returning(*columns))
+    rows = [dict(row._mapping) for row in result]
+    category_ids = {row['category_id'] for row in rows}
+    names = dict(db.session.query(Category.id, Category.name).filter(Category.id.in_(category_ids))) if rows else {}
+    for row in rows:
+        row['category'] = names.get(row.pop('category_id'), '')
+    return rows
+
+
+def archive_year(user_id, year):
+    """Move the user's live income and expenses dated in ``year`` into the archive.
+
+    Rows added to an already archived year are merged into new files, which
+    replace the old ones when the transaction commits. Returns
+    ``(income rows, expense rows)`` moved.
+    """
+    start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    archived = db.session.get(ArchivedYear, (user_id, year))
+    previous = archived.generation if archived else None
+    if archived is None:
+        archived = ArchivedYear(user_id=user_id, year=year, period_start=start, period_end=end, generation=0)
+        db.session.add(archived)
+
+    moved, written = {}, []
+    try:
+        taken = {model: _take_live_rows(model, user_id, start, end) for model in MODELS}
+        if not any(taken.values()):
+            db.session.rollback()
+            return 0, 0
+        archived.generation += 1
+        size = 0
+        for model, rows in taken.items():
+            if previous is not None:
+                rows = [row for table in _read(_path(user_id, year, previous, model), start, end) for row in table.to_pylist()] + rows
+            rows.sort(key=lambda row: (row['date'], row['id']))
+            path = archive_path(archived, model)
+            written.append(path)
+            size += _write(path, model, rows)
+            moved[model] = len(taken[model])
+        archived.income_rows = (archived.income_rows or 0) + moved[Income]
+        archived.expense_rows = (archived.expense_rows or 0) + moved[Expense]
+        archived.size = size
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        for path in written:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    if previous is not None:
+        for model in MODELS:
+            path = _path(user_id, year, previous, model)
+            if os.path.exists(path):
+                os.remove(path)
+    return moved[Income], moved[Expense]
+
+
+def _user_years_before(cutoff, moving):
+    """Return ``{user_id: first year}`` for users with live rows dated before ``cutoff``."""
+    first_years = {}
+    for model in MODELS:
+        query = (db.session.query(model.user_id, func.min(model.date))
+                 .filter(model.date < cutoff)
+                 .group_by(model.user_id))
+        if moving:
+            query = query.filter(model.user_id.notin_(moving))
+        for user_id, first in query:
+            first_years[user_id] = min(first.year, first_years.get(user_id, first.year))
+    return first_years
+
+
+def archive_closed_years(keep_years=None, today=None):
+    """Archive every user's rows dated before the last ``keep_years`` years, counting the current one.
+
+    Each user-year is archived in its own transaction. Users whose rows are
+    being moved between shards are skipped; the next run picks them up.
+    Returns a dict of counters for logging and benchmarks.
+    """
+    today = today or date.today()
+    keep_years = keep_years or current_app.config['ARCHIVE_KEEP_YEARS']
+    cutoff = date(today.year - keep_years + 1, 1, 1)
+    stats = {'users': 0, 'years': 0, 'income': 0, 'expenses': 0}
+    moving = moving_user_ids()
+    for shard in shard_names():
+        with use_shard(shard):
+            for user_id, first_year in sorted(_user_years_before(cutoff, moving).items()):
+                stats['users'] += 1
+                for year in range(first_year, cutoff.year):
+                    income, expenses = archive_year(user_id, year)
+                    if income or expenses:
+                        stats['years'] += 1
+                        stats['income'] += income
+                        stats['expenses'] += expenses
+                db.session.expunge_all()
+
+    logger.info("Archived years before %s: %s", cutoff, stats)
+    return stats
+
+
+def delete_archive(user_id):
+    """Remove the user's archive files; their ``ArchivedYear`` rows are deleted by the caller."""
+    shutil.rmtree(user_dir(user_id), ignore_errors=True)
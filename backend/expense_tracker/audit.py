@@ -0,0 +1,184 @@
+# backend/expense_tracker/audit.py
+"""Audit log and soft deletes for income and expenses.
+
+Deleting an income or expense row only sets its ``deleted_at``. ORM selects
+skip such rows unless run with the ``include_deleted`` execution option, and
+the indexes on the hot paths are partial over live rows, so deleted rows cost
+reads nothing. ``purge_deleted`` removes rows deleted more than
+``DELETED_RETENTION_DAYS`` ago, in batches; until then a reset month can be
+restored with ``restore_month``.
+
+Every change is also appended to ``audit_events`` in the transaction that
+made it. ORM writes are collected in ``after_flush`` and inserted with one
+executemany per flush; month-wide resets and restores write one event each.
+Rows created by recurring rules are not logged one by one, since they carry
+their rule's id.
+"""
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, event, insert, inspect, select, update
+from sqlalchemy.orm import Session, with_loader_criteria
+from backend.app_factory import db
+from backend.expense_tracker.budgets import apply_spending_deltas, spending_deltas
+from backend.expense_tracker.models import AuditEvent, Expense, Income, SoftDeleteMixin
+from backend.expense_tracker.sync import ENTITY_NAMES, delete_rows, next_revisions
+from backend.logging_config import setup_logging
+from backend.sharding import moving_user_ids, shard_names, use_shard
+
+
+logger = setup_logging()
+
+AUDITED_FIELDS = {
+    Income: ('amount', 'currency', 'date', 'category_id', 'recurring_rule_id'),
+    Expense: ('description', 'amount', 'currency', 'date', 'category_id', 'recurring_rule_id'),
+}
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def skip_deleted_rows(orm_execute_state):
+    """Add ``deleted_at IS NULL`` for soft-deleted models to every ORM select."""
+    if (orm_execute_state.is_select
+            and not orm_execute_state.is_column_load
+            and not orm_execute_state.is_relationship_load
+            and not orm_execute_state.execution_options.get('include_deleted', False)):
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            with_loader_criteria(SoftDeleteMixin, lambda cls: cls.deleted_at.is_(None), include_aliases=True))
+
+
+def _encode(changes):
+    return json.dumps(changes, default=str, sort_keys=True)
+
+
+def _fields(obj):
+    return {field: getattr(obj, field) for field in AUDITED_FIELDS[type(obj)]}
+
+
+def _diff(obj):
+    changes = {}
+    state = inspect(obj)
+    for field in AUDITED_FIELDS[type(obj)]:
+        history = state.attrs[field].history
+        if history.has_changes():
+            before = history.deleted[0] if history.deleted else None
+            after = history.added[0] if history.added else None
+            if before != after:
+                changes[field] = [before, after]
+    return changes
+
+
+def _event(obj, action, changes):
+    return {'user_id': obj.user_id, 'action': action, 'entity': ENTITY_NAMES[type(obj)], 'entity_id': obj.id,
+            'revision': obj.revision, 'changes': _encode(changes), 'created_at': datetime.utcnow()}
+
+
+@event.listens_for(Session, 'after_flush')
+def record_flushed_changes(session, flush_context):
+    """Append an audit event for every income and expense row this flush wrote."""
+    events = []
+    for obj in session.new:
+        if type(obj) in AUDITED_FIELDS:
+            events.append(_event(obj, 'create', _fields(obj)))
+    for obj in session.dirty:
+        if type(obj) not in AUDITED_FIELDS or not session.is_modified(obj):
+            continue
+        if obj.newly_deleted:
+            events.append(_event(obj, 'delete', _fields(obj)))
+        else:
+            changes = _diff(obj)
+            if changes:
+                events.append(_event(obj, 'update', changes))
+    for obj in session.deleted:
+        if type(obj) in AUDITED_FIELDS:
+            events.append(_event(obj, 'delete', _fields(obj)))
+    if events:
+        session.execute(insert(AuditEvent), events)
+
+
+def delete_month(user_id, start, end):
+    """Soft-delete the user's expenses dated in ``[start, end)`` and log the reset.
+
+    Returns the number of rows deleted; nothing is logged when it is zero.
+    """
+    deleted_at = datetime.utcnow()
+    deleted = delete_rows(Expense, Expense.in_period(user_id, start, end), user_id, deleted_at=deleted_at)
+    if deleted:
+        # The event shares the rows' deleted_at, which is how restore_month finds them
+        db.session.execute(insert(AuditEvent).values(
+            user_id=user_id, action='reset', entity='expense', period_start=start,
+            changes=_encode({'rows': deleted}), created_at=deleted_at))
+    return deleted
+
+
+def restore_month(user, start, end):
+    """Undo the latest reset of the month beginning ``start`` whose rows are still deleted.
+
+    The rows are restored with one ``UPDATE ... RETURNING`` and stamped with
+    a new sync revision, and their amounts are added back to the month's
+    budget totals. Returns ``(rows restored, revision)``, or ``(0, None)``
+    when there is nothing left to restore.
+    """
+    reset_at = (db.session.query(AuditEvent.created_at)
+                .filter(AuditEvent.user_id == user.id, AuditEvent.period_start == start,
+                        AuditEvent.action == 'reset', AuditEvent.entity == 'expense')
+                .filter(select(Expense.id)
+                        .where(Expense.user_id == user.id, Expense.date >= start, Expense.date < end,
+                               Expense.deleted_at == AuditEvent.created_at)
+                        .exists())
+                .order_by(AuditEvent.id.desc())
+                .execution_options(include_deleted=True)
+                .first())
+    if reset_at is None:
+        return 0, None
+
+    revision = next_revisions(db.session, [user.id])[user.id]
+    restored = db.session.execute(
+        update(Expense)
+        .where(Expense.user_id == user.id, Expense.date >= start, Expense.date < end,
+               Expense.deleted_at == reset_at[0])
+        .values(deleted_at=None, revision=revision)
+        .returning(Expense.user_id, Expense.category_id, Expense.date, Expense.amount, Expense.currency),
+        execution_options={'synchronize_session': False}).mappings().all()
+    apply_spending_deltas(spending_deltas(restored, {user.id: user.base_currency}))
+    db.session.execute(insert(AuditEvent).values(
+        user_id=user.id, action='restore', entity='expense', period_start=start, revision=revision,
+        changes=_encode({'rows': len(restored)}), created_at=datetime.utcnow()))
+    return len(restored), revision
+
+
+def purge_deleted(retention_days=None, batch_size=1000, now=None):
+    """Hard-delete income and expense rows soft-deleted more than ``retention_days`` ago.
+
+    Rows are found through the partial ``(user_id, deleted_at)`` indexes,
+    which hold deleted rows only, and removed ``batch_size`` at a time, one
+    transaction per batch, on every shard.
+    Users being moved between shards are skipped until the next run. Returns
+    ``{'income': n, 'expenses': n}``.
+    """
+    retention_days = retention_days if retention_days is not None else current_app.config['DELETED_RETENTION_DAYS']
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    stats = {'income': 0, 'expenses': 0}
+    moving = moving_user_ids()
+    for shard in shard_names():
+        with use_shard(shard):
+            for model, key in ((Income, 'income'), (Expense, 'expenses')):
+                table = model.__table__
+                expired = select(table.c.id).where(table.c.deleted_at < cutoff)
+                if moving:
+                    expired = expired.where(table.c.user_id.notin_(moving))
+                while True:
+                    ids = db.session.execute(expired.limit(batch_size), bind_arguments={'mapper': model}).scalars().all()
+                    if not ids:
+                        break
+                    try:
+                        db.session.execute(delete(table).where(table.c.id.in_(ids)), bind_arguments={'mapper': model})
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        raise
+                    stats[key] += len(ids)
+                    if len(ids) < batch_size:
+                        break
+
+    logger.info("Purged rows deleted before %s: %s", cutoff, stats)
+    return stats
@@ -0,0 +1,190 @@
+# backend/expense_tracker/batch.py
+"""Apply an ordered list of income and expense writes in one transaction.
+
+Each operation is a dict like::
+
+    {"op": "create", "type": "expense", "data": {...}}
+    {"op": "update", "type": "income", "id": 12, "data": {...}}
+    {"op": "delete", "type": "expense", "id": 7}
+
+``data`` takes the same fields as the single-row endpoints. The batch is all
+or nothing: when any operation is invalid or names a missing row, nothing is
+written and ``BatchError`` lists every failure.
+
+The batch costs a fixed number of statements, however many operations it
+holds. Categories are resolved with one query, and the rows being updated or
+deleted are loaded with one query per type. Everything is written in a
+single flush. Budget totals get one upsert, and the transaction commits once.
+"""
+from datetime import datetime
+from sqlalchemy import func
+from backend.app_factory import db
+from backend.expense_tracker.budgets import track_expense_changes
+from backend.expense_tracker.currency import MissingRateError, normalize_currency, require_rate
+from backend.expense_tracker.models import Category, Expense, Income, normalize_category_name
+
+
+MAX_BATCH_OPERATIONS = 500
+MODELS = {'income': Income, 'expense': Expense}
+REQUIRED_FIELDS = {'income': ('amount', 'category', 'date'),
+                   'expense': ('description', 'amount', 'category', 'date')}
+OPERATIONS = ('create', 'update', 'delete')
+
+
+class BatchError(ValueError):
+    """Raised when a batch is rejected; ``errors`` holds ``{'index', 'status', 'message'}`` dicts."""
+
+    def __init__(self, errors):
+        super().__init__('Batch rejected; no changes were saved.')
+        self.errors = errors
+
+
+def _parse(index, operation):
+    """Validate one operation, returning it normalized; raises ``ValueError``."""
+    if not isinstance(operation, dict):
+        raise ValueError('Each operation must be an object.')
+    op, kind = operation.get('op'), operation.get('type')
+    if op not in OPERATIONS:
+        raise ValueError(f"Operation must be one of: {', '.join(OPERATIONS)}.")
+    if kind not in MODELS:
+        raise ValueError(f"Type must be one of: {', '.join(MODELS)}.")
+
+    parsed = {'index': index, 'op': op, 'type': kind}
+    if op != 'create':
+        if not isinstance(operation.get('id'), int):
+            raise ValueError('Please provide the id of the record.')
+        parsed['id'] = operation['id']
+    if op == 'delete':
+        return parsed
+
+    data = operation.get('data') or {}
+    if any(not data.get(field) for field in REQUIRED_FIELDS[kind]):
+        raise ValueError('Please provide all required fields.')
+    try:
+        amount = float(data['amount'])
+    except (TypeError, ValueError):
+        raise ValueError('Amount must be a number.')
+    try:
+        date = datetime.strptime(str(data['date']), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Invalid date format. Use YYYY-MM-DD.')
+    parsed.update(amount=amount, category=normalize_category_name(data['category']), date=date,
+                  currency=normalize_currency(data.get('currency')))
+    if kind == 'expense':
+        parsed['description'] = data['description']
+    return parsed
+
+
+def _resolve_categories(user_id, names):
+    """Return ``{name: Category}`` for normalized ``names``, adding the missing ones in one flush.
+
+    Names that differ only in case map to the same category.
+    """
+    if not names:
+        return {}
+    keys = {name: name.lower() for name in names}
+    existing = {category.name.lower(): category for category in
+                Category.query.filter(Category.user_id == user_id,
+                                      func.lower(Category.name).in_(set(keys.values())))}
+    missing = {}
+    for name in sorted(names):
+        if keys[name] not in existing and keys[name] not in missing:
+            missing[keys[name]] = Category(name=name, user_id=user_id)
+    if missing:
+        db.session.add_all(missing.values())
+        db.session.flush()
+        existing.update(missing)
+    return {name: existing[key] for name, key in keys.items()}
+
+
+def _load_targets(user_id, operations):
+    """Return ``{(type, id): row}`` for every row an update or delete names."""
+    targets = {}
+    for kind, model in MODELS.items():
+        ids = {op['id'] for op in operations if op['type'] == kind and 'id' in op}
+        if ids:
+            rows = model.query.filter(model.user_id == user_id, model.id.in_(ids))
+            targets.update(((kind, row.id), row) for row in rows)
+    return targets
+
+
+def _snapshot(expense):
+    return expense.category_id, expense.date, expense.amount, expense.currency
+
+
+def run_batch(user, operations):
+    """Stage ``operations`` for ``user`` in the current session without committing.
+
+    Returns ``(results, budgets)``: one ``{'index', 'op', 'type', 'id'}`` per
+    operation, and the budget status of every category and month whose
+    expenses changed. Raises ``BatchError`` if any operation fails,
+    including a created or updated row whose currency has no FX rate.
+    """
+    parsed, errors = [], []
+    for index, operation in enumerate(operations):
+        try:
+            parsed.append(_parse(index, operation))
+        except ValueError as e:
+            errors.append({'index': index, 'status': 400, 'message': str(e)})
+    if errors:
+        raise BatchError(errors)
+
+    session = db.session
+    categories = _resolve_categories(user.id, {op['category'] for op in parsed if 'category' in op})
+    # Every row is written by the single flush below, so the whole batch is
+    # stamped with one sync revision
+    with session.no_autoflush:
+        targets = _load_targets(user.id, parsed)
+        rows, expense_changes = [], []
+        for op in parsed:
+            kind, model = op['type'], MODELS[op['type']]
+            if op['op'] == 'create':
+                row = model(user_id=user.id, amount=op['amount'], date=op['date'],
+                            currency=op['currency'] or user.base_currency,
+                            category_id=categories[op['category']].id)
+                if kind == 'expense':
+                    row.description = op['description']
+                    expense_changes.append((None, _snapshot(row)))
+                session.add(row)
+                rows.append(row)
+                continue
+
+            row = targets.get((kind, op['id']))
+            if row is None:
+                # Also covers a row deleted by an earlier operation in this batch
+                errors.append({'index': op['index'], 'status': 404, 'message': f'{kind.capitalize()} record not found.'})
+                rows.append(None)
+                continue
+            before = _snapshot(row) if kind == 'expense' else None
+            if op['op'] == 'delete':
+                row.mark_deleted()
+                del targets[(kind, op['id'])]
+                after = None
+            else:
+                row.amount = op['amount']
+                row.date = op['date']
+                row.currency = op['currency'] or row.currency
+                row.category_id = categories[op['category']].id
+                if kind == 'expense':
+                    row.description = op['description']
+                after = _snapshot(row) if kind == 'expense' else None
+            if kind == 'expense':
+                expense_changes.append((before, after))
+            rows.append(row)
+
+        for op, row in zip(parsed, rows):
+            if row is None or op['op'] == 'delete':
+                continue
+            try:
+                require_rate(row.currency, user.base_currency, row.date)
+            except MissingRateError as e:
+                errors.append({'index': op['index'], 'status': 400, 'message': str(e)})
+
+    if errors:
+        raise BatchError(errors)
+
+    session.flush()
+    budgets = track_expense_changes(user.id, user.base_currency, expense_changes)
+    results = [{'index': op['index'], 'op': op['op'], 'type': op['type'], 'id': op.get('id', row.id if row else None)}
+               for op, row in zip(parsed, rows)]
+    return results, budgets
@@ -0,0 +1,263 @@
+# backend/expense_tracker/budgets.py
+from collections import defaultdict
+from itertools import chain
+from sqlalchemy import and_, exists, func, select
+from backend.app_factory import db
+from backend.authentication.models import User
+from backend.expense_tracker.archive import period_groups
+from backend.expense_tracker.currency import fx_rates
+from backend.expense_tracker.models import ArchivedYear, Budget, Category, CategoryMonthTotal, Expense, Income
+from backend.expense_tracker.views import dialect_insert
+from backend.sharding import shard_for, shard_names, use_shard
+
+
+# Percent of the limit at which a budget counts as exceeded, in addition to
+# each budget's own alert threshold.
+OVER_LIMIT = 100
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def apply_spending_deltas(deltas):
+    """Add ``{(user_id, category_id, month_start): amount}`` to the running totals.
+
+    Amounts are in each user's base currency.
+
+    All deltas are written with one executemany upsert, so callers that touch
+    many months or categories at once (recurring runs, batch writes) still
+    cost a single statement.
+    """
+    params = [
+        {'user_id': user_id, 'category_id': category_id, 'month_start': start, 'spent': amount}
+        for (user_id, category_id, start), amount in deltas.items() if amount
+    ]
+    if not params:
+        return
+
+    table = CategoryMonthTotal.__table__
+    stmt = dialect_insert()(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.category_id, table.c.month_start],
+        set_={'spent': table.c.spent + stmt.excluded.spent},
+    )
+    db.session.execute(stmt, params)
+
+
+def spending_deltas(expense_rows, base_currencies, sign=1):
+    """Group expense row dicts into the delta mapping used by ``apply_spending_deltas``.
+
+    ``base_currencies`` maps user ids to the currency their totals are kept in.
+    """
+    deltas = defaultdict(float)
+    for row in expense_rows:
+        amount = fx_rates.convert(float(row['amount']), row['currency'], base_currencies[row['user_id']], row['date'])
+        deltas[(row['user_id'], row['category_id'], month_start(row['date']))] += sign * amount
+    return deltas
+
+
+def budget_status(category_name, limit_amount, alert_threshold, spent, previous_spent=None):
+    """Summarize one budget; ``crossed`` lists thresholds passed since ``previous_spent``."""
+    spent = spent or 0
+    status = {
+        'category': category_name,
+        'limit': f'{limit_amount:,}',
+        'spent': f'{spent:,}',
+        'remaining': f'{limit_amount - spent:,}',
+        'percent': round(spent / limit_amount * 100, 2) if limit_amount else None,
+        'alert_threshold': alert_threshold,
+        'over_budget': spent > limit_amount,
+    }
+    if previous_spent is not None:
+        thresholds = sorted({alert_threshold, OVER_LIMIT})
+        status['crossed'] = [t for t in thresholds if previous_spent < limit_amount * t / 100 <= spent]
+    return status
+
+
+def track_expense_change(user_id, base_currency, before=None, after=None):
+    """Apply one expense write to the running totals and evaluate its budget.
+
+    ``before`` and ``after`` are ``(category_id, date, amount, currency)`` for
+    the row as it was and as it is now (``None`` for inserts and deletes).
+    Returns the budget status for ``after``'s category and month, or ``None``
+    when there is nothing to report.
+    """
+    deltas = defaultdict(float)
+    if before:
+        category_id, day, amount, currency = before
+        deltas[(user_id, category_id, month_start(day))] -= fx_rates.convert(float(amount), currency, base_currency, day)
+    if after:
+        category_id, day, amount, currency = after
+        deltas[(user_id, category_id, month_start(day))] += fx_rates.convert(float(amount), currency, base_currency, day)
+    apply_spending_deltas(deltas)
+
+    if not after:
+        return None
+
+    key = (user_id, after[0], month_start(after[1]))
+    row = (db.session.query(Category.name, Budget.limit_amount, Budget.alert_threshold, CategoryMonthTotal.spent)
+           .select_from(Budget)
+           .join(Category, Category.id == Budget.category_id)
+           .outerjoin(CategoryMonthTotal, and_(CategoryMonthTotal.user_id == Budget.user_id,
+                                               CategoryMonthTotal.category_id == Budget.category_id,
+                                               CategoryMonthTotal.month_start == key[2]))
+           .filter(Budget.user_id == user_id, Budget.category_id == after[0])
+           .first())
+    if not row:
+        return None
+
+    name, limit_amount, alert_threshold, spent = row
+    spent = spent or 0
+    return budget_status(name, limit_amount, alert_threshold, spent, previous_spent=spent - deltas[key])
+
+
+def track_expense_changes(user_id, base_currency, changes):
+    """Apply many expense writes to the running totals at once.
+
+    ``changes`` is a list of ``(before, after)`` pairs as taken by
+    ``track_expense_change``. The totals are updated with one upsert, and the
+    status of every budget whose category and month were touched is returned,
+    with ``crossed`` measured against the totals before the whole batch.
+    """
+    deltas = defaultdict(float)
+    for before, after in changes:
+        if before:
+            category_id, day, amount, currency = before
+            deltas[(user_id, category_id, month_start(day))] -= fx_rates.convert(float(amount), currency, base_currency, day)
+        if after:
+            category_id, day, amount, currency = after
+            deltas[(user_id, category_id, month_start(day))] += fx_rates.convert(float(amount), currency, base_currency, day)
+    apply_spending_deltas(deltas)
+    if not deltas:
+        return []
+
+    category_ids = {category_id for _, category_id, _ in deltas}
+    budgets = (db.session.query(Budget.category_id, Category.name, Budget.limit_amount, Budget.alert_threshold)
+               .join(Category, Category.id == Budget.category_id)
+               .filter(Budget.user_id == user_id, Budget.category_id.in_(category_ids))
+               .all())
+    if not budgets:
+        return []
+    totals = {(category_id, start): spent for category_id, start, spent in
+              db.session.query(CategoryMonthTotal.category_id, CategoryMonthTotal.month_start, CategoryMonthTotal.spent)
+              .filter(CategoryMonthTotal.user_id == user_id,
+                      CategoryMonthTotal.category_id.in_(category_ids),
+                      CategoryMonthTotal.month_start.in_({start for _, _, start in deltas}))}
+
+    statuses = []
+    for category_id, name, limit_amount, alert_threshold in budgets:
+        for (_, delta_category, start), delta in sorted(deltas.items(), key=lambda item: item[0][2]):
+            if delta_category != category_id:
+                continue
+            spent = totals.get((category_id, start)) or 0
+            status = budget_status(name, limit_amount, alert_threshold, spent, previous_spent=spent - delta)
+            statuses.append(dict(status, month=f'{start:%Y-%m}'))
+    return statuses
+
+
+def month_balance(user_id, base_currency, start, end):
+    """Return the user's income, expenses and balance for ``[start, end)`` as ``/balance`` reports them.
+
+    Amounts are summed per currency and day in SQL, or in the archive for
+    archived years, and the groups converted into ``base_currency`` in one
+    pass; raises ``MissingRateError`` when a rate is missing.
+    """
+    income_groups = (Income.in_period(user_id, start, end)
+                     .with_entities(Income.currency, Income.date, func.sum(Income.amount))
+                     .group_by(Income.currency, Income.date))
+    expense_groups = (Expense.in_period(user_id, start, end)
+                      .with_entities(Expense.currency, Expense.date, func.sum(Expense.amount))
+                      .group_by(Expense.currency, Expense.date))
+    total_income = fx_rates.total(chain(income_groups, period_groups(Income, user_id, start, end)), base_currency)
+    total_expense = fx_rates.total(chain(expense_groups, period_groups(Expense, user_id, start, end)), base_currency)
+    balance = total_income - total_expense if total_income else -total_expense
+    return {
+        'income': f'{total_income:,}' if total_income else '0',
+        'total_expense': f'{total_expense:,}',
+        'balance': f'{balance:,}',
+        'currency': base_currency
+    }
+
+
+def budget_report(user_id, start):
+    """Return the status of every budget the user has for the month beginning ``start``."""
+    rows = (db.session.query(Budget.id, Category.name, Budget.limit_amount, Budget.alert_threshold, CategoryMonthTotal.spent)
+            .join(Category, Category.id == Budget.category_id)
+            .outerjoin(CategoryMonthTotal, and_(CategoryMonthTotal.user_id == Budget.user_id,
+                                                CategoryMonthTotal.category_id == Budget.category_id,
+                                                CategoryMonthTotal.month_start == start))
+            .filter(Budget.user_id == user_id)
+            .order_by(Category.name)
+            .all())
+    return [dict(budget_status(name, limit_amount, threshold, spent), id=budget_id)
+            for budget_id, name, limit_amount, threshold, spent in rows]
+
+
+def iter_budget_alerts(start, batch_size=1000):
+    """Yield ``(user_id, status)`` for every budget at or above its alert threshold.
+
+    Evaluates each shard's budgets for the month beginning ``start`` in one
+    joined query, filtered in SQL and streamed in ``batch_size`` chunks.
+    """
+    for shard in shard_names():
+        with use_shard(shard):
+            query = (db.session.query(Budget.user_id, Category.name, Budget.limit_amount, Budget.alert_threshold, CategoryMonthTotal.spent)
+                     .join(Category, Category.id == Budget.category_id)
+                     .join(CategoryMonthTotal, and_(CategoryMonthTotal.user_id == Budget.user_id,
+                                                    CategoryMonthTotal.category_id == Budget.category_id,
+                                                    CategoryMonthTotal.month_start == start))
+                     .filter(CategoryMonthTotal.spent * 100 >= Budget.limit_amount * Budget.alert_threshold)
+                     .order_by(Budget.user_id)
+                     .execution_options(yield_per=batch_size))
+            for user_id, name, limit_amount, threshold, spent in query:
+                yield user_id, budget_status(name, limit_amount, threshold, spent)
+
+
+def rebuild_spending_totals(user_id=None, batch_size=5000):
+    """Recompute the running totals from the expenses table.
+
+    Expenses are summed per user, category, day and currency in SQL and
+    converted into each user's base currency in a single streamed pass per
+    shard. With ``user_id``, only that user's shard is touched.
+
+    Totals for archived years are left as they are, since their expenses are
+    no longer in the table; they are still kept current by writes to those
+    years. Because they cannot be converted again, a user with archived years
+    cannot change base currency.
+    """
+    shards = [shard_for(user_id)] if user_id is not None else shard_names()
+    for shard in shards:
+        with use_shard(shard):
+            _rebuild_shard_totals(user_id, batch_size)
+
+
+def _archived(user_id_column, date_column):
+    return exists().where(ArchivedYear.user_id == user_id_column,
+                          ArchivedYear.period_start <= date_column, ArchivedYear.period_end > date_column)
+
+
+def _rebuild_shard_totals(user_id, batch_size):
+    delete = CategoryMonthTotal.query.filter(~_archived(CategoryMonthTotal.user_id, CategoryMonthTotal.month_start))
+    if user_id is not None:
+        delete = delete.filter_by(user_id=user_id)
+    delete.delete(synchronize_session=False)
+
+    # Users live in the main database, so base currencies are looked up per
+    # chunk of rows instead of being joined in
+    query = (select(Expense.user_id, Expense.category_id, Expense.date, Expense.currency, func.sum(Expense.amount))
+             .where(~_archived(Expense.user_id, Expense.date))
+             .group_by(Expense.user_id, Expense.category_id, Expense.date, Expense.currency))
+    if user_id is not None:
+        query = query.where(Expense.user_id == user_id)
+
+    deltas = defaultdict(float)
+    base_currencies = {}
+    for partition in db.session.execute(query, execution_options={'yield_per': batch_size}).partitions():
+        missing = {row[0] for row in partition} - base_currencies.keys()
+        if missing:
+            base_currencies.update(db.session.query(User.id, User.base_currency).filter(User.id.in_(missing)))
+        for owner_id, category_id, day, currency, amount in partition:
+            deltas[(owner_id, category_id, month_start(day))] += fx_rates.convert(amount, currency, base_currencies[owner_id], day)
+    apply_spending_deltas(deltas)
+    db.session.commit()
@@ -0,0 +1,138 @@
+# backend/expense_tracker/categories.py
+"""Category management: listing, renaming, deleting and merging categories.
+
+Merging moves everything filed under the source categories to the target
+with one set-based ``UPDATE`` per table: income and expenses (soft-deleted
+rows included, so a restore still finds its category), recurring rules,
+budgets and the running month totals. The moved rows share one new sync
+revision, the sources leave tombstones, and the merge is logged as one audit
+event, so the cost does not grow with the number of rows beyond the updates
+themselves. Rows already archived to Parquet keep the category name they
+were archived with.
+"""
+import json
+from datetime import datetime
+from sqlalchemy import delete, func, insert, literal, select, update
+from backend.app_factory import db
+from backend.expense_tracker.models import (AuditEvent, Budget, Category, CategoryMonthTotal, Expense, Income,
+                                            RecurringRule, SyncTombstone, user_rows)
+from backend.expense_tracker.sync import next_revisions
+from backend.expense_tracker.views import dialect_insert
+
+
+MAX_MERGE_SOURCES = 100
+
+
+class CategoryConflict(Exception):
+    """The change would break per-user name uniqueness or orphan rows."""
+
+
+def list_categories(user_id, include_stats=False):
+    """Return the user's categories by name, optionally with their live income and expense counts."""
+    categories = [{'id': category_id, 'name': name} for category_id, name in
+                  db.session.query(Category.id, Category.name).filter(Category.user_id == user_id)
+                  .order_by(func.lower(Category.name))]
+    if include_stats:
+        for model, key in ((Income, 'income'), (Expense, 'expenses')):
+            counts = dict(db.session.query(model.category_id, func.count(model.id))
+                          .filter(model.user_id == user_id).group_by(model.category_id))
+            for category in categories:
+                category[key] = counts.get(category['id'], 0)
+    return categories
+
+
+def rename_category(category, name):
+    """Rename ``category``; raises ``CategoryConflict`` if another of the user's categories has that name."""
+    clash = Category.named(category.user_id, name).filter(Category.id != category.id).first()
+    if clash:
+        raise CategoryConflict(f'A category named {clash.name} already exists; merge the two instead.')
+    category.name = name
+
+
+def _in_use(user_id, category_ids):
+    for model in (Income, Expense, RecurringRule):
+        table = model.__table__
+        used = select(table.c.id).where(user_rows(table, user_id), table.c.category_id.in_(category_ids)).exists()
+        if db.session.query(used).execution_options(include_deleted=True).scalar():
+            return True
+    return False
+
+
+def _delete_categories(user_id, category_ids, revision):
+    # Core deletes, so the ORM does not load every row that references them
+    db.session.execute(delete(Budget).where(Budget.user_id == user_id, Budget.category_id.in_(category_ids)),
+                       execution_options={'synchronize_session': False})
+    db.session.execute(delete(CategoryMonthTotal).where(CategoryMonthTotal.user_id == user_id,
+                                                        CategoryMonthTotal.category_id.in_(category_ids)),
+                       execution_options={'synchronize_session': False})
+    doomed = (select(Category.user_id, literal('category'), Category.id, literal(revision), literal(datetime.utcnow()))
+              .where(Category.user_id == user_id, Category.id.in_(category_ids)))
+    db.session.execute(insert(SyncTombstone).from_select(
+        ['user_id', 'entity', 'entity_id', 'revision', 'deleted_at'], doomed))
+    db.session.execute(delete(Category).where(Category.user_id == user_id, Category.id.in_(category_ids)),
+                       execution_options={'synchronize_session': False})
+
+
+def delete_category(category):
+    """Delete an unused category with its budget; raises ``CategoryConflict`` while rows still use it."""
+    if _in_use(category.user_id, [category.id]):
+        raise CategoryConflict(f'Category {category.name} is still in use; merge it into another category instead.')
+    revision = next_revisions(db.session, [category.user_id])[category.user_id]
+    _delete_categories(category.user_id, [category.id], revision)
+
+
+def _merge_budgets(user_id, source_ids, target_id):
+    # The target keeps its own budget; otherwise it takes the first source's
+    budgets = dict(db.session.query(Budget.category_id, Budget.id)
+                   .filter(Budget.user_id == user_id, Budget.category_id.in_([target_id, *source_ids])))
+    if target_id in budgets:
+        return
+    moved = next((budgets[source_id] for source_id in source_ids if source_id in budgets), None)
+    if moved:
+        db.session.execute(update(Budget).where(Budget.id == moved).values(category_id=target_id),
+                           execution_options={'synchronize_session': False})
+
+
+def _merge_month_totals(user_id, source_ids, target_id):
+    # Totals are kept in the user's base currency, so they simply add up
+    table = CategoryMonthTotal.__table__
+    sums = (select(table.c.user_id, literal(target_id), table.c.month_start, func.sum(table.c.spent))
+            .where(table.c.user_id == user_id, table.c.category_id.in_(source_ids))
+            .group_by(table.c.user_id, table.c.month_start))
+    stmt = dialect_insert()(table).from_select(['user_id', 'category_id', 'month_start', 'spent'], sums)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.category_id, table.c.month_start],
+        set_={'spent': table.c.spent + stmt.excluded.spent},
+    )
+    db.session.execute(stmt)
+
+
+def merge_categories(user_id, source_ids, target_id):
+    """Move all of ``source_ids``' rows, rules, budget and totals to ``target_id``, then delete the sources.
+
+    Stages the merge in the current session without committing. Returns
+    ``({'income': n, 'expenses': n, 'recurring_rules': n}, revision)``.
+    """
+    source_ids = [source_id for source_id in dict.fromkeys(source_ids) if source_id != target_id]
+    revision = next_revisions(db.session, [user_id])[user_id]
+    moved = {}
+    for model, key in ((Income, 'income'), (Expense, 'expenses')):
+        table = model.__table__
+        moved[key] = db.session.execute(
+            update(model)
+            .where(user_rows(table, user_id), table.c.category_id.in_(source_ids))
+            .values(category_id=target_id, revision=revision),
+            execution_options={'synchronize_session': False}).rowcount
+    moved['recurring_rules'] = db.session.execute(
+        update(RecurringRule)
+        .where(RecurringRule.user_id == user_id, RecurringRule.category_id.in_(source_ids))
+        .values(category_id=target_id),
+        execution_options={'synchronize_session': False}).rowcount
+
+    _merge_budgets(user_id, source_ids, target_id)
+    _merge_month_totals(user_id, source_ids, target_id)
+    _delete_categories(user_id, source_ids, revision)
+    db.session.execute(insert(AuditEvent).values(
+        user_id=user_id, action='merge', entity='category', entity_id=target_id, revision=revision,
+        changes=json.dumps({'sources': source_ids, **moved}, sort_keys=True), created_at=datetime.utcnow()))
+    return moved, revision
@@ -0,0 +1,142 @@
+# backend/expense_tracker/currency.py
+import csv
+import re
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from flask import current_app
+from backend.app_factory import db
+from backend.expense_tracker.models import FxRate
+from backend.expense_tracker.views import dialect_insert
+
+
+CURRENCY_PATTERN = re.compile(r'^[A-Z]{3}$')
+
+
+class MissingRateError(LookupError):
+    """Raised when no FX rate is known for a currency on or before a date."""
+
+
+def normalize_currency(code, default=None):
+    """Return ``code`` as an upper-case ISO 4217 code, or ``default`` if empty.
+
+    Raises ``ValueError`` for anything that is not three letters.
+    """
+    if not code:
+        return default
+    code = str(code).strip().upper()
+    if not CURRENCY_PATTERN.match(code):
+        raise ValueError(f'Invalid currency code: {code}')
+    return code
+
+
+class FxRateCache:
+    """Date-indexed in-memory view of the ``fx_rates`` table.
+
+    The whole table is read with one query into per-currency sorted date and
+    rate lists; lookups bisect for the latest rate on or before the requested
+    date, so conversions never touch the database. The snapshot is reloaded
+    after ``FX_CACHE_SECONDS`` or when ``invalidate()`` is called.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._pivot = None
+        self._loaded_at = None
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _ensure_loaded(self):
+        ttl = current_app.config.get('FX_CACHE_SECONDS', 3600)
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < ttl:
+            return
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < ttl:
+                return
+            series = {}
+            rows = db.session.query(FxRate.currency, FxRate.date, FxRate.rate).order_by(FxRate.currency, FxRate.date)
+            for currency, day, rate in rows:
+                dates, rates = series.setdefault(currency, ([], []))
+                dates.append(day)
+                rates.append(rate)
+            self._series = series
+            self._pivot = current_app.config.get('FX_PIVOT_CURRENCY', 'USD')
+            self._loaded_at = time.monotonic()
+
+    def rate(self, currency, on):
+        """Return units of ``currency`` per pivot unit in effect on ``on``."""
+        self._ensure_loaded()
+        if currency == self._pivot:
+            return 1.0
+        dates, rates = self._series.get(currency, ((), ()))
+        index = bisect_right(dates, on) - 1
+        if index < 0:
+            raise MissingRateError(f'No exchange rate for {currency} on or before {on}.')
+        return rates[index]
+
+    def convert(self, amount, from_currency, to_currency, on):
+        if from_currency == to_currency:
+            return amount
+        return amount * self.rate(to_currency, on) / self.rate(from_currency, on)
+
+    def total(self, grouped_amounts, to_currency):
+        """Sum ``(currency, date, amount)`` rows converted into ``to_currency``.
+
+        Callers pass amounts already summed per currency and date in SQL, so a
+        month of transactions costs at most one lookup per distinct
+        (currency, day) pair; same-currency groups skip the lookup entirely.
+        """
+        total = 0.0
+        for currency, day, amount in grouped_amounts:
+            total += self.convert(amount or 0, currency, to_currency, day)
+        return total
+
+
+fx_rates = FxRateCache()
+
+
+def require_rate(currency, base_currency, on):
+    """Raise ``MissingRateError`` unless ``currency`` converts into ``base_currency`` on ``on``.
+
+    Write paths call this so no income, expense or recurring rule is stored
+    in a currency that balances, budgets and forecasts cannot convert.
+    """
+    fx_rates.convert(1.0, currency, base_currency, on)
+
+
+def _parse_rate_date(value):
+    return value if not isinstance(value, str) else datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def load_rates(path, chunk_size=5000):
+    """Upsert rates from a ``date,currency,rate`` CSV file and return the row count.
+
+    The file is the local stand-in for an external rates feed; rows for an
+    existing (currency, date) replace the stored rate.
+    """
+    count = 0
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        chunk = []
+        for row in reader:
+            chunk.append({'currency': normalize_currency(row['currency']), 'date': _parse_rate_date(row['date']),
+                          'rate': float(row['rate'])})
+            if len(chunk) >= chunk_size:
+                count += _upsert_rates(chunk)
+                chunk = []
+        if chunk:
+            count += _upsert_rates(chunk)
+    db.session.commit()
+    fx_rates.invalidate()
+    return count
+
+
+def _upsert_rates(rows):
+    table = FxRate.__table__
+    stmt = dialect_insert()(table)
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.currency, table.c.date], set_={'rate': stmt.excluded.rate})
+    db.session.execute(stmt, rows)
+    return len(rows)
@@ -0,0 +1,295 @@
+# backend/expense_tracker/exports.py
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app, url_for
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import joinedload
+from backend.app_factory import db
+from backend.expense_tracker.archive import archived_years, merge_archived, period_count, read_archived
+from backend.expense_tracker.models import Category, ExportJob, Expense, Income
+from backend.expense_tracker.views import write_csv, write_xlsx
+from backend.logging_config import setup_logging
+from backend.sharding import use_user_shard
+
+
+logger = setup_logging()
+
+# format: (writer, file mode, mimetype)
+EXPORT_FORMATS = {
+    'xlsx': (write_xlsx, 'wb', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': (write_csv, 'w', 'text/csv'),
+}
+PENDING = ('queued', 'running')
+# Rows fetched per query; progress is written after each chunk
+CHUNK_SIZE = 1000
+
+_executor = None
+_executor_lock = threading.Lock()
+# Ids of the jobs handed to this process's pool that have not finished yet
+_owned = set()
+
+
+def _get_executor(app):
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=app.config.get('EXPORT_WORKERS', 2),
+                                               thread_name_prefix='export')
+    return _executor
+
+
+def artifact_path(job):
+    return os.path.join(current_app.config['EXPORT_DIR'], f'{job.id}.{job.format}')
+
+
+def data_version(user_id, start, end):
+    """Fingerprint the user's income and expenses dated in ``[start, end)``.
+
+    Adding a row raises the latest ``updated_at``, editing one bumps it too,
+    and deleting or moving one out of the period changes the row count, so
+    the fingerprint changes whenever the export contents would. Renaming a
+    category raises the user's latest category revision. Archived years
+    contribute their generation, which changes whenever rows are added to
+    them.
+    """
+    parts = [f'{archived.year}.{archived.generation}' for archived in archived_years(user_id, start, end)]
+    parts.append(str(db.session.query(func.max(Category.revision)).filter(Category.user_id == user_id).scalar()))
+    for model in (Income, Expense):
+        count, last_update = (db.session.query(func.count(model.id), func.max(model.updated_at))
+                              .filter(model.user_id == user_id, model.date >= start, model.date < end)
+                              .one())
+        parts.append(f'{count}:{last_update}')
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def job_to_dict(job):
+    result = {
+        'id': job.id,
+        'status': job.status,
+        'progress': job.progress,
+        'format': job.format,
+        'period_start': job.period_start.isoformat(),
+        'period_end': job.period_end.isoformat(),
+        'rows_total': job.rows_total,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == 'done':
+        result['download_url'] = url_for('expense_tracker.download_export', job_id=job.id)
+        result['size'] = job.artifact_size
+    if job.error:
+        result['error'] = job.error
+    return result
+
+
+def expire_orphaned_job(job):
+    """Mark pending ``job`` failed if no worker is building it; returns whether it was.
+
+    The pool lives in the web process, so a restart loses its queued and
+    running jobs. A pending job is orphaned when this process does not own
+    it and no worker has reported progress for
+    ``EXPORT_HEARTBEAT_TIMEOUT_SECONDS``. Should it still be queued in
+    another process, that worker finds it failed and skips it.
+    """
+    if job.status not in PENDING or job.id in _owned:
+        return False
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config.get('EXPORT_HEARTBEAT_TIMEOUT_SECONDS', 120))
+    if (job.heartbeat_at or job.created_at) >= cutoff:
+        return False
+    # Compare-and-set, so a worker that reported progress meanwhile keeps its job
+    result = db.session.execute(update(ExportJob)
+                                .where(ExportJob.id == job.id, ExportJob.status.in_(PENDING),
+                                       func.coalesce(ExportJob.heartbeat_at, ExportJob.created_at) < cutoff)
+                                .values(status='failed', error='The export was interrupted. Please request it again.',
+                                        finished_at=datetime.utcnow()))
+    db.session.commit()
+    if result.rowcount:
+        logger.warning("Export job %s was orphaned and has been marked failed", job.id)
+    return bool(result.rowcount)
+
+
+def _reusable_job(user_id, start, end, fmt, version):
+    """Return the job whose artifact a request for this export can use, or ``None``.
+
+    That is a finished job whose artifact still exists, or a pending one that
+    is neither orphaned nor past ``EXPORT_JOB_TIMEOUT_SECONDS``. Pending jobs
+    that are get marked failed, which frees their slot in the unique index.
+    """
+    timeout = timedelta(seconds=current_app.config.get('EXPORT_JOB_TIMEOUT_SECONDS', 3600))
+    candidates = (ExportJob.query
+                  .filter_by(user_id=user_id, period_start=start, period_end=end, format=fmt, data_version=version)
+                  .filter(ExportJob.status.in_(PENDING + ('done',)))
+                  .order_by(ExportJob.created_at.desc())
+                  .all())
+    for job in candidates:
+        if job.status == 'done' and os.path.exists(artifact_path(job)):
+            return job
+        if job.status not in PENDING or expire_orphaned_job(job):
+            continue
+        if datetime.utcnow() - job.created_at < timeout:
+            return job
+        db.session.execute(update(ExportJob).where(ExportJob.id == job.id, ExportJob.status.in_(PENDING))
+                           .values(status='failed', error='The export took too long. Please request it again.',
+                                   finished_at=datetime.utcnow()))
+        db.session.commit()
+    return None
+
+
+def _insert_pending(values):
+    # Skipped when an identical job is already pending (uq_export_jobs_pending)
+    if db.session.get_bind(mapper=ExportJob).dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(ExportJob).values(**values).on_conflict_do_nothing(
+        index_elements=['user_id', 'period_start', 'period_end', 'format', 'data_version'],
+        index_where=ExportJob.status.in_(PENDING))
+
+
+def find_or_create_job(user_id, start, end, fmt, filename):
+    """Return ``(job, created)`` for an export of ``[start, end)`` in ``fmt``.
+
+    A reusable job (see ``_reusable_job``) is returned when the user's data
+    is unchanged; otherwise a new job is committed and handed to the worker
+    pool. Two requests that both find nothing race on the insert, and the
+    loser reuses the winner's job, so an export is never built twice at once.
+    """
+    version = data_version(user_id, start, end)
+    while True:
+        job = _reusable_job(user_id, start, end, fmt, version)
+        if job is not None:
+            return job, False
+
+        job_id = uuid.uuid4().hex
+        inserted = db.session.execute(_insert_pending(dict(
+            id=job_id, user_id=user_id, period_start=start, period_end=end, format=fmt, data_version=version,
+            status='queued', progress=0, filename=filename, created_at=datetime.utcnow(),
+            heartbeat_at=datetime.utcnow()))).rowcount
+        db.session.commit()
+        # Otherwise the pending job that won is found on the next pass
+        if inserted:
+            break
+
+    app = current_app._get_current_object()
+    _owned.add(job_id)
+    _get_executor(app).submit(run_export_job, app, job_id)
+    return db.session.get(ExportJob, job_id), True
+
+
+def _update_job(job_id, **values):
+    db.session.execute(update(ExportJob).where(ExportJob.id == job_id).values(heartbeat_at=datetime.utcnow(), **values))
+    db.session.commit()
+
+
+def _iter_rows(model, user_id, start, end, on_chunk):
+    """Yield the period's rows in date order, one keyset-paginated chunk at a time.
+
+    Each chunk is a complete query, so no cursor stays open while progress is
+    committed between chunks and memory stays bounded by ``CHUNK_SIZE``.
+    """
+    last = None
+    while True:
+        query = (model.in_period(user_id, start, end)
+                 .options(joinedload(model.category))
+                 .order_by(model.date, model.id))
+        if last is not None:
+            query = query.filter(or_(model.date > last[0], and_(model.date == last[0], model.id > last[1])))
+        rows = query.limit(CHUNK_SIZE).all()
+        if not rows:
+            return
+        last = (rows[-1].date, rows[-1].id)
+        yield from rows
+        on_chunk(len(rows))
+
+
+def _iter_archived(model, years, start, end, on_chunk):
+    """Yield the period's archived rows in date order, reporting progress every ``CHUNK_SIZE`` rows."""
+    count = 0
+    for count, row in enumerate(read_archived(model, years, start, end), 1):
+        yield row
+        if count % CHUNK_SIZE == 0:
+            on_chunk(CHUNK_SIZE)
+    if count % CHUNK_SIZE:
+        on_chunk(count % CHUNK_SIZE)
+
+
+def run_export_job(app, job_id):
+    """Build one export's artifact; runs on the worker pool."""
+    with app.app_context():
+        try:
+            _build_artifact(job_id)
+        finally:
+            _owned.discard(job_id)
+            db.session.remove()
+
+
+def _build_artifact(job_id):
+    # Claim the job; one expired as orphaned while it was queued stays failed
+    claimed = db.session.execute(update(ExportJob).where(ExportJob.id == job_id, ExportJob.status == 'queued')
+                                 .values(status='running', heartbeat_at=datetime.utcnow())).rowcount
+    db.session.commit()
+    job = db.session.get(ExportJob, job_id)
+    if job is None or not claimed:
+        return
+
+    user_id, start, end = job.user_id, job.period_start, job.period_end
+    writer, mode, _ = EXPORT_FORMATS[job.format]
+    path = artifact_path(job)
+    partial = f'{path}.part'
+    try:
+        with use_user_shard(user_id):
+            years = archived_years(user_id, start, end)
+            total = sum(model.in_period(user_id, start, end).count() + period_count(model, user_id, start, end, years)
+                        for model in (Income, Expense))
+            _update_job(job_id, rows_total=total)
+
+            done = 0
+
+            def on_chunk(rows):
+                nonlocal done
+                done += rows
+                # 100% is only reported once the file is in place
+                _update_job(job_id, progress=min(99, done * 100 // total) if total else 99)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(partial, mode, **({'newline': ''} if mode == 'w' else {})) as output:
+                income, expenses = (merge_archived(_iter_archived(model, years, start, end, on_chunk),
+                                                   _iter_rows(model, user_id, start, end, on_chunk))
+                                    for model in (Income, Expense))
+                writer(income, expenses, output)
+            os.replace(partial, path)
+
+            _update_job(job_id, status='done', progress=100, artifact_size=os.path.getsize(path),
+                        finished_at=datetime.utcnow())
+            logger.info("Export job %s finished: %d rows, %d bytes", job_id, total, os.path.getsize(path))
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Export job %s failed", job_id)
+        if os.path.exists(partial):
+            os.remove(partial)
+        _update_job(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+
+
+def delete_jobs(query):
+    """Delete the jobs matched by ``query`` along with their artifacts; returns the count."""
+    count = 0
+    for job in query.all():
+        for path in (artifact_path(job), f'{artifact_path(job)}.part'):
+            if os.path.exists(path):
+                os.remove(path)
+        db.session.delete(job)
+        count += 1
+    return count
+
+
+def prune_exports(older_than_days):
+    """Delete jobs and artifacts created more than ``older_than_days`` days ago."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    count = delete_jobs(ExportJob.query.filter(ExportJob.created_at < cutoff))
+    db.session.commit()
+    return count
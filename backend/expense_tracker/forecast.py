@@ -0,0 +1,324 @@
+# backend/expense_tracker/forecast.py
+"""Cash-flow forecasts: projected income, expenses and balance per month.
+
+Each user's income and expenses for the last ``FORECAST_WEEKS`` weeks are
+loaded with one grouped query into ``users x days`` NumPy arrays in their
+base currency. Rows created by recurring rules are left out of that history,
+because the rules' upcoming occurrences are scheduled exactly instead.
+
+A future day's baseline is the mean of the same weekday over the history
+weeks since the user's first transaction in the window, i.e. a seasonal
+moving average. The variance of those weeks gives the confidence band, which
+widens with the square root of the number of days projected. The current
+month also counts everything recorded so far this month.
+
+Everything is computed for a batch of users at once with array operations.
+``user_forecast`` uses a batch of one and ``iter_forecasts`` covers every
+user. Results are cached per process. The cache key includes the user's sync
+revision, so any income, expense or category write, in any process, makes
+the next request recompute. Recurring rule changes clear the entry when they
+commit.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from itertools import chain
+from statistics import NormalDist
+from flask import current_app
+from sqlalchemy import event, func, literal, select, union_all
+from sqlalchemy.orm import Session
+from backend.app_factory import db
+from backend.authentication.models import User
+from backend.expense_tracker.currency import fx_rates
+from backend.expense_tracker.models import Expense, Income, RecurringRule
+from backend.expense_tracker.recurring import MAX_CATCH_UP
+from backend.expense_tracker.sync import current_revision
+from backend.sharding import use_shard, users_by_shard
+
+
+MAX_FORECAST_MONTHS = 12
+# Session.info key: users whose recurring rules changed in this transaction
+CHANGED_RULES = 'forecast_changed_rules'
+DAY_STEPS = {'daily': 1, 'weekly': 7}
+MONTH_STEPS = {'monthly': 1, 'yearly': 12}
+# Shortest gap between occurrences at interval 1, to size the occurrence grid
+MIN_GAP_DAYS = {'daily': 1, 'weekly': 7, 'monthly': 28, 'yearly': 365}
+INCOME, EXPENSE = 0, 1
+
+
+class ForecastCache:
+    """Per-process LRU of forecasts, one entry per user.
+
+    An entry is served while its version (day, months, base currency and
+    sync revision) matches and it is younger than ``FORECAST_CACHE_SECONDS``;
+    the age limit bounds how long another process's recurring rule change can
+    go unnoticed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id, version):
+        ttl = current_app.config.get('FORECAST_CACHE_SECONDS', 3600)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version or time.monotonic() - entry[1] >= ttl:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[2]
+
+    def put(self, user_id, version, forecast):
+        size = current_app.config.get('FORECAST_CACHE_SIZE', 10000)
+        with self._lock:
+            self._entries[user_id] = (version, time.monotonic(), forecast)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                self._entries.clear()
+            for user_id in user_ids or ():
+                self._entries.pop(user_id, None)
+
+
+forecast_cache = ForecastCache()
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_rule_changes(session, flush_context):
+    users = {obj.user_id for obj in chain(session.new, session.dirty, session.deleted) if isinstance(obj, RecurringRule)}
+    if users:
+        session.info.setdefault(CHANGED_RULES, set()).update(users)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_committed(session):
+    users = session.info.pop(CHANGED_RULES, None)
+    if users:
+        forecast_cache.invalidate(users)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_rule_changes(session):
+    session.info.pop(CHANGED_RULES, None)
+
+
+def _month_starts(today, months):
+    """Return the first day of this month and of the following ``months + 1`` months."""
+    starts = [today.replace(day=1)]
+    for _ in range(months + 1):
+        starts.append((starts[-1] + timedelta(days=32)).replace(day=1))
+    return starts
+
+
+def _to_base(np, amounts, currencies, bases, days):
+    """Convert ``amounts`` into each row's base currency, one rate lookup per distinct (currency, base, day)."""
+    foreign = np.flatnonzero(currencies != bases)
+    if len(foreign):
+        keys = [(currencies[i], bases[i], days[i]) for i in foreign.tolist()]
+        factors = {key: fx_rates.convert(1.0, *key) for key in set(keys)}
+        amounts[foreign] *= np.array([factors[key] for key in keys])
+    return amounts
+
+
+def _history(np, user_ids, bases, start, today):
+    """Return ``(income, expenses, manual income, manual expenses)`` as ``users x days`` arrays from ``start`` to ``today``.
+
+    The manual arrays leave out rows created by recurring rules.
+    """
+    length = (today - start).days + 1
+    parts = [select(model.user_id, model.date, model.currency, model.recurring_rule_id.is_(None),
+                    literal(kind), func.sum(model.amount))
+             .where(model.user_id.in_(user_ids.tolist()), model.date >= start, model.date <= today)
+             .group_by(model.user_id, model.date, model.currency, model.recurring_rule_id.is_(None))
+             for model, kind in ((Income, INCOME), (Expense, EXPENSE))]
+    # The session cannot see the tables inside a UNION, so name the shard's mapper
+    rows = db.session.execute(union_all(*parts), bind_arguments={'mapper': Income}).all()
+    grids = [np.zeros((len(user_ids), length)) for _ in range(4)]
+    if not rows:
+        return grids
+
+    owners, days, currencies, manual, kinds, amounts = zip(*rows)
+    index = np.searchsorted(user_ids, np.array(owners))
+    amounts = _to_base(np, np.array(amounts, dtype=float), np.array(currencies, dtype=object), bases[index], days)
+    # Ordinals convert to an array far faster than dates do
+    ordinals = np.fromiter(map(date.toordinal, days), dtype=np.int64, count=len(days))
+    cells = index * length + ordinals - start.toordinal()
+    kinds, manual = np.array(kinds), np.array(manual, dtype=bool)
+    masks = (kinds == INCOME, kinds == EXPENSE, (kinds == INCOME) & manual, (kinds == EXPENSE) & manual)
+    return [np.bincount(cells[mask], weights=amounts[mask], minlength=grid.size).reshape(grid.shape)
+            for mask, grid in zip(masks, grids)]
+
+
+def _occurrences(np, frequency, start, interval, next_index, next_run, horizon_end):
+    """Return the dates of occurrences ``next_index`` onwards of same-frequency rules as a ``rules x n`` grid.
+
+    The grid is wide enough to reach ``horizon_end`` from the earliest
+    ``next_run``; callers mask out the dates beyond it.
+    """
+    gap = MIN_GAP_DAYS[frequency] * interval
+    spans = (np.datetime64(horizon_end) - next_run).astype(int)
+    count = min(int((spans // gap).max()) + 1, MAX_CATCH_UP + MAX_FORECAST_MONTHS * 31)
+    steps = (next_index[:, None] + np.arange(count)[None, :]) * interval[:, None]
+    if frequency in DAY_STEPS:
+        return start[:, None] + steps * DAY_STEPS[frequency]
+    months = start.astype('datetime64[M]')[:, None] + steps * MONTH_STEPS[frequency]
+    first = months.astype('datetime64[D]')
+    last = (months + 1).astype('datetime64[D]') - 1
+    # Clamp e.g. the 31st to the last day of shorter months, as occurrence_date does
+    day_of_month = (start - start.astype('datetime64[M]').astype('datetime64[D]')).astype(int)
+    return np.minimum(first + day_of_month[:, None], last)
+
+
+def _schedule(np, user_ids, bases, today, month_start, horizon_end):
+    """Return ``(income, expenses)`` from active recurring rules as ``users x days`` arrays from ``today`` on.
+
+    Column 0 collects occurrences this month that are due but not yet
+    materialized; column ``k`` holds those falling ``k`` days after today.
+    """
+    length = (horizon_end - today).days + 1
+    grids = [np.zeros((len(user_ids), length)) for _ in range(2)]
+    rules = (db.session.query(RecurringRule.frequency, RecurringRule.user_id, RecurringRule.kind, RecurringRule.amount,
+                              RecurringRule.currency, RecurringRule.interval, RecurringRule.start_date,
+                              RecurringRule.end_date, RecurringRule.next_index, RecurringRule.next_run)
+             .filter(RecurringRule.user_id.in_(user_ids.tolist()), RecurringRule.active.is_(True),
+                     RecurringRule.next_run <= horizon_end)
+             .all())
+    by_frequency = {}
+    for frequency, *rule in rules:
+        by_frequency.setdefault(frequency, []).append(rule)
+
+    for frequency, group in by_frequency.items():
+        owners, kinds, amounts, currencies, interval, start, end, next_index, next_run = (
+            np.array(column) for column in zip(*group))
+        index = np.searchsorted(user_ids, owners)
+        # Future occurrences are valued at today's rates
+        amounts = _to_base(np, amounts.astype(float), currencies.astype(object), bases[index],
+                           [today] * len(group))
+        dates = _occurrences(np, frequency, start.astype('datetime64[D]'), interval, next_index,
+                             next_run.astype('datetime64[D]'), horizon_end)
+        ends = np.array([day or date.max for day in end], dtype='datetime64[D]')
+        valid = (dates >= np.datetime64(month_start)) & (dates <= np.datetime64(horizon_end)) & (dates <= ends[:, None])
+        offsets = np.maximum((dates - np.datetime64(today)).astype(int), 0)
+        cells = index[:, None] * length + offsets
+        weights = np.broadcast_to(amounts[:, None], dates.shape)
+        for grid, kind in zip(grids, ('income', 'expense')):
+            mask = valid & (kinds == kind)[:, None]
+            grid += np.bincount(cells[mask], weights=weights[mask], minlength=grid.size).reshape(grid.shape)
+    return grids
+
+
+def _money(value):
+    return f'{round(float(value), 2):,}'
+
+
+def forecast_users(users, today=None, months=6):
+    """Forecast ``users``, a list of ``(user_id, base_currency)`` on the current shard, in one pass.
+
+    Returns ``{user_id: forecast}``. Each forecast lists this month and the
+    next ``months`` with projected income, expenses and balance in the
+    user's base currency, plus a ``FORECAST_CONFIDENCE`` band around the
+    balance. Raises ``MissingRateError`` when a rate is missing.
+    """
+    import numpy as np
+
+    today = today or date.today()
+    weeks = current_app.config.get('FORECAST_WEEKS', 13)
+    confidence = current_app.config.get('FORECAST_CONFIDENCE', 0.8)
+    window = 7 * weeks
+    users = sorted(users)
+    user_ids = np.array([user_id for user_id, _ in users])
+    bases = np.array([base for _, base in users], dtype=object)
+
+    starts = _month_starts(today, months)
+    month_start, horizon_end = starts[0], starts[-1] - timedelta(days=1)
+    history_start = min(month_start, today - timedelta(days=window - 1))
+    income, expenses, manual_income, manual_expenses = _history(np, user_ids, bases, history_start, today)
+    scheduled_income, scheduled_expenses = _schedule(np, user_ids, bases, today, month_start, horizon_end)
+
+    # Weekday means and net-flow variance over the weeks since each user's first transaction
+    active = (income[:, -window:] != 0) | (expenses[:, -window:] != 0)
+    first_day = np.where(active.any(axis=1), active.argmax(axis=1), window)
+    valid = (np.arange(weeks)[None, :] >= (first_day // 7)[:, None])[:, :, None]
+    counted = valid.sum(axis=1)
+    by_week = [series[:, -window:].reshape(len(users), weeks, 7) for series in (manual_income, manual_expenses)]
+    income_mean, expense_mean = ((series * valid).sum(axis=1) / np.maximum(counted, 1) for series in by_week)
+    net = by_week[0] - by_week[1]
+    net_var = (((net - (income_mean - expense_mean)[:, None, :]) ** 2) * valid).sum(axis=1) / np.maximum(counted - 1, 1)
+
+    # Column 0 is everything up to today; column k is k days later, whose
+    # weekday matches history column (k - 1) % 7 because the window ends today
+    length = scheduled_income.shape[1]
+    weekday = np.arange(length - 1) % 7
+    recorded = slice((month_start - history_start).days, None)
+    projected_income, projected_expenses, variance = (np.zeros((len(users), length)) for _ in range(3))
+    projected_income[:, 0] = income[:, recorded].sum(axis=1)
+    projected_expenses[:, 0] = expenses[:, recorded].sum(axis=1)
+    projected_income[:, 1:] = income_mean[:, weekday]
+    projected_expenses[:, 1:] = expense_mean[:, weekday]
+    variance[:, 1:] = net_var[:, weekday]
+    projected_income += scheduled_income
+    projected_expenses += scheduled_expenses
+
+    # Sum the days into months with one matrix product per series
+    bounds = np.array(starts[1:-1], dtype='datetime64[D]')
+    day_months = np.searchsorted(bounds, np.datetime64(today) + np.arange(length), side='right')
+    to_months = np.zeros((length, months + 1))
+    to_months[np.arange(length), day_months] = 1
+    month_income, month_expenses, month_variance = (series @ to_months for series in
+                                                    (projected_income, projected_expenses, variance))
+    balance = month_income - month_expenses
+    margin = NormalDist().inv_cdf(0.5 + confidence / 2) * np.sqrt(month_variance)
+
+    labels = [f'{start:%Y-%m}' for start in starts[:-1]]
+    forecasts = {}
+    for row, (user_id, base_currency) in enumerate(users):
+        forecasts[user_id] = {
+            'currency': base_currency,
+            'as_of': today.isoformat(),
+            'history_weeks': weeks,
+            'confidence': confidence,
+            'months': [{
+                'month': label,
+                'income': _money(month_income[row, column]),
+                'expenses': _money(month_expenses[row, column]),
+                'balance': _money(balance[row, column]),
+                'balance_low': _money(balance[row, column] - margin[row, column]),
+                'balance_high': _money(balance[row, column] + margin[row, column]),
+            } for column, label in enumerate(labels)],
+        }
+    return forecasts
+
+
+def user_forecast(user, months=6):
+    """Return ``user``'s forecast, from the cache while it is current."""
+    today = date.today()
+    version = (today, months, user.base_currency, current_revision(user.id))
+    forecast = forecast_cache.get(user.id, version)
+    if forecast is None:
+        forecast = forecast_users([(user.id, user.base_currency)], today, months)[user.id]
+        forecast_cache.put(user.id, version, forecast)
+    return forecast
+
+
+def iter_forecasts(today=None, months=6, batch_size=1000):
+    """Yield ``(user_id, forecast)`` for every user, forecasting ``batch_size`` users at a time per shard."""
+    last_id = 0
+    while True:
+        users = (db.session.query(User.id, User.base_currency)
+                 .filter(User.id > last_id)
+                 .order_by(User.id)
+                 .limit(batch_size)
+                 .all())
+        if not users:
+            return
+        last_id = users[-1].id
+        base_currencies = dict(users)
+        for shard, user_ids in users_by_shard([user_id for user_id, _ in users]).items():
+            with use_shard(shard):
+                yield from forecast_users([(user_id, base_currencies[user_id]) for user_id in user_ids],
+                                          today, months).items()
@@ -0,0 +1,135 @@
+# backend/expense_tracker/live.py
+"""Publish events for the live SSE stream (see ``backend.live_server``) once writes commit.
+
+Income and expense rows flushed through the ORM are collected per session.
+Once the transaction commits they become ``transaction`` events, plus a
+``balance`` event with fresh totals for every month they touched. Events
+from rolled-back transactions are discarded. Bulk writes that bypass the ORM
+report themselves with ``note_bulk_change``; clients receive a ``resync``
+event for them and fetch the rows through ``/sync``.
+
+Inside a request, publishing waits until the response has been sent, so the
+totals queries never add to a write's latency.
+"""
+import json
+from collections import defaultdict
+from datetime import timedelta
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from backend.app_factory import db
+from backend.authentication.models import User
+from backend.expense_tracker.budgets import month_balance, month_start
+from backend.expense_tracker.currency import MissingRateError
+from backend.expense_tracker.models import Expense, Income
+from backend.expense_tracker.sync import serialize_row
+from backend.logging_config import setup_logging
+from backend.pubsub import make_broker
+from backend.sharding import use_user_shard
+
+
+logger = setup_logging()
+
+KINDS = {Income: 'income', Expense: 'expense'}
+# Session.info key holding changes flushed in the current transaction
+PENDING = 'live_pending'
+
+
+def get_broker():
+    app = current_app._get_current_object()
+    if 'live_broker' not in app.extensions:
+        app.extensions['live_broker'] = make_broker(app)
+    return app.extensions['live_broker']
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_changes(session, flush_context):
+    pending = session.info.setdefault(PENDING, [])
+    for objs, flushed_op in ((session.new, 'created'), (session.dirty, 'updated'), (session.deleted, 'deleted')):
+        for obj in objs:
+            kind = KINDS.get(type(obj))
+            if kind is None or (flushed_op == 'updated' and not session.is_modified(obj)):
+                continue
+            # Soft deletes are flushed as updates
+            op = 'deleted' if flushed_op == 'updated' and obj.newly_deleted else flushed_op
+            months = {month_start(obj.date)}
+            if op == 'updated':
+                # A row moved to another month changes that month's totals too
+                months.update(month_start(day) for day in inspect(obj).attrs.date.history.deleted if day)
+            change = {'op': op, 'type': kind, 'revision': obj.revision, 'id': obj.id}
+            if op != 'deleted':
+                change['data'] = serialize_row(kind, obj)
+            pending.append((obj.user_id, change, months))
+
+
+@event.listens_for(Session, 'after_commit')
+def queue_committed(session):
+    pending = session.info.pop(PENDING, None)
+    if pending and has_app_context():
+        g.setdefault('live_changes', []).extend(pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_pending(session):
+    session.info.pop(PENDING, None)
+
+
+def note_bulk_change(user_id, days, revision=None):
+    """Record a bulk write to ``user_id``'s rows on ``days`` that bypassed the ORM."""
+    pending = db.session.info.setdefault(PENDING, [])
+    pending.append((user_id, {'op': 'resync', 'revision': revision}, {month_start(day) for day in days}))
+
+
+def publish_changes(changes):
+    """Publish ``changes`` and the resulting month totals to the live subscribers."""
+    if not current_app.config.get('LIVE_ENABLED', True):
+        return
+    broker = get_broker()
+    if not broker.has_subscribers():
+        return
+
+    messages, months = [], defaultdict(set)
+    for user_id, change, touched in changes:
+        name = 'resync' if change['op'] == 'resync' else 'transaction'
+        messages.append({'user_id': user_id, 'event': name, 'id': change['revision'], 'data': change})
+        months[user_id].update(touched)
+
+    base_currencies = dict(db.session.query(User.id, User.base_currency).filter(User.id.in_(months)))
+    for user_id, starts in months.items():
+        if user_id not in base_currencies:
+            continue
+        with use_user_shard(user_id):
+            for start in sorted(starts):
+                end = (start + timedelta(days=32)).replace(day=1)
+                try:
+                    totals = month_balance(user_id, base_currencies[user_id], start, end)
+                except MissingRateError as e:
+                    logger.warning("Skipped live balance for user %s, %s: %s", user_id, start, e)
+                    continue
+                messages.append({'user_id': user_id, 'event': 'balance', 'data': dict(totals, month=f'{start:%Y-%m}')})
+
+    for message in messages:
+        broker.publish(json.dumps(message).encode())
+
+
+def publish_committed():
+    """Publish everything committed so far in the current app context."""
+    changes = g.pop('live_changes', None)
+    if changes:
+        publish_changes(changes)
+
+
+def publish_after_response(response):
+    """``after_request`` hook: publish this request's committed changes once the response is sent."""
+    changes = g.pop('live_changes', None)
+    if changes:
+        app = current_app._get_current_object()
+
+        def publish():
+            with app.app_context():
+                try:
+                    publish_changes(changes)
+                except Exception:
+                    logger.exception("Failed to publish live updates")
+        response.call_on_close(publish)
+    return response
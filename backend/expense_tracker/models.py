@@ -1,41 +1,302 @@
 # backend/expense_tracker/models.py
 from datetime import datetime
+from sqlalchemy import inspect
+from sqlalchemy.orm import validates
 from backend.app_factory import db
 
+MAX_CATEGORY_NAME = 50
+
+def normalize_category_name(name):
+    """Trim ``name`` and collapse its inner whitespace; raises ``ValueError`` if nothing is left."""
+    name = ' '.join(str(name or '').split())
+    if not name:
+        raise ValueError('Category name cannot be empty.')
+    if len(name) > MAX_CATEGORY_NAME:
+        raise ValueError(f'Category name can be at most {MAX_CATEGORY_NAME} characters.')
+    return name
+
 class Category(db.Model):
+    """A user's label for income and expenses.
+
+    Names are stored normalized (see ``normalize_category_name``) and are
+    unique per user ignoring case, so "Food", "food" and "Food " are one
+    category. Look them up with ``named``.
+    """
     __tablename__ = 'categories'
+    __table_args__ = (db.Index('ix_categories_user_revision', 'user_id', 'revision'),)
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), nullable=False)
+    name = db.Column(db.String(MAX_CATEGORY_NAME), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user = db.relationship('User', backref=db.backref('categories', lazy=True))
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    @validates('name')
+    def _normalize_name(self, key, name):
+        return normalize_category_name(name)
+
+    @classmethod
+    def named(cls, user_id, name):
+        """Query ``user_id``'s category called ``name``, matched the way uniqueness is enforced."""
+        return cls.query.filter(cls.user_id == user_id,
+                                db.func.lower(cls.name) == db.func.lower(normalize_category_name(name)))
+
+# lower() is ASCII-only on SQLite, so there names differing only in the case
+# of non-ASCII letters stay distinct
+db.Index('uq_categories_user_name', Category.user_id, db.func.lower(Category.name), unique=True)
+
+class DatedEntryMixin:
+    """Shared helpers for rows bucketed by their ``date`` column.
+
+    Month and year are derived from ``date`` instead of being stored, so every
+    period query is a half-open range over the ``(user_id, date)`` index.
+    """
+
+    @property
+    def month(self):
+        return self.date.strftime('%B')
+
+    @property
+    def year(self):
+        return self.date.year
+
+    @classmethod
+    def in_period(cls, user_id, start, end):
+        return cls.query.filter(cls.user_id == user_id, cls.date >= start, cls.date < end)
+
+# Partial index conditions: the hot-path indexes hold live rows only, and the
+# (user_id, deleted_at) index only soft-deleted ones. Together they still
+# cover all of a user's rows; see user_rows
+LIVE_ROWS = {dialect: db.text('deleted_at IS NULL') for dialect in ('sqlite_where', 'postgresql_where')}
+DELETED_ROWS = {dialect: db.text('deleted_at IS NOT NULL') for dialect in ('sqlite_where', 'postgresql_where')}
+
+def user_rows(table, user_id):
+    """Match all of ``user_id``'s rows in ``table``; soft-deletable tables go through both partial indexes."""
+    if 'deleted_at' not in table.c:
+        return table.c.user_id == user_id
+    # A bare user_id match could use neither partial index
+    return db.or_(db.and_(table.c.user_id == user_id, table.c.deleted_at.is_(None)),
+                  db.and_(table.c.user_id == user_id, table.c.deleted_at.isnot(None)))
 
-class Income(db.Model):
+class SoftDeleteMixin:
+    """Rows that are deleted by setting ``deleted_at`` and purged later.
+
+    ORM selects skip deleted rows unless run with the ``include_deleted``
+    execution option (see ``expense_tracker.audit``).
+    """
+    deleted_at = db.Column(db.DateTime, nullable=True)
+
+    def mark_deleted(self, when=None):
+        self.deleted_at = when or datetime.utcnow()
+
+    @property
+    def newly_deleted(self):
+        """Whether ``deleted_at`` was set since the row was loaded or last flushed."""
+        return self.deleted_at is not None and bool(inspect(self).attrs.deleted_at.history.added)
+
+class Income(DatedEntryMixin, SoftDeleteMixin, db.Model):
     __tablename__ = 'income'
+    __table_args__ = (
+        db.Index('ix_income_user_date', 'user_id', 'date', **LIVE_ROWS),
+        db.Index('ix_income_user_revision', 'user_id', 'revision', **LIVE_ROWS),
+        db.Index('ix_income_user_deleted_at', 'user_id', 'deleted_at', **DELETED_ROWS),
+        db.UniqueConstraint('recurring_rule_id', 'date', name='uq_income_recurring_occurrence'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default='INR')
     date = db.Column(db.Date, nullable=False)
-    month = db.Column(db.String(20), nullable=False)
-    year = db.Column(db.Integer, nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
     category = db.relationship('Category', backref=db.backref('incomes', lazy=True))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user = db.relationship('User', backref=db.backref('incomes', lazy=True))
+    recurring_rule_id = db.Column(db.Integer, db.ForeignKey('recurring_rules.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
-class Expense(db.Model):
+class Expense(DatedEntryMixin, SoftDeleteMixin, db.Model):
     __tablename__ = 'expenses'
+    __table_args__ = (
+        db.Index('ix_expenses_user_date', 'user_id', 'date', **LIVE_ROWS),
+        db.Index('ix_expenses_user_revision', 'user_id', 'revision', **LIVE_ROWS),
+        # Search finds the expenses of categories matching by name through it
+        db.Index('ix_expenses_user_category', 'user_id', 'category_id', **LIVE_ROWS),
+        db.Index('ix_expenses_user_deleted_at', 'user_id', 'deleted_at', **DELETED_ROWS),
+        db.UniqueConstraint('recurring_rule_id', 'date', name='uq_expenses_recurring_occurrence'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(255), nullable=False)
     amount = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default='INR')
     date = db.Column(db.Date, nullable=False)
-    month = db.Column(db.String(20), nullable=False)
-    year = db.Column(db.Integer, nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
     category = db.relationship('Category', backref=db.backref('expenses', lazy=True))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user = db.relationship('User', backref=db.backref('expenses', lazy=True))
+    recurring_rule_id = db.Column(db.Integer, db.ForeignKey('recurring_rules.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+class RecurringRule(db.Model):
+    """An RRULE-like schedule that materializes Income or Expense rows.
+
+    Occurrence ``n`` falls ``n * interval`` frequency units after
+    ``start_date``; ``next_index``/``next_run`` point at the first occurrence
+    that has not been materialized yet.
+    """
+    __tablename__ = 'recurring_rules'
+    __table_args__ = (db.Index('ix_recurring_rules_due', 'active', 'next_run'),)
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # 'income' or 'expense'
+    amount = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default='INR')
+    description = db.Column(db.String(255), nullable=True)
+    frequency = db.Column(db.String(10), nullable=False)  # 'daily', 'weekly', 'monthly' or 'yearly'
+    interval = db.Column(db.Integer, nullable=False, default=1)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=True)
+    next_index = db.Column(db.Integer, nullable=False, default=0)
+    next_run = db.Column(db.Date, nullable=True)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    category = db.relationship('Category', backref=db.backref('recurring_rules', lazy=True))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user = db.relationship('User', backref=db.backref('recurring_rules', lazy=True))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class Budget(db.Model):
+    __tablename__ = 'budgets'
+    __table_args__ = (db.UniqueConstraint('user_id', 'category_id', name='uq_budgets_user_category'),)
+    id = db.Column(db.Integer, primary_key=True)
+    limit_amount = db.Column(db.Float, nullable=False)
+    alert_threshold = db.Column(db.Integer, nullable=False, default=80)  # percent of the limit
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    category = db.relationship('Category', backref=db.backref('budget', lazy=True, uselist=False))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user = db.relationship('User', backref=db.backref('budgets', lazy=True))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CategoryMonthTotal(db.Model):
+    """Running expense total per user, category and month.
+
+    Maintained incrementally by every expense write so budget checks read a
+    single row instead of re-summing the month.
+    """
+    __tablename__ = 'category_month_totals'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), primary_key=True)
+    month_start = db.Column(db.Date, primary_key=True)
+    spent = db.Column(db.Float, nullable=False, default=0)
+
+class FxRate(db.Model):
+    """Units of ``currency`` per one unit of the configured pivot currency on ``date``."""
+    __tablename__ = 'fx_rates'
+    currency = db.Column(db.String(3), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    rate = db.Column(db.Float, nullable=False)
+
+# Partial index condition for export jobs that are queued or being built
+PENDING_JOBS = {dialect: db.text("status IN ('queued', 'running')") for dialect in ('sqlite_where', 'postgresql_where')}
+
+class ExportJob(db.Model):
+    """A background export of one user's income and expenses for a period.
+
+    Finished jobs double as a cache: a request for the same user, period,
+    format and data version reuses the stored artifact. Workers bump
+    ``heartbeat_at`` whenever they write progress, so a pending job whose
+    worker died with its process can be told apart from a slow one. At most
+    one job per export can be pending, so concurrent requests for the same
+    export share a single build.
+    """
+    __tablename__ = 'export_jobs'
+    __table_args__ = (
+        db.Index('ix_export_jobs_lookup', 'user_id', 'period_start', 'period_end', 'format', 'data_version'),
+        db.Index('uq_export_jobs_pending', 'user_id', 'period_start', 'period_end', 'format', 'data_version',
+                 unique=True, **PENDING_JOBS),
+    )
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)
+    period_end = db.Column(db.Date, nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    data_version = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='queued')  # 'queued', 'running', 'done' or 'failed'
+    progress = db.Column(db.Integer, nullable=False, default=0)  # percent
+    rows_total = db.Column(db.Integer, nullable=True)
+    filename = db.Column(db.String(255), nullable=False)
+    artifact_size = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class ArchivedYear(db.Model):
+    """One user's income and expenses for a closed year, moved out of the live tables.
+
+    The rows live in Parquet files under ``ARCHIVE_DIR`` (see
+    ``expense_tracker.archive``); ``generation`` names the current files and
+    changes whenever rows are added to the year, so readers never see a file
+    that is still being written.
+    """
+    __tablename__ = 'archived_years'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    period_start = db.Column(db.Date, nullable=False)
+    period_end = db.Column(db.Date, nullable=False)
+    generation = db.Column(db.Integer, nullable=False, default=1)
+    income_rows = db.Column(db.Integer, nullable=False, default=0)
+    expense_rows = db.Column(db.Integer, nullable=False, default=0)
+    size = db.Column(db.Integer, nullable=False, default=0)  # bytes on disk
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SyncTombstone(db.Model):
+    """Marks a deleted Income, Expense or Category row for ``/sync`` clients."""
+    __tablename__ = 'sync_tombstones'
+    __table_args__ = (db.Index('ix_sync_tombstones_user_revision', 'user_id', 'revision'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    entity = db.Column(db.String(10), nullable=False)  # 'category', 'income' or 'expense'
+    entity_id = db.Column(db.Integer, nullable=False)
+    revision = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AuditEvent(db.Model):
+    """One change to a user's income or expenses, appended in the transaction that made it.
+
+    Rows are never updated; they go only with the account. ``changes`` holds
+    JSON: the row's fields for creates and deletes, ``{field: [before,
+    after]}`` for updates, and the row count for month-wide resets and
+    restores, which have no ``entity_id`` but a ``period_start``. Category
+    merges are logged against the target category with the merged ids and
+    the number of rows moved.
+    """
+    __tablename__ = 'audit_events'
+    __table_args__ = (
+        db.Index('ix_audit_events_user_id', 'user_id', 'id'),
+        db.Index('ix_audit_events_user_period', 'user_id', 'period_start',
+                 sqlite_where=db.text('period_start IS NOT NULL'), postgresql_where=db.text('period_start IS NOT NULL')),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # 'create', 'update', 'delete', 'reset', 'restore' or 'merge'
+    entity = db.Column(db.String(10), nullable=False)  # 'income', 'expense' or 'category'
+    entity_id = db.Column(db.Integer, nullable=True)
+    period_start = db.Column(db.Date, nullable=True)
+    revision = db.Column(db.Integer, nullable=True)
+    changes = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SyncCounter(db.Model):
+    """Last revision handed out to a user's synced rows (see ``expense_tracker.sync``).
+
+    Kept next to the rows it numbers rather than on ``user``, so writes only
+    touch the user's own shard. A user without a row is at revision 1.
+    """
+    __tablename__ = 'sync_counters'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    revision = db.Column(db.Integer, nullable=False)
+
 class Feedback(db.Model):
     __tablename__ = 'feedback' 
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,213 @@
+# backend/expense_tracker/recurring.py
+import calendar
+from collections import defaultdict
+from datetime import date, timedelta
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import joinedload
+from backend.app_factory import db
+from backend.authentication.models import User
+from backend.expense_tracker.budgets import apply_spending_deltas, spending_deltas
+from backend.expense_tracker.currency import MissingRateError, require_rate
+from backend.expense_tracker.models import Expense, Income, RecurringRule
+from backend.expense_tracker.live import note_bulk_change, publish_committed
+from backend.expense_tracker.sync import stamp_rows
+from backend.logging_config import setup_logging
+from backend.sharding import moving_user_ids, shard_names, use_shard
+
+
+logger = setup_logging()
+
+FREQUENCIES = ('daily', 'weekly', 'monthly', 'yearly')
+KINDS = ('income', 'expense')
+
+# Upper bound on occurrences materialized for one rule in one run, so a rule
+# that has been idle for years cannot produce an unbounded batch. The rest is
+# picked up by the next run.
+MAX_CATCH_UP = 400
+
+
+def _add_months(start, months):
+    month_index = start.month - 1 + months
+    year = start.year + month_index // 12
+    month = month_index % 12 + 1
+    # Clamp e.g. the 31st to the last day of shorter months
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def occurrence_date(rule, index):
+    """Return the date of occurrence ``index`` (0-based) of ``rule``.
+
+    Dates are computed from ``start_date`` rather than from the previous
+    occurrence, so a rule on the 31st stays on month end instead of drifting.
+    """
+    step = index * (rule.interval or 1)
+    if rule.frequency == 'daily':
+        return rule.start_date + timedelta(days=step)
+    if rule.frequency == 'weekly':
+        return rule.start_date + timedelta(weeks=step)
+    if rule.frequency == 'monthly':
+        return _add_months(rule.start_date, step)
+    if rule.frequency == 'yearly':
+        return _add_months(rule.start_date, 12 * step)
+    raise ValueError(f'Unsupported frequency: {rule.frequency}')
+
+
+def first_run(rule):
+    """Return ``next_run`` for a new rule, or ``None`` if it never fires."""
+    first = occurrence_date(rule, 0)
+    if rule.end_date and first > rule.end_date:
+        return None
+    return first
+
+
+def due_occurrences(rule, today):
+    """Return ``(dates, next_index, next_run)`` for occurrences due by ``today``.
+
+    ``next_run`` is ``None`` once the rule has passed its ``end_date``.
+    """
+    dates = []
+    index = rule.next_index
+    while len(dates) < MAX_CATCH_UP:
+        current = occurrence_date(rule, index)
+        if rule.end_date and current > rule.end_date:
+            return dates, index, None
+        if current > today:
+            break
+        dates.append(current)
+        index += 1
+    return dates, index, occurrence_date(rule, index)
+
+
+def _occurrence_row(rule, occurrence):
+    row = {
+        'amount': rule.amount,
+        'currency': rule.currency,
+        'date': occurrence,
+        'category_id': rule.category_id,
+        'user_id': rule.user_id,
+        'recurring_rule_id': rule.id,
+    }
+    if rule.kind == 'expense':
+        row['description'] = rule.description or rule.category.name
+    return row
+
+
+_rules = RecurringRule.__table__
+
+# Compare-and-set on next_index: only the worker that still sees the old index
+# advances the rule and therefore owns the occurrences in between.
+_CLAIM_RULE = (update(_rules)
+               .where(_rules.c.id == bindparam('rule_id'), _rules.c.next_index == bindparam('claimed_index'))
+               .values(next_index=bindparam('new_index'), next_run=bindparam('new_run'), active=bindparam('new_active')))
+
+
+def _claim_rules(claims):
+    """Apply ``claims`` in one executemany and return the ones this worker won."""
+    result = db.session.execute(_CLAIM_RULE, claims)
+    if db.engine.dialect.supports_sane_multi_rowcount and result.rowcount == len(claims):
+        return claims
+
+    # Another worker advanced some of these rules; redo the batch one rule at
+    # a time to find out which claims are still ours.
+    db.session.rollback()
+    return [claim for claim in claims if db.session.execute(_CLAIM_RULE, claim).rowcount]
+
+
+def materialize_due_rules(today=None, batch_size=1000):
+    """Insert Income/Expense rows for every recurring occurrence due by ``today``.
+
+    Rules are processed in primary-key batches, one transaction per batch,
+    with the claims and the generated rows each written through a single
+    executemany. Each rule is claimed with a compare-and-set on
+    ``next_index``, so concurrent workers never materialize the same
+    occurrence twice: the loser of the race sees zero affected rows and skips
+    the rule. Missed periods after downtime are caught up because every due
+    occurrence between ``next_run`` and ``today`` is generated.
+
+    Each shard is processed in turn. Users whose rows are being moved between
+    shards are skipped; the next run catches them up. So is a rule with an
+    occurrence in a currency that has no FX rate for its date: it is logged
+    and left unclaimed, so one bad rule cannot fail the run for everyone
+    else, and it catches up once the rate is loaded.
+
+    Returns a dict of counters for logging and benchmarks.
+    """
+    today = today or date.today()
+    stats = {'rules': 0, 'skipped': 0, 'missing_rate': 0, 'income': 0, 'expenses': 0, 'batches': 0}
+    moving = moving_user_ids()
+    for shard in shard_names():
+        with use_shard(shard):
+            _materialize_shard(today, batch_size, stats, moving)
+
+    logger.info("Materialized recurring rules for %s: %s", today, stats)
+    return stats
+
+
+def _materialize_shard(today, batch_size, stats, moving):
+    last_id = 0
+    while True:
+        query = (RecurringRule.query
+                 .options(joinedload(RecurringRule.category))
+                 .filter(RecurringRule.active.is_(True),
+                         RecurringRule.next_run <= today,
+                         RecurringRule.id > last_id))
+        if moving:
+            query = query.filter(RecurringRule.user_id.notin_(moving))
+        rules = query.order_by(RecurringRule.id).limit(batch_size).all()
+        if not rules:
+            break
+        last_id = rules[-1].id
+
+        user_ids = {rule.user_id for rule in rules}
+        base_currencies = dict(db.session.query(User.id, User.base_currency).filter(User.id.in_(user_ids)))
+        claims, rows_by_rule = [], {}
+        for rule in rules:
+            dates, next_index, next_run = due_occurrences(rule, today)
+            try:
+                for occurrence in dates:
+                    require_rate(rule.currency, base_currencies[rule.user_id], occurrence)
+            except MissingRateError as e:
+                logger.warning("Skipping recurring rule %s of user %s: %s", rule.id, rule.user_id, e)
+                stats['missing_rate'] += 1
+                continue
+            claims.append({'rule_id': rule.id, 'claimed_index': rule.next_index, 'new_index': next_index,
+                           'new_run': next_run, 'new_active': next_run is not None})
+            rows_by_rule[rule.id] = (rule.kind, [_occurrence_row(rule, occurrence) for occurrence in dates])
+
+        if not claims:
+            db.session.expunge_all()
+            continue
+
+        income_rows, expense_rows = [], []
+        try:
+            won = _claim_rules(claims)
+            for claim in won:
+                kind, rows = rows_by_rule[claim['rule_id']]
+                (income_rows if kind == 'income' else expense_rows).extend(rows)
+            stats['rules'] += len(won)
+            stats['skipped'] += len(claims) - len(won)
+
+            stamp_rows(income_rows + expense_rows)
+            changed_days = defaultdict(set)
+            for row in income_rows + expense_rows:
+                changed_days[(row['user_id'], row['revision'])].add(row['date'])
+            for (user_id, revision), days in changed_days.items():
+                note_bulk_change(user_id, days, revision)
+            if income_rows:
+                db.session.execute(Income.__table__.insert(), income_rows)
+            if expense_rows:
+                db.session.execute(Expense.__table__.insert(), expense_rows)
+                apply_spending_deltas(spending_deltas(expense_rows, base_currencies))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            # Drop the loaded rules so memory stays flat across batches
+            db.session.expunge_all()
+        publish_committed()
+
+        stats['income'] += len(income_rows)
+        stats['expenses'] += len(expense_rows)
+        stats['batches'] += 1
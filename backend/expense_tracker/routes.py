@@ -1,17 +1,36 @@
 # backend/expense_tracker/routes.py
 from __future__ import print_function
+import os
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, send_file
 from flask_login import login_required, current_user
 from backend.app_factory import db
-from sqlalchemy.exc import SQLAlchemyError
-from backend.expense_tracker.views import send_feedback_email, export_to_xlsx
-from backend.authentication.models import User
-from backend.expense_tracker.models import Expense, Income, Category, Feedback
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from backend.expense_tracker.views import send_feedback_email, export_to_xlsx, parse_month_range, year_range, period_label, get_or_create_category, stream_period, has_period_rows
+from backend.expense_tracker.recurring import FREQUENCIES, KINDS, first_run
+from backend.expense_tracker.budgets import track_expense_change, budget_report, month_balance, rebuild_spending_totals
+from backend.expense_tracker.search import search_expenses
+from backend.expense_tracker.exports import EXPORT_FORMATS, artifact_path, delete_jobs, expire_orphaned_job, find_or_create_job, job_to_dict
+from backend.expense_tracker.currency import normalize_currency, require_rate, MissingRateError
+from backend.expense_tracker.batch import MAX_BATCH_OPERATIONS, BatchError, run_batch
+from backend.expense_tracker.archive import delete_archive, period_rows
+from backend.expense_tracker.audit import delete_month, restore_month
+from backend.expense_tracker.categories import MAX_MERGE_SOURCES, CategoryConflict, delete_category, list_categories, merge_categories, rename_category
+from backend.expense_tracker.forecast import MAX_FORECAST_MONTHS, user_forecast
+from backend.expense_tracker.live import note_bulk_change, publish_after_response
+from backend.expense_tracker.sync import changes_since, decode_cursor, encode_cursor, revision_cursor
+from backend.authentication.models import User, UserShard
+from backend.expense_tracker.models import Expense, Income, Category, Feedback, RecurringRule, Budget, CategoryMonthTotal, ExportJob, SyncCounter, SyncTombstone, ArchivedYear, AuditEvent, user_rows
+from backend.sharding import UserMovingError, moving_error_response, reject_writes_while_moving
 from backend.authentication.routes import logout_user
 
 
 expense_tracker_bp = Blueprint('expense_tracker', __name__)
+expense_tracker_bp.before_request(reject_writes_while_moving)
+expense_tracker_bp.register_error_handler(UserMovingError, moving_error_response)
+expense_tracker_bp.after_request(publish_after_response)
+
+MAX_SYNC_PAGE = 2000
 
 
 @expense_tracker_bp.route('/income', methods=['POST'])
@@ -23,16 +42,19 @@ def add_income():
     date_str = data.get('date')
 
     date = datetime.strptime(date_str, "%Y-%m-%d").date()  # Ensure date is saved correctly
-    month = date.strftime('%B')
-    year = date.year
 
-    category = Category.query.filter_by(name=category_name, user_id=current_user.id).first()
-    if not category:
-        category = Category(name=category_name, user_id=current_user.id)
-        db.session.add(category)
-        db.session.commit()
+    try:
+        currency = normalize_currency(data.get('currency'), default=current_user.base_currency)
+        require_rate(currency, current_user.base_currency, date)
+    except (ValueError, MissingRateError) as e:
+        return jsonify({'message': str(e)}), 400
 
-    new_income = Income(amount=amount, date=date, month=month, year=year, user_id=current_user.id, category_id=category.id)
+    try:
+        category = get_or_create_category(current_user.id, category_name)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    new_income = Income(amount=amount, currency=currency, date=date, user_id=current_user.id, category_id=category.id)
     db.session.add(new_income)
     db.session.commit()
 
@@ -44,15 +66,22 @@ def view_income():
     month = request.args.get('month')
     year = request.args.get('year')
 
-    if not month or not year:
+    if not month:
         return jsonify({'message': 'Please provide the month and year.'}), 400
 
     try:
-        income_records = Income.query.filter_by(month=month , year=year, user_id=current_user.id).all()
+        start, end = parse_month_range(month, year)
+    except ValueError:
+        return jsonify({'message': 'Invalid year or month format'}), 400
+
+    try:
+        income_records = period_rows(Income, current_user.id, start, end,
+                                     Income.in_period(current_user.id, start, end).order_by(Income.date))
         income_data = [
             {
                 "date": income.date.strftime("%Y-%m-%d"),
                 "amount": f'{income.amount:,}',
+                "currency": income.currency,
                 "category": income.category.name,
                 "month": income.month,
                 "year": income.year
@@ -76,27 +105,25 @@ def update_income(income_id):
 
     session = db.session()  # Explicitly create a session
     try:
+        currency = normalize_currency(data.get('currency'))
         income = Income.query.filter_by(id=income_id, user_id=current_user.id).first()
         if not income:
             return jsonify({'message': 'Income record not found.'}), 404
 
-        category = Category.query.filter_by(name=category_name, user_id=current_user.id).first()
-        if not category:
-            category = Category(name=category_name, user_id=current_user.id)
-            session.add(category)
-            session.commit()
+        category = get_or_create_category(current_user.id, category_name)
 
         date = datetime.strptime(date_str, "%Y-%m-%d").date()  # Ensure date is saved correctly
-        month = date.strftime('%B')
-        year = date.year
 
         income.amount = amount
+        income.currency = currency or income.currency
         income.category_id = category.id
         income.date = date
-        income.month = month
-        income.year = year
+        require_rate(income.currency, current_user.base_currency, date)
 
         session.commit()
+    except (ValueError, MissingRateError) as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         session.rollback()
         return jsonify({'message': f'Error updating income: {str(e)}'}), 500
@@ -114,7 +141,8 @@ def delete_income(income_id):
         if not income:
             return jsonify({'message': 'Income record not found.'}), 404
 
-        session.delete(income)
+        # Soft delete; the row is purged after DELETED_RETENTION_DAYS
+        income.mark_deleted()
         session.commit()
     except Exception as e:
         session.rollback()
@@ -138,26 +166,29 @@ def add_expense():
 
     session = db.session()  # Explicitly create a session
     try:
-        category = Category.query.filter_by(name=category_name, user_id=current_user.id).first()
-        if not category:
-            category = Category(name=category_name, user_id=current_user.id)
-            session.add(category)
-            session.commit()
+        category = get_or_create_category(current_user.id, category_name)
 
         date = datetime.strptime(date_str, '%Y-%m-%d').date()  # Ensure date is saved correctly
-        month = date.strftime('%B')
-        year = date.year
+        currency = normalize_currency(data.get('currency'), default=current_user.base_currency)
+        require_rate(currency, current_user.base_currency, date)
 
-        new_expense = Expense(description=description, amount=amount, category_id=category.id, date=date, month=month, year=year, user_id=current_user.id)
+        new_expense = Expense(description=description, amount=amount, currency=currency, category_id=category.id, date=date, user_id=current_user.id)
         session.add(new_expense)
+        budget = track_expense_change(current_user.id, current_user.base_currency, after=(category.id, date, amount, currency))
         session.commit()
+    except (ValueError, MissingRateError) as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         session.rollback()
         return jsonify({'message': f'Error adding expense: {str(e)}'}), 500
     finally:
         session.close()
 
-    return jsonify({'message': 'Expense added successfully!'}), 201
+    response = {'message': 'Expense added successfully!'}
+    if budget:
+        response['budget'] = budget
+    return jsonify(response), 201
 
 @expense_tracker_bp.route('/monthly-expenses', methods=['GET'])
 @login_required
@@ -165,15 +196,22 @@ def get_expenses():
     month = request.args.get('month')
     year = request.args.get('year')
 
-    if not month or not year:
+    if not month:
         return jsonify({'message': 'Please provide both month and year.'}), 400
 
+    try:
+        start, end = parse_month_range(month, year)
+    except ValueError:
+        return jsonify({'message': 'Invalid year or month format'}), 400
+
     session = db.session()  # Explicitly create a session
     try:
-        expenses = Expense.query.filter_by(month=month, year=year, user_id=current_user.id).all()
+        expenses = period_rows(Expense, current_user.id, start, end,
+                               Expense.in_period(current_user.id, start, end).order_by(Expense.date))
         expense_list = [{
             'description': expense.description,
             'amount': f'{expense.amount:,}',
+            'currency': expense.currency,
             'category': expense.category.name,
             'date': expense.date.strftime('%Y-%m-%d')
         } for expense in expenses]
@@ -184,6 +222,38 @@ def get_expenses():
 
     return jsonify(expense_list), 200
 
+@expense_tracker_bp.route('/search', methods=['GET'])
+@login_required
+def search():
+    query = request.args.get('q', '')
+    page = request.args.get('page', default=1, type=int)
+    per_page = request.args.get('per_page', default=20, type=int)
+    prefix = request.args.get('prefix', 'true').lower() != 'false'
+
+    if page < 1 or not 1 <= per_page <= 100:
+        return jsonify({'message': 'Page must be positive and per_page between 1 and 100.'}), 400
+
+    try:
+        results, has_more = search_expenses(current_user.id, query, page=page, per_page=per_page, prefix=prefix)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Error searching expenses: {str(e)}'}), 500
+
+    return jsonify({
+        'results': [{
+            'id': row.id,
+            'description': row.description,
+            'amount': f'{row.amount:,}',
+            'currency': row.currency,
+            'category': row.category,
+            'date': row.date if isinstance(row.date, str) else row.date.strftime('%Y-%m-%d')
+        } for row in results],
+        'page': page,
+        'per_page': per_page,
+        'has_more': has_more
+    }), 200
+
 @expense_tracker_bp.route('/expense/<int:expense_id>', methods=['PUT'])
 @login_required
 def update_expense(expense_id):
@@ -202,31 +272,34 @@ def update_expense(expense_id):
         if not expense:
             return jsonify({'message': 'Expense record not found.'}), 404
 
-        category = Category.query.filter_by(name=category_name, user_id=current_user.id).first()
-        if not category:
-            category = Category(name=category_name, user_id=current_user.id)
-            session.add(category)
-            session.commit()
+        category = get_or_create_category(current_user.id, category_name)
 
         date = datetime.strptime(date_str, "%Y-%m-%d").date()  # Ensure date is saved correctly
-        month = date.strftime('%B')
-        year = date.year
+        currency = normalize_currency(data.get('currency'), default=expense.currency)
+        require_rate(currency, current_user.base_currency, date)
+        before = (expense.category_id, expense.date, expense.amount, expense.currency)
 
         expense.description = description
         expense.amount = amount
+        expense.currency = currency
         expense.category_id = category.id
         expense.date = date
-        expense.month = month
-        expense.year = year
 
+        budget = track_expense_change(current_user.id, current_user.base_currency, before=before, after=(category.id, date, amount, currency))
         session.commit()
+    except (ValueError, MissingRateError) as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         session.rollback()
         return jsonify({'message': f'Error updating expense: {str(e)}'}), 500
     finally:
         session.close()
 
-    return jsonify({'message': 'Expense updated successfully!'}), 200
+    response = {'message': 'Expense updated successfully!'}
+    if budget:
+        response['budget'] = budget
+    return jsonify(response), 200
 
 @expense_tracker_bp.route('/expense/<int:expense_id>', methods=['DELETE'])
 @login_required
@@ -237,7 +310,10 @@ def delete_expense(expense_id):
         if not expense:
             return jsonify({'message': 'Expense record not found.'}), 404
 
-        session.delete(expense)
+        track_expense_change(current_user.id, current_user.base_currency,
+                             before=(expense.category_id, expense.date, expense.amount, expense.currency))
+        # Soft delete; the row is purged after DELETED_RETENTION_DAYS
+        expense.mark_deleted()
         session.commit()
     except Exception as e:
         session.rollback()
@@ -247,33 +323,80 @@ def delete_expense(expense_id):
 
     return jsonify({'message': 'Expense deleted successfully!'}), 200
 
+@expense_tracker_bp.route('/batch', methods=['POST'])
+@login_required
+def batch_write():
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'message': 'Please provide a list of operations.'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'message': f'A batch can hold at most {MAX_BATCH_OPERATIONS} operations.'}), 400
+
+    session = db.session()  # Explicitly create a session
+    try:
+        results, budgets = run_batch(current_user, operations)
+        session.commit()
+    except BatchError as e:
+        session.rollback()
+        return jsonify({'message': str(e), 'errors': e.errors}), 400
+    except (ValueError, MissingRateError) as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        session.rollback()
+        return jsonify({'message': f'Error applying batch: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify({'message': 'Batch applied successfully!', 'results': results, 'budgets': budgets}), 200
+
 @expense_tracker_bp.route('/balance', methods=['GET'])
 @login_required
 def get_balance():
     month = request.args.get('month')
     year = request.args.get('year')
 
-    if not month or not year:
+    if not month:
         return jsonify({'message': 'Please provide both month and year.'}), 400
 
-    session = db.session()  # Explicitly create a session
     try:
-        income = Income.query.filter_by(month=month, year=year, user_id=current_user.id).all()
-        expenses = Expense.query.filter_by(month=month, year=year, user_id=current_user.id).all()
+        start, end = parse_month_range(month, year)
+    except ValueError:
+        return jsonify({'message': 'Invalid year or month format'}), 400
 
-        total_income = sum(income.amount for income in income)
-        total_expense = sum(expense.amount for expense in expenses)
-        balance = total_income - total_expense if total_income else -total_expense
+    session = db.session()  # Explicitly create a session
+    try:
+        balance = month_balance(current_user.id, current_user.base_currency, start, end)
+    except MissingRateError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Error retrieving balance: {str(e)}'}), 500
     finally:
         session.close()
 
-    return jsonify({
-        'income': f'{total_income:,}' if total_income else '0',
-        'total_expense': f'{total_expense:,}',
-        'balance': f'{balance:,}'
-    }), 200
+    return jsonify(balance), 200
+
+@expense_tracker_bp.route('/forecast', methods=['GET'])
+@login_required
+def get_forecast():
+    months = request.args.get('months', default=6, type=int)
+
+    if not 1 <= months <= MAX_FORECAST_MONTHS:
+        return jsonify({'message': f'Months must be between 1 and {MAX_FORECAST_MONTHS}.'}), 400
+
+    session = db.session()  # Explicitly create a session
+    try:
+        forecast = user_forecast(current_user, months)
+    except MissingRateError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Error computing forecast: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify(forecast), 200
 
 @expense_tracker_bp.route('/reset_income', methods=['POST'])
 @login_required
@@ -282,24 +405,30 @@ def reset_income():
     month = data.get('month')
     year = data.get('year')
 
-    if not month or not year:
+    if not month:
         return jsonify({'message': 'Please provide both month and year.'}), 400
 
+    try:
+        start, end = parse_month_range(month, year)
+    except ValueError:
+        return jsonify({'message': 'Invalid year or month format'}), 400
+
+    label = period_label(start)
     session = db.session()  # Explicitly create a session
     try:
-        income = Income.query.filter_by(month=month, year=year, user_id=current_user.id).first()
+        income = Income.in_period(current_user.id, start, end).order_by(Income.date, Income.id).first()
         if income:
             income.amount = 0
             session.commit()
         else:
-            return jsonify({'message': f'No income record found for {month} {year}.'}), 404
+            return jsonify({'message': f'No income record found for {label}.'}), 404
     except Exception as e:
         session.rollback()
         return jsonify({'message': f'Error resetting income: {str(e)}'}), 500
     finally:
         session.close()
 
-    return jsonify({'message': f'Income for {month} {year} reset to zero.'}), 200
+    return jsonify({'message': f'Income for {label} reset to zero.'}), 200
 
 @expense_tracker_bp.route('/reset_expenses', methods=['POST'])
 @login_required
@@ -308,25 +437,445 @@ def reset_expenses():
     month = data.get('month')
     year = data.get('year')
 
-    if not month or not year:
+    if not month:
         return jsonify({'message': 'Please provide both month and year.'}), 400
 
+    try:
+        start, end = parse_month_range(month, year)
+    except ValueError:
+        return jsonify({'message': 'Invalid year or month format'}), 400
+
+    label = period_label(start)
     session = db.session()  # Explicitly create a session
     try:
-        expenses = Expense.query.filter_by(month=month, year=year, user_id=current_user.id).all()
-        if expenses:
-            for expense in expenses:
-                session.delete(expense)
+        deleted = delete_month(current_user.id, start, end)
+        if deleted:
+            # The whole month is gone, so its running totals are simply zero
+            CategoryMonthTotal.query.filter_by(user_id=current_user.id, month_start=start).delete()
+            note_bulk_change(current_user.id, [start])
             session.commit()
         else:
-            return jsonify({'message': f'No expenses found for {month} {year}.'}), 404
+            return jsonify({'message': f'No expenses found for {label}.'}), 404
     except Exception as e:
         session.rollback()
         return jsonify({'message': f'Error resetting expenses: {str(e)}'}), 500
     finally:
         session.close()
 
-    return jsonify({'message': f'Expenses for {month} {year} have been deleted.'}), 200
+    return jsonify({'message': f'Expenses for {label} have been deleted.'}), 200
+
+@expense_tracker_bp.route('/reset_expenses/undo', methods=['POST'])
+@login_required
+def undo_reset_expenses():
+    data = request.get_json()
+    month = data.get('month')
+    year = data.get('year')
+
+    if not month:
+        return jsonify({'message': 'Please provide both month and year.'}), 400
+
+    try:
+        start, end = parse_month_range(month, year)
+    except ValueError:
+        return jsonify({'message': 'Invalid year or month format'}), 400
+
+    label = period_label(start)
+    session = db.session()  # Explicitly create a session
+    try:
+        restored, revision = restore_month(current_user, start, end)
+        if restored:
+            note_bulk_change(current_user.id, [start], revision)
+            session.commit()
+        else:
+            return jsonify({'message': f'No reset of {label} left to undo.'}), 404
+    except MissingRateError as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        session.rollback()
+        return jsonify({'message': f'Error restoring expenses: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify({'message': f'Restored {restored} expenses for {label}.', 'restored': restored}), 200
+
+@expense_tracker_bp.route('/sync', methods=['GET'])
+@login_required
+def sync_changes():
+    since = request.args.get('since', default=0, type=int)
+    limit = request.args.get('limit', default=500, type=int)
+    token = request.args.get('cursor')
+
+    if not 1 <= limit <= MAX_SYNC_PAGE:
+        return jsonify({'message': f'Limit must be between 1 and {MAX_SYNC_PAGE}.'}), 400
+
+    try:
+        cursor = decode_cursor(token) if token else revision_cursor(since)
+    except ValueError:
+        return jsonify({'message': 'Invalid cursor.'}), 400
+
+    try:
+        changes, next_cursor = changes_since(current_user.id, cursor, limit)
+    except SQLAlchemyError as e:
+        return jsonify({'message': f'Error retrieving changes: {str(e)}'}), 500
+
+    response = {'changes': changes, 'next_cursor': encode_cursor(next_cursor) if next_cursor else None}
+    if next_cursor is None:
+        # Only the last page's revision is safe to resume from with ?since=
+        response['revision'] = changes[-1]['revision'] if changes else cursor[0]
+    return jsonify(response), 200
+
+@expense_tracker_bp.route('/recurring', methods=['POST'])
+@login_required
+def add_recurring_rule():
+    data = request.get_json()
+    kind = data.get('type')
+    amount = data.get('amount')
+    category_name = data.get('category')
+    frequency = data.get('frequency', 'monthly')
+    start_str = data.get('start_date')
+    end_str = data.get('end_date')
+
+    if not kind or not amount or not category_name or not start_str:
+        return jsonify({'message': 'Please provide all required fields.'}), 400
+
+    if kind not in KINDS or frequency not in FREQUENCIES:
+        return jsonify({'message': f'Type must be one of {KINDS} and frequency one of {FREQUENCIES}.'}), 400
+
+    try:
+        currency = normalize_currency(data.get('currency'), default=current_user.base_currency)
+        interval = int(data.get('interval', 1))
+        start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else None
+    except ValueError:
+        return jsonify({'message': 'Invalid date, interval or currency format'}), 400
+
+    if interval < 1:
+        return jsonify({'message': 'Interval must be at least 1.'}), 400
+
+    try:
+        # Occurrences convert from their own date on, so the first must have a rate
+        require_rate(currency, current_user.base_currency, start_date)
+    except MissingRateError as e:
+        return jsonify({'message': str(e)}), 400
+
+    session = db.session()  # Explicitly create a session
+    try:
+        category = get_or_create_category(current_user.id, category_name)
+
+        rule = RecurringRule(kind=kind, amount=amount, currency=currency, description=data.get('description'), frequency=frequency,
+                             interval=interval, start_date=start_date, end_date=end_date, next_index=0,
+                             category_id=category.id, user_id=current_user.id)
+        rule.next_run = first_run(rule)
+        rule.active = rule.next_run is not None
+        session.add(rule)
+        session.commit()
+        rule_id = rule.id
+    except ValueError as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        session.rollback()
+        return jsonify({'message': f'Error adding recurring rule: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify({'message': 'Recurring rule added successfully!', 'id': rule_id}), 201
+
+@expense_tracker_bp.route('/recurring', methods=['GET'])
+@login_required
+def list_recurring_rules():
+    try:
+        rules = RecurringRule.query.filter_by(user_id=current_user.id).order_by(RecurringRule.id).all()
+        rule_list = [{
+            'id': rule.id,
+            'type': rule.kind,
+            'amount': f'{rule.amount:,}',
+            'currency': rule.currency,
+            'description': rule.description,
+            'category': rule.category.name,
+            'frequency': rule.frequency,
+            'interval': rule.interval,
+            'start_date': rule.start_date.strftime('%Y-%m-%d'),
+            'end_date': rule.end_date.strftime('%Y-%m-%d') if rule.end_date else None,
+            'next_run': rule.next_run.strftime('%Y-%m-%d') if rule.next_run else None,
+            'active': rule.active
+        } for rule in rules]
+    except Exception as e:
+        return jsonify({'message': f'Error retrieving recurring rules: {str(e)}'}), 500
+
+    return jsonify(rule_list), 200
+
+@expense_tracker_bp.route('/recurring/<int:rule_id>', methods=['DELETE'])
+@login_required
+def delete_recurring_rule(rule_id):
+    session = db.session()  # Explicitly create a session
+    try:
+        rule = RecurringRule.query.filter_by(id=rule_id, user_id=current_user.id).first()
+        if not rule:
+            return jsonify({'message': 'Recurring rule not found.'}), 404
+
+        # Keep the rule row so already materialized entries retain their link
+        rule.active = False
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        return jsonify({'message': f'Error deleting recurring rule: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify({'message': 'Recurring rule deleted successfully!'}), 200
+
+@expense_tracker_bp.route('/categories', methods=['GET'])
+@login_required
+def get_categories():
+    include_stats = request.args.get('stats', 'false').lower() == 'true'
+
+    try:
+        categories = list_categories(current_user.id, include_stats)
+    except Exception as e:
+        return jsonify({'message': f'Error retrieving categories: {str(e)}'}), 500
+
+    return jsonify(categories), 200
+
+@expense_tracker_bp.route('/categories', methods=['POST'])
+@login_required
+def add_category():
+    data = request.get_json()
+    name = data.get('name')
+
+    if not name:
+        return jsonify({'message': 'Please provide the category name.'}), 400
+
+    session = db.session()  # Explicitly create a session
+    try:
+        if Category.named(current_user.id, name).first():
+            return jsonify({'message': 'Category already exists.'}), 409
+
+        category = Category(name=name, user_id=current_user.id)
+        session.add(category)
+        session.commit()
+        result = {'id': category.id, 'name': category.name}
+    except ValueError as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except IntegrityError:
+        # Another request created the same name first
+        session.rollback()
+        return jsonify({'message': 'Category already exists.'}), 409
+    except Exception as e:
+        session.rollback()
+        return jsonify({'message': f'Error adding category: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify({'message': 'Category added successfully!', **result}), 201
+
+@expense_tracker_bp.route('/categories/<int:category_id>', methods=['PUT'])
+@login_required
+def update_category(category_id):
+    data = request.get_json()
+    name = data.get('name')
+
+    if not name:
+        return jsonify({'message': 'Please provide the category name.'}), 400
+
+    session = db.session()  # Explicitly create a session
+    try:
+        category = Category.query.filter_by(id=category_id, user_id=current_user.id).first()
+        if not category:
+            return jsonify({'message': 'Category not found.'}), 404
+
+        rename_category(category, name)
+        session.commit()
+        result = {'id': category.id, 'name': category.name}
+    except CategoryConflict as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 409
+    except ValueError as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except IntegrityError:
+        # Another request created the same name first
+        session.rollback()
+        return jsonify({'message': 'Category already exists.'}), 409
+    except Exception as e:
+        session.rollback()
+        return jsonify({'message': f'Error renaming category: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify({'message': 'Category renamed successfully!', **result}), 200
+
+@expense_tracker_bp.route('/categories/<int:category_id>', methods=['DELETE'])
+@login_required
+def remove_category(category_id):
+    session = db.session()  # Explicitly create a session
+    try:
+        category = Category.query.filter_by(id=category_id, user_id=current_user.id).first()
+        if not category:
+            return jsonify({'message': 'Category not found.'}), 404
+
+        delete_category(category)
+        session.commit()
+    except CategoryConflict as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 409
+    except Exception as e:
+        session.rollback()
+        return jsonify({'message': f'Error deleting category: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify({'message': 'Category deleted successfully!'}), 200
+
+@expense_tracker_bp.route('/categories/merge', methods=['POST'])
+@login_required
+def merge_category():
+    data = request.get_json(silent=True) or {}
+    sources = data.get('sources')
+    target = data.get('target')
+
+    if (not isinstance(sources, list) or not sources
+            or not all(type(source) is int for source in sources) or type(target) is not int):
+        return jsonify({'message': 'Please provide a list of source category ids and a target category id.'}), 400
+    if len(sources) > MAX_MERGE_SOURCES:
+        return jsonify({'message': f'At most {MAX_MERGE_SOURCES} categories can be merged at once.'}), 400
+    if target in sources:
+        return jsonify({'message': 'The target category cannot also be a source.'}), 400
+
+    session = db.session()  # Explicitly create a session
+    try:
+        ids = {target, *sources}
+        found = Category.query.filter(Category.user_id == current_user.id, Category.id.in_(ids)).count()
+        if found != len(ids):
+            return jsonify({'message': 'Category not found.'}), 404
+
+        moved, revision = merge_categories(current_user.id, sources, target)
+        note_bulk_change(current_user.id, [], revision)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        return jsonify({'message': f'Error merging categories: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify({'message': 'Categories merged successfully!', 'moved': moved}), 200
+
+@expense_tracker_bp.route('/budgets', methods=['POST'])
+@login_required
+def set_budget():
+    data = request.get_json()
+    category_name = data.get('category')
+    limit_amount = data.get('limit')
+    alert_threshold = data.get('alert_threshold', 80)
+
+    if not category_name or limit_amount is None:
+        return jsonify({'message': 'Please provide the category and limit.'}), 400
+
+    try:
+        limit_amount = float(limit_amount)
+        alert_threshold = int(alert_threshold)
+    except (TypeError, ValueError):
+        return jsonify({'message': 'Invalid limit or alert threshold.'}), 400
+
+    if limit_amount <= 0 or not 1 <= alert_threshold <= 100:
+        return jsonify({'message': 'Limit must be positive and the alert threshold between 1 and 100.'}), 400
+
+    session = db.session()  # Explicitly create a session
+    try:
+        category = get_or_create_category(current_user.id, category_name)
+        budget = Budget.query.filter_by(user_id=current_user.id, category_id=category.id).first()
+        if budget:
+            budget.limit_amount = limit_amount
+            budget.alert_threshold = alert_threshold
+        else:
+            budget = Budget(limit_amount=limit_amount, alert_threshold=alert_threshold,
+                            category_id=category.id, user_id=current_user.id)
+            session.add(budget)
+        session.commit()
+        budget_id = budget.id
+    except ValueError as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        session.rollback()
+        return jsonify({'message': f'Error saving budget: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify({'message': 'Budget saved successfully!', 'id': budget_id}), 200
+
+@expense_tracker_bp.route('/budgets', methods=['GET'])
+@login_required
+def get_budgets():
+    month = request.args.get('month')
+    year = request.args.get('year')
+
+    try:
+        start, _ = parse_month_range(month or datetime.now().strftime('%Y-%m'), year)
+    except ValueError:
+        return jsonify({'message': 'Invalid year or month format'}), 400
+
+    try:
+        budgets = budget_report(current_user.id, start)
+    except Exception as e:
+        return jsonify({'message': f'Error retrieving budgets: {str(e)}'}), 500
+
+    return jsonify(budgets), 200
+
+@expense_tracker_bp.route('/budgets/<int:budget_id>', methods=['DELETE'])
+@login_required
+def delete_budget(budget_id):
+    session = db.session()  # Explicitly create a session
+    try:
+        budget = Budget.query.filter_by(id=budget_id, user_id=current_user.id).first()
+        if not budget:
+            return jsonify({'message': 'Budget not found.'}), 404
+
+        session.delete(budget)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        return jsonify({'message': f'Error deleting budget: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify({'message': 'Budget deleted successfully!'}), 200
+
+@expense_tracker_bp.route('/base-currency', methods=['PUT'])
+@login_required
+def set_base_currency():
+    data = request.get_json()
+
+    try:
+        currency = normalize_currency(data.get('currency'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if not currency:
+        return jsonify({'message': 'Please provide the currency.'}), 400
+
+    session = db.session()  # Explicitly create a session
+    try:
+        user = User.query.get(current_user.id)
+        if currency != user.base_currency and ArchivedYear.query.filter_by(user_id=user.id).first():
+            # Archived months keep their budget totals, which cannot be converted anew
+            return jsonify({'message': 'The base currency cannot be changed once years have been archived.'}), 409
+        user.base_currency = currency
+        # Budget totals are kept in the base currency, so convert them anew
+        rebuild_spending_totals(user_id=user.id)
+        session.commit()
+    except MissingRateError as e:
+        session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        session.rollback()
+        return jsonify({'message': f'Error updating base currency: {str(e)}'}), 500
+    finally:
+        session.close()
+
+    return jsonify({'message': f'Base currency set to {currency}.'}), 200
 
 @expense_tracker_bp.route('/feedback', methods=['POST'])
 @login_required
@@ -348,11 +897,11 @@ def submit_feedback():
 
     except SQLAlchemyError as e:
         session.rollback()
-        current_app.logger.error(f"Database error: {str(e)}")
+        current_app.logger.error("Database error: %s", e)
         return jsonify({'message': f'Error submitting feedback: {str(e)}'}), 500
     except Exception as e:
         session.rollback()
-        current_app.logger.error(f"Unexpected error: {str(e)}")
+        current_app.logger.error("Unexpected error: %s", e)
         return jsonify({'message': f'Error submitting feedback: {str(e)}'}), 500
     finally:
         session.close()
@@ -365,29 +914,20 @@ def export_monthly_data():
     month = request.args.get('month')
     year = request.args.get('year')
 
-    if not month or not year:
+    if not month:
         return jsonify({'message': 'Please provide both month and year'}), 400
 
     try:
-        year = int(year)
-        month_number = datetime.strptime(month, '%B').month
+        start, end = parse_month_range(month, year)
 
-        # Fetch income and expenses based on the provided month and year
-        income = Income.query.filter(Income.year == year, 
-                                     Income.month == month, 
-                                     Income.user_id == current_user.id).all()
-                                     
-        start_date = datetime(year, month_number, 1)
-        end_date = datetime(year, month_number + 1, 1)
+        if not has_period_rows(current_user.id, start, end):
+            return jsonify({'message': f'No data available for {period_label(start)}'}), 404
 
-        expenses = Expense.query.filter(Expense.date >= start_date, 
-                                        Expense.date < end_date, 
-                                        Expense.user_id == current_user.id).all()
+        # Stream income and expenses for the provided month and year
+        income = stream_period(Income, current_user.id, start, end)
+        expenses = stream_period(Expense, current_user.id, start, end)
 
-        if not income and not expenses:
-            return jsonify({'message': f'No data available for {month} {year}'}), 404
-
-        filename = f"{current_user.name}_monthly_{month}_{year}.xlsx"
+        filename = f"{current_user.name}_monthly_{start.strftime('%B')}_{start.year}.xlsx"
         return export_to_xlsx(income, expenses, filename)
     except ValueError:
         return jsonify({'message': 'Invalid year or month format'}), 400
@@ -400,41 +940,124 @@ def export_yearly_data():
     year = request.args.get('year', default=datetime.now().year, type=int)
 
     try:
-        # Fetch income and expenses based on the provided year
-        income = Income.query.filter(Income.year == year, Income.user_id == current_user.id).all()
-        expenses = Expense.query.filter(Expense.date >= datetime(year, 1, 1), 
-                                        Expense.date < datetime(year + 1, 1, 1), 
-                                        Expense.user_id == current_user.id).all()
-
-        if not income and not expenses:
+        start, end = year_range(year)
+        if not has_period_rows(current_user.id, start, end):
             return jsonify({'message': f'No data available for {year}'}), 404
 
+        # Stream income and expenses for the provided year
+        income = stream_period(Income, current_user.id, start, end)
+        expenses = stream_period(Expense, current_user.id, start, end)
+
         filename = f"{current_user.name}_yearly_{year}.xlsx"
         return export_to_xlsx(income, expenses, filename)
     except Exception as e:
         return jsonify({'message': f'Error exporting yearly data: {str(e)}'}), 500
 
+@expense_tracker_bp.route('/exports', methods=['POST'])
+@login_required
+def create_export():
+    data = request.get_json() or {}
+    month = data.get('month')
+    year = data.get('year')
+    fmt = data.get('format', 'xlsx')
+
+    if not year and not month:
+        return jsonify({'message': 'Please provide the year, and the month for a monthly export.'}), 400
+
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'message': f'Format must be one of {sorted(EXPORT_FORMATS)}.'}), 400
+
+    try:
+        if month:
+            start, end = parse_month_range(month, year)
+            filename = f"{current_user.name}_monthly_{start.strftime('%B')}_{start.year}.{fmt}"
+        else:
+            start, end = year_range(year)
+            filename = f"{current_user.name}_yearly_{start.year}.{fmt}"
+    except ValueError:
+        return jsonify({'message': 'Invalid year or month format'}), 400
+
+    try:
+        job, created = find_or_create_job(current_user.id, start, end, fmt, filename)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error creating export: {str(e)}'}), 500
+
+    # 200 when a finished export is reused, 202 while one is being built
+    return jsonify(job_to_dict(job)), 200 if job.status == 'done' else 202
+
+@expense_tracker_bp.route('/exports/<job_id>', methods=['GET'])
+@login_required
+def get_export(job_id):
+    job = ExportJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
+        return jsonify({'message': 'Export not found'}), 404
+
+    # A job lost with a restarted worker would otherwise stay pending
+    expire_orphaned_job(job)
+    return jsonify(job_to_dict(job)), 200
+
+@expense_tracker_bp.route('/exports/<job_id>/download', methods=['GET'])
+@login_required
+def download_export(job_id):
+    job = ExportJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
+        return jsonify({'message': 'Export not found'}), 404
+
+    if job.status != 'done':
+        return jsonify({'message': f'Export is {job.status}, not ready for download.'}), 409
+
+    path = artifact_path(job)
+    if not os.path.exists(path):
+        return jsonify({'message': 'Export file has expired. Please request it again.'}), 410
+
+    # conditional=True adds ETag/Last-Modified and serves Range requests
+    return send_file(path, mimetype=EXPORT_FORMATS[job.format][2], download_name=job.filename,
+                     as_attachment=True, conditional=True)
+
 @expense_tracker_bp.route('/delete_account', methods=['DELETE'])
 @login_required
 def delete_account():
     session = db.session()  # Explicitly create a session
     try:
-        # Delete all expenses associated with the user
-        Expense.query.filter_by(user_id=current_user.id).delete()
+        user_id = current_user.id
+
+        # Delete all expenses associated with the user, soft-deleted ones included
+        Expense.query.filter(user_rows(Expense.__table__, user_id)).delete(synchronize_session=False)
         
-        # Delete all income records associated with the user
-        Income.query.filter_by(user_id=current_user.id).delete()
+        # Delete all income records associated with the user, soft-deleted ones included
+        Income.query.filter(user_rows(Income.__table__, user_id)).delete(synchronize_session=False)
+
+        # Delete all recurring rules associated with the user
+        RecurringRule.query.filter_by(user_id=current_user.id).delete()
+
+        # Delete all budgets and their running totals associated with the user
+        Budget.query.filter_by(user_id=current_user.id).delete()
+        CategoryMonthTotal.query.filter_by(user_id=current_user.id).delete()
+
+        # Delete all exports and their files associated with the user
+        delete_jobs(ExportJob.query.filter_by(user_id=current_user.id))
+
+        # Delete the archive index associated with the user; the files go after the commit
+        ArchivedYear.query.filter_by(user_id=current_user.id).delete()
+
+        # Delete the audit log associated with the user
+        AuditEvent.query.filter_by(user_id=current_user.id).delete()
 
         # Delete all feedback associated with the user
         Feedback.query.filter_by(user_id=current_user.id).delete()
         
-        # Delete all categories associated with the user
+        # Delete all categories and the sync history associated with the user
         Category.query.filter_by(user_id=current_user.id).delete()
+        SyncTombstone.query.filter_by(user_id=current_user.id).delete()
+        SyncCounter.query.filter_by(user_id=current_user.id).delete()
         
-        # Finally, delete the user account
+        # Finally, delete the user account and its shard map entry
+        UserShard.query.filter_by(user_id=current_user.id).delete()
         User.query.filter_by(id=current_user.id).delete()
 
         session.commit()
+        delete_archive(user_id)
 
         # Log out the user
         logout_user()
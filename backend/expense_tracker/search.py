@@ -0,0 +1,231 @@
+# backend/expense_tracker/search.py
+import re
+from sqlalchemy import DDL, event, text
+from backend.app_factory import db
+from backend.expense_tracker.models import Expense
+from backend.sharding import shard_names, use_shard
+
+
+# SQLite: FTS5 tables keyed by expense and category id, kept in sync by
+# triggers so every write path (ORM, bulk Core inserts, set-based deletes)
+# updates them without application code. Soft-deleted expenses leave the
+# index and restored ones rejoin it. Category names are indexed once per
+# category and joined to expenses at query time, so renaming or merging a
+# category rewrites one index row rather than one per expense. The owner
+# columns hold a "u<user_id>" token so a user's search only intersects that
+# user's doclists.
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS expense_search USING fts5(
+        owner, description,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4 5 6'
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS category_search USING fts5(
+        owner, name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4 5 6'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_search_insert AFTER INSERT ON expenses
+    WHEN new.deleted_at IS NULL BEGIN
+        INSERT INTO expense_search (rowid, owner, description) VALUES (new.id, 'u' || new.user_id, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_search_soft_delete AFTER UPDATE OF deleted_at ON expenses
+    WHEN old.deleted_at IS NULL AND new.deleted_at IS NOT NULL BEGIN
+        DELETE FROM expense_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_search_restore AFTER UPDATE OF deleted_at ON expenses
+    WHEN old.deleted_at IS NOT NULL AND new.deleted_at IS NULL BEGIN
+        INSERT INTO expense_search (rowid, owner, description) VALUES (new.id, 'u' || new.user_id, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_search_update AFTER UPDATE OF description, user_id ON expenses BEGIN
+        UPDATE expense_search SET owner = 'u' || new.user_id, description = new.description WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS expenses_search_delete AFTER DELETE ON expenses BEGIN
+        DELETE FROM expense_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS categories_search_insert AFTER INSERT ON categories BEGIN
+        INSERT INTO category_search (rowid, owner, name) VALUES (new.id, 'u' || new.user_id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS categories_search_update AFTER UPDATE OF name, user_id ON categories BEGIN
+        UPDATE category_search SET owner = 'u' || new.user_id, name = new.name WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS categories_search_delete AFTER DELETE ON categories BEGIN
+        DELETE FROM category_search WHERE rowid = old.id;
+    END""",
+]
+
+SQLITE_SEARCH_TABLES = re.findall(r'CREATE VIRTUAL TABLE IF NOT EXISTS (\w+)', ' '.join(SQLITE_SEARCH_DDL))
+SQLITE_SEARCH_TRIGGERS = re.findall(r'CREATE TRIGGER IF NOT EXISTS (\w+)', ' '.join(SQLITE_SEARCH_DDL))
+# Wrote category names into expense_search before they moved to category_search
+LEGACY_SEARCH_TRIGGERS = ('categories_search_rename',)
+
+# PostgreSQL: expression GIN indexes, so no extra table has to be kept in sync.
+POSTGRES_SEARCH_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_expenses_description_fts ON expenses USING GIN (to_tsvector('simple', description))",
+    "CREATE INDEX IF NOT EXISTS ix_categories_name_fts ON categories USING GIN (to_tsvector('simple', name))",
+]
+
+# create_all() builds them with the tables; migration 0010 holds frozen copies
+# for databases built by `flask init-db`, so changes here need a new revision
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Expense.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(Expense.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# bm25 has to score every match, which costs tens of milliseconds once a query
+# matches tens of thousands of rows. Queries broader than this many matches
+# are returned newest first instead, where relevance adds little anyway.
+RANKING_WINDOW = 2000
+
+
+# Raw SQL names no mapped table, so tell the session which shard it targets
+EXPENSES_BIND = {'mapper': Expense}
+
+
+def _dialect():
+    return db.session.get_bind(Expense).dialect.name
+
+
+def query_terms(query):
+    return TOKEN_PATTERN.findall((query or '').lower())
+
+
+def _sqlite_match(user_id, column, terms, prefix):
+    quoted = [f'"{term}"' for term in terms]
+    if prefix:
+        # Type-ahead: the word being typed matches as a prefix
+        quoted[-1] += '*'
+    return f"owner:u{int(user_id)} AND {column} : ({' '.join(quoted)})"
+
+
+def _matching_categories(user_id, terms, prefix):
+    """Return ``{category_id: score}`` for the user's categories whose name holds every term."""
+    return dict(db.session.execute(text("""
+        SELECT rowid, 0.5 * bm25(category_search, 0.0, 1.0) FROM category_search WHERE category_search MATCH :match
+    """), {'match': _sqlite_match(user_id, 'name', terms, prefix)}, bind_arguments=EXPENSES_BIND).all())
+
+
+def _sqlite_matches(categories, scored=False, distinct=False):
+    """SQL for the ``id`` (and ``score``) of expenses matching by description or by one of ``categories``.
+
+    An expense matching both ways is listed twice unless ``distinct``.
+
+    The category ids are spelled out rather than joined to ``category_search``:
+    SQLite would otherwise probe the FTS table once per expense of the user.
+    """
+    score = ', bm25(expense_search, 0.0, 1.0) AS score' if scored else ''
+    matches = f"SELECT rowid AS id{score} FROM expense_search WHERE expense_search MATCH :match"
+    if categories:
+        cases = ' '.join(f'WHEN {int(category_id)} THEN {float(category_score)!r}'
+                         for category_id, category_score in categories.items())
+        score = f', CASE category_id {cases} END AS score' if scored else ''
+        matches += f"""
+            UNION {'' if distinct else 'ALL'}
+            SELECT id{score} FROM expenses
+            WHERE user_id = :user_id AND deleted_at IS NULL
+              AND category_id IN ({', '.join(str(int(category_id)) for category_id in categories)})
+        """
+    return matches
+
+
+def _postgres_tsquery(terms, prefix):
+    parts = list(terms)
+    if prefix:
+        parts[-1] += ':*'
+    return ' & '.join(parts)
+
+
+def search_expenses(user_id, query, page=1, per_page=20, prefix=True):
+    """Return ``(results, has_more)`` for a ranked full-text search of a user's expenses.
+
+    An expense matches when its description, or its category's name, holds
+    every word of ``query``. Results come best match first (newest first on
+    SQLite when more than ``RANKING_WINDOW`` rows match). Raises
+    ``ValueError`` if ``query`` has no searchable words.
+    """
+    terms = query_terms(query)
+    if not terms:
+        raise ValueError('Search query must contain at least one word.')
+
+    params = {'limit': per_page + 1, 'offset': (page - 1) * per_page}
+    if _dialect() == 'postgresql':
+        params.update(user_id=user_id, tsquery=_postgres_tsquery(terms, prefix))
+        sql = text("""
+            SELECT e.id, e.description, e.amount, e.currency, e.date, c.name AS category
+            FROM expenses e JOIN categories c ON c.id = e.category_id,
+                 to_tsquery('simple', :tsquery) q
+            WHERE e.user_id = :user_id AND e.deleted_at IS NULL
+              AND (to_tsvector('simple', e.description) @@ q OR to_tsvector('simple', c.name) @@ q)
+            ORDER BY ts_rank(to_tsvector('simple', e.description), q)
+                     + 0.5 * ts_rank(to_tsvector('simple', c.name), q) DESC, e.date DESC
+            LIMIT :limit OFFSET :offset
+        """)
+    else:
+        params.update(user_id=user_id, match=_sqlite_match(user_id, 'description', terms, prefix))
+        categories = _matching_categories(user_id, terms, prefix)
+        # Every match is scored, so count both ways of matching
+        broad = db.session.execute(text(f"""
+            SELECT count(*) FROM ({_sqlite_matches(categories)} LIMIT :window)
+        """), {**params, 'window': RANKING_WINDOW + 1}, bind_arguments=EXPENSES_BIND).scalar() > RANKING_WINDOW
+        if broad:
+            # Both ways of matching come in id order, so SQLite merges them
+            # and stops after one page
+            matches = ''
+            page = f"""
+                SELECT id, -id AS score FROM (
+                    {_sqlite_matches(categories, distinct=True)} ORDER BY id DESC LIMIT :limit OFFSET :offset
+                )
+            """
+        else:
+            # bm25() only works in the query over its FTS table, so keep SQLite
+            # from flattening that into the grouping. Matching both ways adds
+            # up both scores
+            matches = f"WITH matches AS MATERIALIZED ({_sqlite_matches(categories, scored=True)})"
+            page = "SELECT id, sum(score) AS score FROM matches GROUP BY id ORDER BY score LIMIT :limit OFFSET :offset"
+        sql = text(f"""
+            {matches}
+            SELECT e.id, e.description, e.amount, e.currency, e.date, c.name AS category
+            -- Order and page the matches first so only one page is joined
+            FROM ({page}) s
+            JOIN expenses e ON e.id = s.id
+            JOIN categories c ON c.id = e.category_id
+            ORDER BY s.score
+        """)
+
+    rows = db.session.execute(sql, params, bind_arguments=EXPENSES_BIND).all()
+    return rows[:per_page], len(rows) > per_page
+
+
+def rebuild_search_index():
+    """Create the search index if missing and repopulate it from the expenses table, on every shard."""
+    for shard in shard_names():
+        with use_shard(shard):
+            _rebuild_shard_index()
+            db.session.commit()
+
+
+def _rebuild_shard_index():
+    def execute(statement):
+        db.session.execute(text(statement), bind_arguments=EXPENSES_BIND)
+
+    if _dialect() == 'postgresql':
+        for statement in POSTGRES_SEARCH_DDL:
+            execute(statement)
+    else:
+        # Recreate rather than empty the tables, and the triggers with them,
+        # so tokenizer/prefix and trigger changes apply
+        for table in SQLITE_SEARCH_TABLES:
+            execute(f"DROP TABLE IF EXISTS {table}")
+        for trigger in (*SQLITE_SEARCH_TRIGGERS, *LEGACY_SEARCH_TRIGGERS):
+            execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        for statement in SQLITE_SEARCH_DDL:
+            execute(statement)
+        execute("""
+            INSERT INTO expense_search (rowid, owner, description)
+            SELECT id, 'u' || user_id, description FROM expenses WHERE deleted_at IS NULL
+        """)
+        execute("INSERT INTO category_search (rowid, owner, name) SELECT id, 'u' || user_id, name FROM categories")
+        for table in SQLITE_SEARCH_TABLES:
+            execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
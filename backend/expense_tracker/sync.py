@@ -0,0 +1,189 @@
+# backend/expense_tracker/sync.py
+"""Per-user change feed for clients that keep a local replica.
+
+Every write to a user's categories, income or expenses stamps the rows with
+the user's next revision, and deletes leave a ``SyncTombstone`` carrying it.
+``changes_since`` then returns what changed after a revision the client has
+already seen.
+
+ORM writes are stamped automatically in ``before_flush``; soft-deleting a row
+(``mark_deleted``) counts as deleting it. Bulk Core writes must call
+``stamp_rows`` before inserting and ``delete_rows`` to delete.
+"""
+import heapq
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import and_, event, insert, literal, or_, select
+from sqlalchemy.orm import Session
+from backend.app_factory import db
+from backend.expense_tracker.models import Category, Expense, Income, SyncCounter, SyncTombstone
+from backend.expense_tracker.views import dialect_insert
+from backend.sharding import fence_writes
+
+# Synced models, in the order their changes are listed within one revision;
+# tombstones come last
+ENTITIES = {'category': Category, 'income': Income, 'expense': Expense}
+ENTITY_NAMES = {model: name for name, model in ENTITIES.items()}
+TOMBSTONES = len(ENTITIES)
+
+
+def next_revisions(session, user_ids):
+    """Advance each user's revision counter by one; returns ``{user_id: revision}``.
+
+    The counter upsert locks the users' counter rows until the transaction
+    ends, so one user's writes commit in revision order. A client that has
+    seen revision ``n`` can therefore never miss a smaller one committed
+    later. The same lock fences the writes against a move of the user to
+    another shard (see ``fence_writes``).
+    """
+    counters = SyncCounter.__table__
+    user_ids = sorted(set(user_ids))
+    # Users start at revision 1, so a missing counter row is created at 2
+    bump = dialect_insert()(counters).values([{'user_id': user_id, 'revision': 2} for user_id in user_ids])
+    bump = bump.on_conflict_do_update(index_elements=[counters.c.user_id],
+                                      set_={'revision': counters.c.revision + 1})
+    if session.get_bind(clause=counters).dialect.insert_returning:
+        revisions = dict(session.execute(bump.returning(counters.c.user_id, counters.c.revision)).all())
+    else:
+        session.execute(bump)
+        revisions = dict(session.execute(select(counters.c.user_id, counters.c.revision)
+                                         .where(counters.c.user_id.in_(user_ids))).all())
+    fence_writes(session, user_ids, locked=True)
+    return revisions
+
+
+def current_revision(user_id):
+    """Return the last revision handed out to ``user_id``'s rows."""
+    revision = db.session.query(SyncCounter.revision).filter_by(user_id=user_id).scalar()
+    return revision or 1
+
+
+@event.listens_for(Session, 'before_flush')
+def stamp_revisions(session, flush_context, instances):
+    """Stamp synced rows written in this flush and record tombstones for deleted ones."""
+    changed, deleted = defaultdict(list), defaultdict(list)
+    for obj in session.new:
+        if type(obj) in ENTITY_NAMES:
+            changed[obj.user_id].append(obj)
+    for obj in session.dirty:
+        if type(obj) in ENTITY_NAMES and session.is_modified(obj):
+            # A soft delete looks like an update but reaches clients as a delete
+            (deleted if getattr(obj, 'newly_deleted', False) else changed)[obj.user_id].append(obj)
+    for obj in session.deleted:
+        if type(obj) in ENTITY_NAMES:
+            deleted[obj.user_id].append(obj)
+    if not changed and not deleted:
+        return
+
+    revisions = next_revisions(session, changed.keys() | deleted.keys())
+    for user_id, objs in changed.items():
+        for obj in objs:
+            obj.revision = revisions[user_id]
+    for user_id, objs in deleted.items():
+        for obj in objs:
+            obj.revision = revisions[user_id]
+            session.add(SyncTombstone(user_id=user_id, entity=ENTITY_NAMES[type(obj)], entity_id=obj.id,
+                                      revision=revisions[user_id]))
+
+
+def stamp_rows(rows):
+    """Set ``revision`` on row dicts bound for a bulk insert, one new revision per user."""
+    if not rows:
+        return
+    revisions = next_revisions(db.session, [row['user_id'] for row in rows])
+    for row in rows:
+        row['revision'] = revisions[row['user_id']]
+
+
+def delete_rows(model, query, user_id, deleted_at=None):
+    """Soft-delete the live ``model`` rows matched by ``query``, leaving tombstones.
+
+    The rows get ``deleted_at`` (now by default) and a new revision in one
+    set-based update. Returns the number of rows deleted.
+    """
+    deleted_at = deleted_at or datetime.utcnow()
+    revision = next_revisions(db.session, [user_id])[user_id]
+    query = query.filter(model.deleted_at.is_(None))
+    doomed = query.with_entities(model.user_id, literal(ENTITY_NAMES[model]), model.id, literal(revision),
+                                 literal(deleted_at))
+    db.session.execute(insert(SyncTombstone).from_select(
+        ['user_id', 'entity', 'entity_id', 'revision', 'deleted_at'], doomed.statement))
+    return query.update({model.deleted_at: deleted_at, model.revision: revision}, synchronize_session=False)
+
+
+def serialize_row(name, row):
+    data = {'id': row.id}
+    if name == 'category':
+        data['name'] = row.name
+        return data
+    if name == 'expense':
+        data['description'] = row.description
+    data.update({
+        'amount': row.amount,
+        'currency': row.currency,
+        'date': row.date.isoformat(),
+        'category_id': row.category_id,
+        'recurring_rule_id': row.recurring_rule_id,
+    })
+    return data
+
+
+def _after(column, id_column, kind, cursor):
+    # Rows of source ``kind`` whose (revision, kind, id) sorts after ``cursor``
+    revision, cursor_kind, cursor_id = cursor
+    if kind < cursor_kind:
+        return column > revision
+    if kind > cursor_kind:
+        return column >= revision
+    return or_(column > revision, and_(column == revision, id_column > cursor_id))
+
+
+def changes_since(user_id, cursor, limit):
+    """Return ``(changes, next_cursor)`` for the changes after ``cursor``.
+
+    A cursor is ``(revision, kind, id)``; ``revision_cursor(n)`` starts
+    after everything in revision ``n``. Changes come in revision order, and
+    each row appears once with its latest state. ``next_cursor`` is ``None``
+    on the last page. Each source is read through its ``(user_id, revision)``
+    index, with at most ``limit + 1`` rows per source.
+    """
+    sources = []
+    for kind, (name, model) in enumerate(ENTITIES.items()):
+        rows = (model.query
+                .filter(model.user_id == user_id, _after(model.revision, model.id, kind, cursor))
+                .order_by(model.revision, model.id)
+                .limit(limit + 1))
+        sources.append([((row.revision, kind, row.id), {'type': name, 'op': 'upsert', 'revision': row.revision,
+                                                         'id': row.id, 'data': serialize_row(name, row)})
+                        for row in rows])
+
+    tombstones = (SyncTombstone.query
+                  .filter(SyncTombstone.user_id == user_id,
+                          _after(SyncTombstone.revision, SyncTombstone.id, TOMBSTONES, cursor))
+                  .order_by(SyncTombstone.revision, SyncTombstone.id)
+                  .limit(limit + 1))
+    sources.append([((row.revision, TOMBSTONES, row.id), {'type': row.entity, 'op': 'delete',
+                                                          'revision': row.revision, 'id': row.entity_id})
+                    for row in tombstones])
+
+    page = []
+    for key, change in heapq.merge(*sources, key=lambda item: item[0]):
+        page.append((key, change))
+        if len(page) > limit:
+            break
+    next_cursor = page[limit - 1][0] if len(page) > limit else None
+    return [change for _, change in page[:limit]], next_cursor
+
+
+def revision_cursor(revision):
+    # Sorts after every change of ``revision``, tombstones included
+    return revision, TOMBSTONES + 1, 0
+
+
+def encode_cursor(cursor):
+    return '.'.join(str(part) for part in cursor)
+
+
+def decode_cursor(token):
+    revision, kind, row_id = (int(part) for part in token.split('.'))
+    return revision, kind, row_id
@@ -1,20 +1,84 @@
 # backend/expense_tracker/views.py
+import csv
+import heapq
+import re
 import json
-import sib_api_v3_sdk
+from datetime import date, datetime
 from backend.app_factory import db
 from flask import current_app, send_file
 from flask_login import current_user
-from sib_api_v3_sdk.rest import ApiException
 # from sqlalchemy.exc import IntegrityError
 from backend.authentication.models import User
-# from backend.expense_tracker.models import Income, Category
+from backend.expense_tracker.archive import period_count, period_rows
+from backend.expense_tracker.models import Category, Expense, Income
 from backend.logging_config import setup_logging
+from backend.metrics import track_outbound
 from io import BytesIO
-from openpyxl import Workbook
+from sqlalchemy.orm import joinedload
 
 
 logger = setup_logging()
 
+ISO_MONTH_PATTERN = re.compile(r'^(\d{4})-(\d{1,2})$')
+
+def parse_month_range(month, year=None):
+    """Return the half-open ``(start, end)`` date range covering one month.
+
+    ``month`` may be an English month name ("March" or "Mar"), a month number
+    ("3") or an ISO year-month ("2024-03"); ``year`` is ignored for the ISO
+    form and required otherwise. Raises ``ValueError`` on invalid input.
+    """
+    month = str(month).strip()
+    iso_match = ISO_MONTH_PATTERN.match(month)
+    if iso_match:
+        year, month_number = int(iso_match.group(1)), int(iso_match.group(2))
+    else:
+        if year is None or str(year).strip() == '':
+            raise ValueError('Year is required unless month is given as YYYY-MM.')
+        year = int(year)
+        if month.isdigit():
+            month_number = int(month)
+        else:
+            try:
+                month_number = datetime.strptime(month, '%B').month
+            except ValueError:
+                month_number = datetime.strptime(month, '%b').month
+
+    if not 1 <= month_number <= 12:
+        raise ValueError(f'Invalid month: {month}')
+
+    start = date(year, month_number, 1)
+    end = date(year + 1, 1, 1) if month_number == 12 else date(year, month_number + 1, 1)
+    return start, end
+
+def year_range(year):
+    """Return the half-open ``(start, end)`` date range covering one year."""
+    year = int(year)
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+def period_label(start):
+    return start.strftime('%B %Y')
+
+def dialect_insert():
+    """Return the bound dialect's ``insert`` construct, which supports ON CONFLICT upserts."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def get_or_create_category(user_id, name):
+    """Return the user's category called ``name``, adding it to the session if new.
+
+    Names match ignoring case and extra whitespace (see ``Category.named``).
+    """
+    category = Category.named(user_id, name).first()
+    if not category:
+        category = Category(name=name, user_id=user_id)
+        db.session.add(category)
+        db.session.flush()
+    return category
+
 def load_email_config():
     try:
         json_path = 'backend/email_config.json'
@@ -33,6 +97,10 @@ def send_feedback_email(feedback_message):
     if not email_config:
         return
 
+    # Imported on first send; the Brevo SDK is slow to import
+    import sib_api_v3_sdk
+    from sib_api_v3_sdk.rest import ApiException
+
     try:
         api_key = email_config.get('api_key')
 
@@ -57,44 +125,129 @@ def send_feedback_email(feedback_message):
 
             # Send the email
             try:
-                api_response = api_instance.send_transac_email(send_smtp_email)
-                current_app.logger.info(f"Email sent successfully: {api_response}")
+                with track_outbound('brevo', 'send_transac_email'):
+                    api_response = api_instance.send_transac_email(send_smtp_email)
+                current_app.logger.info("Email sent successfully: %s", api_response)
             except ApiException as e:
-                current_app.logger.error(f"Exception when calling TransactionalEmailsApi->send_transac_email: {e}")
+                current_app.logger.error("Exception when calling TransactionalEmailsApi->send_transac_email: %s", e)
 
     except Exception as e:
-        current_app.logger.error(f"Failed to send feedback email: {str(e)}")
-
-def export_to_xlsx(income, expenses, filename):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Income and Expenses"
-
-    # Headers
-    ws.append(["Date", "Type", "Amount", "Category", "Description"])
+        current_app.logger.error("Failed to send feedback email: %s", e)
+
+EXPORT_HEADERS = ["Date", "Type", "Amount", "Currency", "Category", "Description"]
+
+def _merge_by_date(income, expenses):
+    """Merge date-sorted income and expense rows into one date-sorted ``(kind, row)`` stream."""
+    tagged_income = ((row.date, 0, 'Income', row) for row in income)
+    tagged_expenses = ((row.date, 1, 'Expense', row) for row in expenses)
+    for _, _, kind, row in heapq.merge(tagged_income, tagged_expenses, key=lambda item: item[:2]):
+        yield kind, row
+
+def _row_values(kind, row):
+    # Income has no description; keep the column so every row lines up
+    return [row.date.isoformat(), kind, row.amount, row.currency, row.category.name if row.category else '',
+            getattr(row, 'description', None) or '']
+
+def _append_month_totals(sheet, totals):
+    sheet.append([])
+    for currency in sorted(totals):
+        total_income, total_expenses = totals[currency]
+        sheet.append(["Total Income", total_income, currency])
+        sheet.append(["Total Expenses", total_expenses, currency])
+        sheet.append(["Balance", total_income - total_expenses, currency])
+
+def write_xlsx(income, expenses, output):
+    """Write a workbook with one sheet per month and a summary sheet to ``output``.
+
+    ``income`` and ``expenses`` must each be sorted by date and may be any
+    iterables (query results streamed with ``yield_per``, generators); they
+    are merged and read exactly once. Month, category and overall totals are
+    accumulated as rows stream past, and the workbook is written in
+    openpyxl's write-only mode, so memory depends on the number of months and
+    categories rather than rows. Returns the number of rows written.
+    """
+    # openpyxl is only imported when a workbook is actually built
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    summary = wb.create_sheet("Summary")
+
+    months = []          # [(month_start, {currency: [income, expenses]})] in date order
+    category_totals = {}  # (kind, category, currency) -> {month_start: amount}
+    sheet, month, month_totals = None, None, None
+    rows = 0
+    for kind, row in _merge_by_date(income, expenses):
+        row_month = row.date.replace(day=1)
+        if row_month != month:
+            if sheet is not None:
+                _append_month_totals(sheet, month_totals)
+            month, month_totals = row_month, {}
+            months.append((month, month_totals))
+            sheet = wb.create_sheet(month.strftime('%b %Y'))
+            sheet.append(EXPORT_HEADERS)
+
+        values = _row_values(kind, row)
+        sheet.append(values)
+        month_totals.setdefault(row.currency, [0, 0])[0 if kind == 'Income' else 1] += row.amount
+        by_month = category_totals.setdefault((kind, values[4], row.currency), {})
+        by_month[month] = by_month.get(month, 0) + row.amount
+        rows += 1
+    if sheet is not None:
+        _append_month_totals(sheet, month_totals)
+
+    # Summary: month-by-month totals, then a category x month pivot
+    summary.append(["Month", "Currency", "Income", "Expenses", "Balance"])
+    overall = {}
+    for month, totals in months:
+        for currency in sorted(totals):
+            total_income, total_expenses = totals[currency]
+            summary.append([month.strftime('%B %Y'), currency, total_income, total_expenses, total_income - total_expenses])
+            running = overall.setdefault(currency, [0, 0])
+            running[0] += total_income
+            running[1] += total_expenses
+    for currency in sorted(overall):
+        total_income, total_expenses = overall[currency]
+        summary.append(["Total", currency, total_income, total_expenses, total_income - total_expenses])
+
+    summary.append([])
+    summary.append(["Type", "Category", "Currency"] + [month.strftime('%b %Y') for month, _ in months] + ["Total"])
+    for (kind, category, currency), by_month in sorted(category_totals.items()):
+        amounts = [by_month.get(month, 0) for month, _ in months]
+        summary.append([kind, category, currency] + amounts + [sum(amounts)])
 
-    # Add income data
-    for inc in income:
-        ws.append([f"{inc.date}", "Income", inc.amount, inc.category.name if inc.category else ''])
-
-    # Add expenses data
-    for exp in expenses:
-        ws.append([exp.date.strftime('%Y-%m-%d'), "Expense", exp.amount, exp.category.name if exp.category else '', exp.description])
-
-    # Calculate balance
-    total_income = sum(inc.amount for inc in income)
-    total_expenses = sum(exp.amount for exp in expenses)
-    balance = total_income - total_expenses
-
-    # Add balance
-    ws.append([])
-    ws.append(["Total Income", total_income])
-    ws.append(["Total Expenses", total_expenses])
-    ws.append(["Balance", balance])
+    wb.save(output)
+    return rows
+
+def write_csv(income, expenses, output):
+    """Write date-sorted income and expense rows as one date-ordered CSV to ``output``."""
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_HEADERS)
+    rows = 0
+    for kind, row in _merge_by_date(income, expenses):
+        writer.writerow(_row_values(kind, row))
+        rows += 1
+    return rows
+
+def stream_period(model, user_id, start, end, batch_size=1000):
+    """Return the user's ``model`` rows in ``[start, end)`` sorted by date, fetched ``batch_size`` at a time.
+
+    Rows from archived years are merged in.
+    """
+    live = (model.in_period(user_id, start, end)
+            .options(joinedload(model.category))
+            .order_by(model.date, model.id)
+            .yield_per(batch_size))
+    return period_rows(model, user_id, start, end, live)
+
+def has_period_rows(user_id, start, end):
+    """Return whether the user has any income or expenses in ``[start, end)``, live or archived."""
+    return (any(db.session.query(model.in_period(user_id, start, end).exists()).scalar() for model in (Income, Expense))
+            or any(period_count(model, user_id, start, end) for model in (Income, Expense)))
 
+def export_to_xlsx(income, expenses, filename):
     # Save to a BytesIO object
     output = BytesIO()
-    wb.save(output)
+    write_xlsx(income, expenses, output)
     output.seek(0)
 
     return send_file(output, download_name=filename, as_attachment=True)
@@ -1,4 +1,7 @@
 # backend/init_db.py
+from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from backend.sharding import ShardedSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': ShardedSession})
+migrate = Migrate()
@@ -0,0 +1,170 @@
+# backend/live_server.py
+"""Server-Sent Events endpoint streaming each user's live updates.
+
+Run it next to the Flask workers with ``flask live-server``. One asyncio
+loop serves every connection, so thousands of idle dashboards cost a socket
+and a small queue each, not a thread. Events published by any worker reach
+it through the broker from ``backend.pubsub``.
+
+Browsers authenticate with the Flask session cookie, so SECRET_KEY must
+match the workers' key. Events are:
+
+- ``transaction``: a created, updated or deleted row, with its sync revision as the event id;
+- ``balance``: fresh totals for a month, in the same format as ``/balance``;
+- ``resync``: a bulk change; fetch it from ``/sync``.
+
+After reconnecting, clients catch up with ``/sync?since=<Last-Event-ID>``.
+Nothing is replayed here.
+"""
+import asyncio
+import json
+import signal
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+from itsdangerous import BadSignature
+from backend.logging_config import setup_logging
+from backend.pubsub import make_broker
+
+
+logger = setup_logging()
+
+LIVE_PATH = '/expense-tracker/live'
+MAX_HEADER_BYTES = 16384
+HEADER_TIMEOUT_SECONDS = 10
+
+
+class Connection:
+    """One open event stream and the events waiting to be written to it."""
+
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+    def push(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Dropping events silently would leave the client out of date, so
+            # close the stream instead; it reconnects and resyncs
+            self.overflowed = True
+
+
+class LiveServer:
+    def __init__(self, app):
+        self.app = app
+        self.heartbeat = app.config.get('LIVE_HEARTBEAT_SECONDS', 15)
+        self.queue_size = app.config.get('LIVE_QUEUE_SIZE', 100)
+        self.serializer = app.session_interface.get_signing_serializer(app)
+        self.cookie_name = app.config['SESSION_COOKIE_NAME']
+        self.max_age = int(app.permanent_session_lifetime.total_seconds())
+        self.connections = defaultdict(set)
+
+    def authenticate(self, headers):
+        """Return the logged-in user's id from the session cookie, or ``None``."""
+        cookie = SimpleCookie(headers.get('cookie', ''))
+        if self.cookie_name not in cookie:
+            return None
+        try:
+            session = self.serializer.loads(cookie[self.cookie_name].value, max_age=self.max_age)
+        except BadSignature:
+            return None
+        user_id = session.get('_user_id')
+        return int(user_id) if user_id else None
+
+    def dispatch(self, message):
+        """Queue a published event for each of its user's open streams."""
+        try:
+            message = json.loads(message)
+        except ValueError:
+            logger.warning("Ignoring malformed live message")
+            return
+        connections = self.connections.get(message['user_id'])
+        if not connections:
+            return
+        frame = f"event: {message['event']}\n"
+        if message.get('id') is not None:
+            frame += f"id: {message['id']}\n"
+        frame = (frame + f"data: {json.dumps(message['data'])}\n\n").encode()
+        for connection in connections:
+            connection.push(frame)
+
+    async def handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), HEADER_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        request_line, *header_lines = head.decode('latin-1').split('\r\n')
+        parts = request_line.split(' ')
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            if value:
+                headers[name.strip().lower()] = value.strip()
+
+        if len(parts) != 3 or parts[0] != 'GET' or urlsplit(parts[1]).path != LIVE_PATH:
+            await self._reply(writer, '404 Not Found', {'message': 'Not found.'})
+            return
+        user_id = self.authenticate(headers)
+        if user_id is None:
+            await self._reply(writer, '401 Unauthorized', {'message': 'Unauthorized access. Please log in.'})
+            return
+
+        connection = Connection(user_id, self.queue_size)
+        self.connections[user_id].add(connection)
+        try:
+            writer.write(b'HTTP/1.1 200 OK\r\n'
+                         b'Content-Type: text/event-stream\r\n'
+                         b'Cache-Control: no-cache\r\n'
+                         b'Connection: keep-alive\r\n'
+                         b'X-Accel-Buffering: no\r\n\r\n'
+                         b'retry: 5000\n\n')
+            await writer.drain()
+            while not connection.overflowed:
+                try:
+                    frame = await asyncio.wait_for(connection.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from timing out idle streams and detects dead clients
+                    frame = b': ping\n\n'
+                writer.write(frame)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # Client went away, or the server is shutting down
+            pass
+        finally:
+            self.connections[user_id].discard(connection)
+            if not self.connections[user_id]:
+                del self.connections[user_id]
+            writer.close()
+
+    async def _reply(self, writer, status, body):
+        payload = json.dumps(body).encode()
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode() + payload)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def serve(self, host, port):
+        loop = asyncio.get_running_loop()
+        unsubscribe = make_broker(self.app).subscribe(loop, self.dispatch)
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES, backlog=1024)
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        logger.info("Live server listening on %s:%d", host, port)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            unsubscribe()
+            logger.info("Live server stopped")
+
+
+def run(app, host, port):
+    asyncio.run(LiveServer(app).serve(host, port))
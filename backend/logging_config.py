@@ -1,27 +1,129 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import re
+import uuid
 import pytz
+from contextvars import ContextVar
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request
+
+# Resolved once; pytz.timezone() is a dictionary lookup plus object creation
+# that used to run for every record.
+IST = pytz.timezone('Asia/Kolkata')
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+request_id_var = ContextVar('request_id', default='-')
+
+_listener = None
 
 class ISTFormatter(logging.Formatter):
     def formatTime(self, record, datefmt=None):
         # Convert the timestamp to IST
-        ist_timezone = pytz.timezone('Asia/Kolkata')
-        record_time = datetime.fromtimestamp(record.created, ist_timezone)
+        record_time = datetime.fromtimestamp(record.created, IST)
         return record_time.strftime(datefmt) if datefmt else record_time.isoformat()
 
+class JSONFormatter(ISTFormatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request's correlation ID.
+
+    Runs on the queue handler, i.e. still in the request thread, because the
+    listener thread has no access to the request's context.
+    """
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Only merge %-style args into the message here; timestamps, JSON and
+        # tracebacks are rendered by the listener thread's formatter.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _make_formatter():
+    if os.environ.get('LOG_FORMAT', 'json').lower() == 'text':
+        return ISTFormatter(
+            fmt='%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+    return JSONFormatter()
+
 def setup_logging():
+    """Route the root logger through a queue so log I/O leaves the calling thread.
+
+    Records are enqueued by a ``QueueHandler`` and written by a
+    ``QueueListener`` thread; repeated calls reuse the same pipeline.
+    Set ``LOG_FORMAT=text`` for human-readable output instead of JSON.
+    """
+    global _listener
     logger = logging.getLogger()
     if not logger.handlers:
-        formatter = ISTFormatter(
-            fmt='%(asctime)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        
-        handler = logging.StreamHandler()
-        handler.setFormatter(formatter)
-        
-        logger = logging.getLogger()
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(_make_formatter())
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(RequestIdFilter())
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
         logger.setLevel(logging.INFO)
-        logger.addHandler(handler)
+        logger.addHandler(queue_handler)
 
     return logger
+
+def init_request_ids(app):
+    """Assign every request a correlation ID and echo it in the response.
+
+    An incoming ``X-Request-ID`` header is reused when it looks sane, so IDs
+    can be traced across a proxy or the frontend.
+    """
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        g.request_id_token = request_id_var.set(request_id)
+        g.request_id = request_id
+
+    @app.after_request
+    def echo_request_id(response):
+        if 'request_id' in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
+
+    @app.teardown_request
+    def clear_request_id(exc):
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            request_id_var.reset(token)
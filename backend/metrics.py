@@ -0,0 +1,201 @@
+# backend/metrics.py
+import hmac
+import ipaddress
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import Response, current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from backend.logging_config import setup_logging
+
+
+logger = setup_logging()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text format."""
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', bound))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+REQUEST_LATENCY = Histogram('budgetbee_request_duration_seconds', 'Request latency by endpoint.',
+                            LATENCY_BUCKETS, ('endpoint', 'method', 'status'))
+REQUEST_QUERIES = Histogram('budgetbee_request_db_queries', 'SQL statements executed per request.',
+                            QUERY_COUNT_BUCKETS, ('endpoint',))
+REQUEST_QUERY_TIME = Histogram('budgetbee_request_db_seconds', 'Time spent in SQL per request.',
+                               LATENCY_BUCKETS, ('endpoint',))
+RESPONSE_SIZE = Histogram('budgetbee_response_size_bytes', 'Response body size by endpoint.',
+                          SIZE_BUCKETS, ('endpoint',))
+OUTBOUND_LATENCY = Histogram('budgetbee_outbound_duration_seconds', 'Latency of calls to external services.',
+                             LATENCY_BUCKETS, ('service', 'operation', 'outcome'))
+SLOW_REQUESTS = Counter('budgetbee_slow_requests_total', 'Requests slower than SLOW_REQUEST_THRESHOLD_MS.',
+                        ('endpoint',))
+RATE_LIMITED = Counter('budgetbee_rate_limited_total', 'Requests rejected by the rate limiter.',
+                       ('endpoint', 'scope'))
+
+METRICS = (REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_QUERY_TIME, RESPONSE_SIZE, OUTBOUND_LATENCY, SLOW_REQUESTS,
+           RATE_LIMITED)
+
+
+@contextmanager
+def track_outbound(service, operation):
+    """Time a call to an external service such as Brevo or Google."""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        OUTBOUND_LATENCY.observe(time.perf_counter() - started, service=service, operation=operation, outcome=outcome)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'db_queries' in g:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if started and has_request_context() and 'db_queries' in g:
+        g.db_queries.append((statement, time.perf_counter() - started.pop()))
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def _scraper_allowed(allowed_networks):
+    """Whether the request comes from ``allowed_networks`` or carries METRICS_TOKEN."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        sent = request.headers.get('Authorization', '')
+        if hmac.compare_digest(sent.encode(), f'Bearer {token}'.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    return any(address in network for network in allowed_networks)
+
+
+def init_metrics(app):
+    """Install the request hooks and, unless METRICS_ENABLED is off, the ``/metrics`` endpoint on ``app``."""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.db_queries = []
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+
+        duration = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        queries = g.pop('db_queries', [])
+        query_time = sum(elapsed for _, elapsed in queries)
+
+        REQUEST_LATENCY.observe(duration, endpoint=endpoint, method=request.method, status=response.status_code)
+        REQUEST_QUERIES.observe(len(queries), endpoint=endpoint)
+        REQUEST_QUERY_TIME.observe(query_time, endpoint=endpoint)
+        # Streamed responses have no known length and are left out
+        if not response.is_streamed and response.content_length is not None:
+            RESPONSE_SIZE.observe(response.content_length, endpoint=endpoint)
+
+        threshold_ms = current_app.config.get('SLOW_REQUEST_THRESHOLD_MS')
+        if threshold_ms is not None and duration * 1000 >= threshold_ms:
+            SLOW_REQUESTS.inc(endpoint=endpoint)
+            query_log = '\n'.join(f'  {elapsed * 1000:.1f} ms  {statement}' for statement, elapsed in queries)
+            logger.warning("Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms\n%s", request.method, request.path,
+                           endpoint, duration * 1000, len(queries), query_time * 1000, query_log)
+        return response
+
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    # A mistyped entry stops the app here rather than failing every scrape
+    allowed_networks = [ipaddress.ip_network(allowed, strict=False)
+                        for allowed in app.config.get('METRICS_ALLOWED_IPS') or ()]
+
+    @app.route('/metrics')
+    def metrics():
+        if not _scraper_allowed(allowed_networks):
+            return jsonify({'message': 'Access denied: Metrics are for configured scrapers only'}), 403
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,149 @@
+import logging
+from logging.config import fileConfig
+
+from flask import current_app
+
+from alembic import context
+from backend.online_migrations import dry_run, report_step
+
+# this is the Alembic Config object, which provides
+# access to the values within the .ini file in use.
+config = context.config
+
+# Interpret the config file for Python logging.
+# This line sets up loggers basically.
+fileConfig(config.config_file_name, disable_existing_loggers=False)
+logger = logging.getLogger('alembic.env')
+
+
+def get_engine():
+    # `-x shard=<name>` migrates one of the SHARDS databases instead of the
+    # main one; every shard carries the full schema
+    shard = context.get_x_argument(as_dictionary=True).get('shard')
+    if shard and shard != 'default':
+        return current_app.extensions['migrate'].db.engines[shard]
+    try:
+        # this works with Flask-SQLAlchemy<3 and Alchemical
+        return current_app.extensions['migrate'].db.get_engine()
+    except (TypeError, AttributeError):
+        # this works with Flask-SQLAlchemy>=3
+        return current_app.extensions['migrate'].db.engine
+
+
+def get_engine_url():
+    try:
+        return get_engine().url.render_as_string(hide_password=False).replace(
+            '%', '%%')
+    except AttributeError:
+        return str(get_engine().url).replace('%', '%%')
+
+
+# add your model's MetaData object here
+# for 'autogenerate' support
+# from myapp import mymodel
+# target_metadata = mymodel.Base.metadata
+config.set_main_option('sqlalchemy.url', get_engine_url())
+target_db = current_app.extensions['migrate'].db
+
+# other values from the config, defined by the needs of env.py,
+# can be acquired:
+# my_important_option = config.get_main_option("my_important_option")
+# ... etc.
+
+
+def get_metadata():
+    if hasattr(target_db, 'metadatas'):
+        return target_db.metadatas[None]
+    return target_db.metadata
+
+
+def run_migrations_offline():
+    """Run migrations in 'offline' mode.
+
+    This configures the context with just a URL
+    and not an Engine, though an Engine is acceptable
+    here as well.  By skipping the Engine creation
+    we don't even need a DBAPI to be available.
+
+    Calls to context.execute() here emit the given string to the
+    script output.
+
+    """
+    url = config.get_main_option("sqlalchemy.url")
+    context.configure(
+        url=url, target_metadata=get_metadata(), literal_binds=True
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Run migrations in 'online' mode.
+
+    In this scenario we need to create an Engine
+    and associate a connection with the context.
+
+    """
+
+    # this callback is used to prevent an auto-migration from being generated
+    # when there are no changes to the schema
+    # reference: http://alembic.zzzcomputing.com/en/latest/cookbook.html
+    def process_revision_directives(context, revision, directives):
+        if getattr(config.cmd_opts, 'autogenerate', False):
+            script = directives[0]
+            if script.upgrade_ops.is_empty():
+                directives[:] = []
+                logger.info('No changes in schema detected.')
+
+    # the full-text search objects are raw DDL (revisions 0007 and 0010) with
+    # no models, so autogenerate must not see them as tables and indexes to drop
+    def include_name(name, type_, parent_names):
+        if type_ == 'table':
+            return not name.startswith(('expense_search', 'category_search'))
+        if type_ == 'index':
+            return not name.endswith('_fts')
+        return True
+
+    conf_args = current_app.extensions['migrate'].configure_args
+    if conf_args.get("process_revision_directives") is None:
+        conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_name") is None:
+        conf_args["include_name"] = include_name
+
+    connectable = get_engine()
+    x_args = context.get_x_argument(as_dictionary=True)
+    is_dry_run = x_args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+
+    with connectable.connect() as connection:
+        if is_dry_run:
+            # Run every pending migration, counting the rows it writes, then
+            # roll all of it back
+            with dry_run(connection):
+                context.configure(
+                    connection=connection,
+                    target_metadata=get_metadata(),
+                    on_version_apply=report_step(connection),
+                    **conf_args
+                )
+                with context.begin_transaction():
+                    context.run_migrations()
+            logger.info('Dry run complete; all changes were rolled back.')
+            return
+
+        context.configure(
+            connection=connection,
+            target_metadata=get_metadata(),
+            # Lets batched data migrations commit between batches
+            transaction_per_migration=True,
+            **conf_args
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,51 @@
+"""drop stored month and year
+
+Income and expenses derive their month and year from ``date``. Databases
+built by create_all() before that change still carry the old ``month`` and
+``year`` columns, NOT NULL and without a default, so every insert from the
+current models fails on them. They are dropped here when present. On SQLite
+dropping a column rebuilds the table, which the full-text search triggers
+naming ``expenses`` would break, so the search index is dropped first; a
+later revision builds it again.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-20 09:12:40.512337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001a'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+LEGACY_COLUMNS = ('month', 'year')
+SEARCH_TRIGGERS = ('expenses_search_insert', 'expenses_search_soft_delete', 'expenses_search_restore',
+                   'expenses_search_update', 'expenses_search_delete', 'categories_search_rename')
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    stale = {table: [column['name'] for column in inspector.get_columns(table) if column['name'] in LEGACY_COLUMNS]
+             for table in ('income', 'expenses')}
+    if not any(stale.values()):
+        return
+
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in SEARCH_TRIGGERS:
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS expense_search')
+    for table, columns in stale.items():
+        if columns:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for column in columns:
+                    batch_op.drop_column(column)
+
+
+def downgrade():
+    # The columns were derived from date and nothing reads them any more
+    pass
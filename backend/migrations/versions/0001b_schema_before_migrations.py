@@ -0,0 +1,176 @@
+"""schema before migrations
+
+Everything the app added to the schema between the original baseline and
+the introduction of migrations: per-transaction currencies and the FX rate
+table, recurring rules, budgets and their running totals, export jobs,
+updated_at stamps, the (user_id, date) indexes and the lower() indexes on
+users. Databases built by create_all() may have stopped anywhere in that
+history, and create_all() only ever added missing tables, never columns, so
+every table, column and index is checked and only the missing ones are
+created. On SQLite, altering income or expenses rebuilds the table, so the
+full-text search index is dropped first; a later revision builds it again.
+
+Revision ID: 0001b
+Revises: 0001a
+Create Date: 2026-10-20 09:40:17.904126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001b'
+down_revision = '0001a'
+branch_labels = None
+depends_on = None
+
+SEARCH_TRIGGERS = ('expenses_search_insert', 'expenses_search_soft_delete', 'expenses_search_restore',
+                   'expenses_search_update', 'expenses_search_delete', 'categories_search_rename')
+
+
+def _tables():
+    return {
+        'fx_rates': lambda: op.create_table('fx_rates',
+            sa.Column('currency', sa.String(length=3), nullable=False),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('rate', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('currency', 'date')
+        ),
+        'export_jobs': lambda: op.create_table('export_jobs',
+            sa.Column('id', sa.String(length=32), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('period_start', sa.Date(), nullable=False),
+            sa.Column('period_end', sa.Date(), nullable=False),
+            sa.Column('format', sa.String(length=10), nullable=False),
+            sa.Column('data_version', sa.String(length=64), nullable=False),
+            sa.Column('status', sa.String(length=10), nullable=False),
+            sa.Column('progress', sa.Integer(), nullable=False),
+            sa.Column('rows_total', sa.Integer(), nullable=True),
+            sa.Column('filename', sa.String(length=255), nullable=False),
+            sa.Column('artifact_size', sa.Integer(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        ),
+        'recurring_rules': lambda: op.create_table('recurring_rules',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(length=10), nullable=False),
+            sa.Column('amount', sa.Float(), nullable=False),
+            sa.Column('currency', sa.String(length=3), nullable=False),
+            sa.Column('description', sa.String(length=255), nullable=True),
+            sa.Column('frequency', sa.String(length=10), nullable=False),
+            sa.Column('interval', sa.Integer(), nullable=False),
+            sa.Column('start_date', sa.Date(), nullable=False),
+            sa.Column('end_date', sa.Date(), nullable=True),
+            sa.Column('next_index', sa.Integer(), nullable=False),
+            sa.Column('next_run', sa.Date(), nullable=True),
+            sa.Column('active', sa.Boolean(), nullable=False),
+            sa.Column('category_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        ),
+        'budgets': lambda: op.create_table('budgets',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('limit_amount', sa.Float(), nullable=False),
+            sa.Column('alert_threshold', sa.Integer(), nullable=False),
+            sa.Column('category_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'category_id', name='uq_budgets_user_category')
+        ),
+        'category_month_totals': lambda: op.create_table('category_month_totals',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('category_id', sa.Integer(), nullable=False),
+            sa.Column('month_start', sa.Date(), nullable=False),
+            sa.Column('spent', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+            sa.PrimaryKeyConstraint('user_id', 'category_id', 'month_start')
+        ),
+    }
+
+
+def _entry_columns():
+    # Existing rows were recorded before currencies existed, in the default one
+    return [
+        sa.Column('currency', sa.String(length=3), server_default='INR', nullable=False),
+        sa.Column('recurring_rule_id', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    ]
+
+
+def _drop_search_index():
+    for trigger in SEARCH_TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS expense_search')
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = set(inspector.get_table_names())
+    for name, create in _tables().items():
+        if name not in existing:
+            create()
+    op.execute('CREATE INDEX IF NOT EXISTS ix_recurring_rules_due ON recurring_rules (active, next_run)')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_export_jobs_lookup '
+               'ON export_jobs (user_id, period_start, period_end, format, data_version)')
+
+    if 'base_currency' not in {column['name'] for column in inspector.get_columns('user')}:
+        with op.batch_alter_table('user', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('base_currency', sa.String(length=3), server_default='INR', nullable=False))
+    op.execute('CREATE INDEX IF NOT EXISTS ix_user_email_lower ON "user" (lower(email))')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_user_name_lower ON "user" (lower(name))')
+
+    for table in ('income', 'expenses'):
+        columns = {column['name'] for column in inspector.get_columns(table)}
+        missing = [column for column in _entry_columns() if column.name not in columns]
+        has_unique = any(constraint['name'] == f'uq_{table}_recurring_occurrence'
+                         for constraint in inspector.get_unique_constraints(table))
+        if (missing or not has_unique) and op.get_bind().dialect.name == 'sqlite':
+            _drop_search_index()
+        if missing or not has_unique:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for column in missing:
+                    batch_op.add_column(column)
+                if 'recurring_rule_id' in {column.name for column in missing}:
+                    # Batch mode can only add named constraints
+                    batch_op.create_foreign_key(f'fk_{table}_recurring_rule_id', 'recurring_rules',
+                                                ['recurring_rule_id'], ['id'])
+                if not has_unique:
+                    batch_op.create_unique_constraint(f'uq_{table}_recurring_occurrence', ['recurring_rule_id', 'date'])
+        op.execute(f'CREATE INDEX IF NOT EXISTS ix_{table}_user_date ON {table} (user_id, date)')
+
+
+def downgrade():
+    with op.batch_alter_table('income', schema=None) as batch_op:
+        batch_op.drop_index('ix_income_user_date')
+        batch_op.drop_constraint('uq_income_recurring_occurrence', type_='unique')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('recurring_rule_id')
+        batch_op.drop_column('currency')
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.drop_index('ix_expenses_user_date')
+        batch_op.drop_constraint('uq_expenses_recurring_occurrence', type_='unique')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('recurring_rule_id')
+        batch_op.drop_column('currency')
+    op.drop_index('ix_user_name_lower', table_name='user')
+    op.drop_index('ix_user_email_lower', table_name='user')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('base_currency')
+    op.drop_index('ix_export_jobs_lookup', table_name='export_jobs')
+    op.drop_table('export_jobs')
+    op.drop_table('category_month_totals')
+    op.drop_table('budgets')
+    op.drop_index('ix_recurring_rules_due', table_name='recurring_rules')
+    op.drop_table('recurring_rules')
+    op.drop_table('fx_rates')
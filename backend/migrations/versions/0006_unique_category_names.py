@@ -0,0 +1,124 @@
+"""unique category names
+
+Category names are normalized (trimmed, inner whitespace collapsed) and made
+unique per user ignoring case. Existing duplicates are merged into the
+oldest category of each group first: its income, expenses, recurring rules,
+budget and month totals take over the duplicates', which leave sync
+tombstones. On SQLite the search trigger for category renames is replaced so
+it only scans the renamed category's owner. A downgrade drops the index but
+does not split merged categories again.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 15:02:41.118204
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+RENAME_TRIGGER = """CREATE TRIGGER categories_search_rename AFTER UPDATE OF name ON categories BEGIN
+        UPDATE expense_search SET category = new.name
+        WHERE rowid IN (SELECT id FROM expenses
+                        WHERE user_id = new.user_id AND category_id = new.id AND deleted_at IS NULL);
+    END"""
+OLD_RENAME_TRIGGER = """CREATE TRIGGER categories_search_rename AFTER UPDATE OF name ON categories BEGIN
+        UPDATE expense_search SET category = new.name
+        WHERE rowid IN (SELECT id FROM expenses WHERE category_id = new.id);
+    END"""
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        _replace_rename_trigger(RENAME_TRIGGER)
+    _normalize_names()
+    _merge_duplicates()
+    op.create_index('uq_categories_user_name', 'categories', ['user_id', sa.text('lower(name)')], unique=True)
+
+
+def _replace_rename_trigger(ddl):
+    # Only databases whose search index was built have the triggers
+    if not sa.inspect(op.get_bind()).has_table('expense_search'):
+        return
+    op.execute('DROP TRIGGER IF EXISTS categories_search_rename')
+    op.execute(ddl)
+
+
+def _next_revision(conn, user_id):
+    revision = conn.execute(sa.text('SELECT revision FROM sync_counters WHERE user_id = :user_id'),
+                            {'user_id': user_id}).scalar()
+    if revision is None:
+        conn.execute(sa.text('INSERT INTO sync_counters (user_id, revision) VALUES (:user_id, 2)'), {'user_id': user_id})
+        return 2
+    conn.execute(sa.text('UPDATE sync_counters SET revision = :revision WHERE user_id = :user_id'),
+                 {'user_id': user_id, 'revision': revision + 1})
+    return revision + 1
+
+
+def _normalize_names():
+    conn = op.get_bind()
+    renames = []
+    for category_id, user_id, name in conn.execute(sa.text('SELECT id, user_id, name FROM categories')):
+        normalized = ' '.join((name or '').split()) or 'Uncategorized'
+        if normalized != name:
+            renames.append({'id': category_id, 'user_id': user_id, 'name': normalized})
+    # Renamed categories reach sync clients with a new revision
+    revisions = {user_id: _next_revision(conn, user_id) for user_id in sorted({row['user_id'] for row in renames})}
+    for row in renames:
+        row['revision'] = revisions[row['user_id']]
+    if renames:
+        conn.execute(sa.text('UPDATE categories SET name = :name, revision = :revision WHERE id = :id'), renames)
+
+
+def _merge_duplicates():
+    conn = op.get_bind()
+    groups = conn.execute(sa.text(
+        'SELECT user_id, lower(name) FROM categories GROUP BY user_id, lower(name) HAVING count(*) > 1')).all()
+    for user_id, key in groups:
+        ids = conn.execute(sa.text('SELECT id FROM categories WHERE user_id = :user_id AND lower(name) = :key ORDER BY id'),
+                           {'user_id': user_id, 'key': key}).scalars().all()
+        keep, duplicates = ids[0], ids[1:]
+        params = {'user_id': user_id, 'keep': keep, 'revision': _next_revision(conn, user_id)}
+        dup = sa.bindparam('duplicates', duplicates, expanding=True)
+
+        for table in ('income', 'expenses'):
+            conn.execute(sa.text(f'UPDATE {table} SET category_id = :keep, revision = :revision '
+                                 'WHERE user_id = :user_id AND category_id IN :duplicates').bindparams(dup), params)
+        conn.execute(sa.text('UPDATE recurring_rules SET category_id = :keep '
+                             'WHERE user_id = :user_id AND category_id IN :duplicates').bindparams(dup), params)
+
+        budgets = dict(conn.execute(sa.text('SELECT category_id, id FROM budgets WHERE user_id = :user_id '
+                                            'AND category_id IN :ids').bindparams(sa.bindparam('ids', ids, expanding=True)),
+                                    params).all())
+        if keep not in budgets and budgets:
+            conn.execute(sa.text('UPDATE budgets SET category_id = :keep WHERE id = :id'),
+                         {'keep': keep, 'id': budgets[min(budgets)]})
+        conn.execute(sa.text('DELETE FROM budgets WHERE user_id = :user_id AND category_id IN :duplicates')
+                     .bindparams(dup), params)
+
+        conn.execute(sa.text(
+            'INSERT INTO category_month_totals (user_id, category_id, month_start, spent) '
+            'SELECT user_id, :keep, month_start, sum(spent) FROM category_month_totals '
+            'WHERE user_id = :user_id AND category_id IN :duplicates GROUP BY user_id, month_start '
+            'ON CONFLICT (user_id, category_id, month_start) '
+            'DO UPDATE SET spent = category_month_totals.spent + excluded.spent').bindparams(dup), params)
+        conn.execute(sa.text('DELETE FROM category_month_totals WHERE user_id = :user_id AND category_id IN :duplicates')
+                     .bindparams(dup), params)
+
+        conn.execute(sa.text('INSERT INTO sync_tombstones (user_id, entity, entity_id, revision, deleted_at) '
+                             "SELECT user_id, 'category', id, :revision, :now FROM categories "
+                             'WHERE id IN :duplicates').bindparams(dup), {**params, 'now': datetime.utcnow()})
+        conn.execute(sa.text('DELETE FROM categories WHERE id IN :duplicates').bindparams(dup), params)
+
+
+def downgrade():
+    op.drop_index('uq_categories_user_name', table_name='categories')
+    if op.get_bind().dialect.name == 'sqlite':
+        _replace_rename_trigger(OLD_RENAME_TRIGGER)
@@ -0,0 +1,101 @@
+"""expense search index
+
+The full-text search objects were only created by create_all(), through
+``after_create`` listeners that migrations never fire, so databases built by
+`flask init-db` had none and earlier revisions drop the SQLite index to
+rebuild income and expenses. They are created here when missing: on SQLite
+the FTS5 table, populated from live expenses, and the triggers that keep it
+in sync; on PostgreSQL the GIN expression indexes. The statements are frozen
+copies of those in ``backend/expense_tracker/search.py``.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-20 10:21:06.337915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+SQLITE_SEARCH_TABLE = """CREATE VIRTUAL TABLE expense_search USING fts5(
+        owner, description, category,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4 5 6'
+    )"""
+SQLITE_SEARCH_TRIGGERS = {
+    'expenses_search_insert': """CREATE TRIGGER IF NOT EXISTS expenses_search_insert AFTER INSERT ON expenses
+    WHEN new.deleted_at IS NULL BEGIN
+        INSERT INTO expense_search (rowid, owner, description, category)
+        VALUES (new.id, 'u' || new.user_id, new.description,
+                (SELECT name FROM categories WHERE id = new.category_id));
+    END""",
+    'expenses_search_soft_delete': """CREATE TRIGGER IF NOT EXISTS expenses_search_soft_delete AFTER UPDATE OF deleted_at ON expenses
+    WHEN old.deleted_at IS NULL AND new.deleted_at IS NOT NULL BEGIN
+        DELETE FROM expense_search WHERE rowid = old.id;
+    END""",
+    'expenses_search_restore': """CREATE TRIGGER IF NOT EXISTS expenses_search_restore AFTER UPDATE OF deleted_at ON expenses
+    WHEN old.deleted_at IS NOT NULL AND new.deleted_at IS NULL BEGIN
+        INSERT INTO expense_search (rowid, owner, description, category)
+        VALUES (new.id, 'u' || new.user_id, new.description,
+                (SELECT name FROM categories WHERE id = new.category_id));
+    END""",
+    'expenses_search_update': """CREATE TRIGGER IF NOT EXISTS expenses_search_update AFTER UPDATE OF description, category_id, user_id ON expenses BEGIN
+        UPDATE expense_search
+        SET owner = 'u' || new.user_id, description = new.description,
+            category = (SELECT name FROM categories WHERE id = new.category_id)
+        WHERE rowid = old.id;
+    END""",
+    'expenses_search_delete': """CREATE TRIGGER IF NOT EXISTS expenses_search_delete AFTER DELETE ON expenses BEGIN
+        DELETE FROM expense_search WHERE rowid = old.id;
+    END""",
+    'categories_search_rename': """CREATE TRIGGER IF NOT EXISTS categories_search_rename AFTER UPDATE OF name ON categories BEGIN
+        UPDATE expense_search SET category = new.name
+        WHERE rowid IN (SELECT id FROM expenses
+                        WHERE user_id = new.user_id AND category_id = new.id AND deleted_at IS NULL);
+    END""",
+}
+POSTGRES_SEARCH_INDEXES = {
+    'ix_expenses_description_fts': "CREATE INDEX IF NOT EXISTS ix_expenses_description_fts "
+                                   "ON expenses USING GIN (to_tsvector('simple', description))",
+    'ix_categories_name_fts': "CREATE INDEX IF NOT EXISTS ix_categories_name_fts "
+                              "ON categories USING GIN (to_tsvector('simple', name))",
+}
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for statement in POSTGRES_SEARCH_INDEXES.values():
+            op.execute(statement)
+        return
+
+    if not sa.inspect(op.get_bind()).has_table('expense_search'):
+        # The triggers would write to the table that is gone
+        for trigger in SQLITE_SEARCH_TRIGGERS:
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute(SQLITE_SEARCH_TABLE)
+        op.execute("""
+            INSERT INTO expense_search (rowid, owner, description, category)
+            SELECT e.id, 'u' || e.user_id, e.description, c.name
+            FROM expenses e JOIN categories c ON c.id = e.category_id
+            WHERE e.deleted_at IS NULL
+        """)
+        op.execute("INSERT INTO expense_search (expense_search) VALUES ('optimize')")
+    for statement in SQLITE_SEARCH_TRIGGERS.values():
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for index in POSTGRES_SEARCH_INDEXES:
+            op.execute(f'DROP INDEX IF EXISTS {index}')
+        return
+
+    for trigger in SQLITE_SEARCH_TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS expense_search')
@@ -0,0 +1,47 @@
+"""unique pending export jobs
+
+Two requests for the same export could both miss the existing jobs and each
+queue a full build. A unique partial index now allows one queued or running
+job per user, period, format and data version; see find_or_create_job.
+Duplicates already pending are resolved first by failing all but the newest.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-21 09:14:52.208436
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+PENDING_JOBS = sa.text("status IN ('queued', 'running')")
+
+
+def upgrade():
+    op.execute("""
+        UPDATE export_jobs
+        SET status = 'failed', error = 'Superseded by an identical export.', finished_at = CURRENT_TIMESTAMP
+        WHERE status IN ('queued', 'running') AND EXISTS (
+            SELECT 1 FROM export_jobs AS newer
+            WHERE newer.status IN ('queued', 'running')
+              AND newer.user_id = export_jobs.user_id
+              AND newer.period_start = export_jobs.period_start
+              AND newer.period_end = export_jobs.period_end
+              AND newer.format = export_jobs.format
+              AND newer.data_version = export_jobs.data_version
+              AND (newer.created_at > export_jobs.created_at
+                   OR (newer.created_at = export_jobs.created_at AND newer.id > export_jobs.id)))
+    """)
+    with op.batch_alter_table('export_jobs', schema=None) as batch_op:
+        batch_op.create_index('uq_export_jobs_pending', ['user_id', 'period_start', 'period_end', 'format', 'data_version'], unique=True, sqlite_where=PENDING_JOBS, postgresql_where=PENDING_JOBS)
+
+
+def downgrade():
+    with op.batch_alter_table('export_jobs', schema=None) as batch_op:
+        batch_op.drop_index('uq_export_jobs_pending', sqlite_where=PENDING_JOBS, postgresql_where=PENDING_JOBS)
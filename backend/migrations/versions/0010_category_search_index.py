@@ -0,0 +1,142 @@
+"""category search index
+
+Each expense's search document held its category's name, so merging
+categories rewrote the document of every moved expense, and renaming one
+rewrote those of all its expenses. On SQLite the names now live in their own
+FTS5 table, one row per category, that searches join to expenses; the
+expense documents keep the owner and description only. PostgreSQL already
+indexed category names separately and is unchanged. The statements are
+frozen copies of those in ``backend/expense_tracker/search.py``. A partial
+index on live expenses by user and category serves the join on both.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-21 15:02:37.641093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+TOKENIZE = """
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4 5 6'
+    )"""
+SEARCH_TABLES = {
+    'expense_search': 'CREATE VIRTUAL TABLE expense_search USING fts5(\n        owner, description,' + TOKENIZE,
+    'category_search': 'CREATE VIRTUAL TABLE category_search USING fts5(\n        owner, name,' + TOKENIZE,
+}
+SEARCH_TRIGGERS = {
+    'expenses_search_insert': """CREATE TRIGGER IF NOT EXISTS expenses_search_insert AFTER INSERT ON expenses
+    WHEN new.deleted_at IS NULL BEGIN
+        INSERT INTO expense_search (rowid, owner, description) VALUES (new.id, 'u' || new.user_id, new.description);
+    END""",
+    'expenses_search_soft_delete': """CREATE TRIGGER IF NOT EXISTS expenses_search_soft_delete AFTER UPDATE OF deleted_at ON expenses
+    WHEN old.deleted_at IS NULL AND new.deleted_at IS NOT NULL BEGIN
+        DELETE FROM expense_search WHERE rowid = old.id;
+    END""",
+    'expenses_search_restore': """CREATE TRIGGER IF NOT EXISTS expenses_search_restore AFTER UPDATE OF deleted_at ON expenses
+    WHEN old.deleted_at IS NOT NULL AND new.deleted_at IS NULL BEGIN
+        INSERT INTO expense_search (rowid, owner, description) VALUES (new.id, 'u' || new.user_id, new.description);
+    END""",
+    'expenses_search_update': """CREATE TRIGGER IF NOT EXISTS expenses_search_update AFTER UPDATE OF description, user_id ON expenses BEGIN
+        UPDATE expense_search SET owner = 'u' || new.user_id, description = new.description WHERE rowid = old.id;
+    END""",
+    'expenses_search_delete': """CREATE TRIGGER IF NOT EXISTS expenses_search_delete AFTER DELETE ON expenses BEGIN
+        DELETE FROM expense_search WHERE rowid = old.id;
+    END""",
+    'categories_search_insert': """CREATE TRIGGER IF NOT EXISTS categories_search_insert AFTER INSERT ON categories BEGIN
+        INSERT INTO category_search (rowid, owner, name) VALUES (new.id, 'u' || new.user_id, new.name);
+    END""",
+    'categories_search_update': """CREATE TRIGGER IF NOT EXISTS categories_search_update AFTER UPDATE OF name, user_id ON categories BEGIN
+        UPDATE category_search SET owner = 'u' || new.user_id, name = new.name WHERE rowid = old.id;
+    END""",
+    'categories_search_delete': """CREATE TRIGGER IF NOT EXISTS categories_search_delete AFTER DELETE ON categories BEGIN
+        DELETE FROM category_search WHERE rowid = old.id;
+    END""",
+}
+
+# Revision 0007's index, restored by the downgrade
+OLD_SEARCH_TABLE = 'CREATE VIRTUAL TABLE expense_search USING fts5(\n        owner, description, category,' + TOKENIZE
+OLD_SEARCH_TRIGGERS = {
+    'expenses_search_insert': """CREATE TRIGGER IF NOT EXISTS expenses_search_insert AFTER INSERT ON expenses
+    WHEN new.deleted_at IS NULL BEGIN
+        INSERT INTO expense_search (rowid, owner, description, category)
+        VALUES (new.id, 'u' || new.user_id, new.description,
+                (SELECT name FROM categories WHERE id = new.category_id));
+    END""",
+    'expenses_search_soft_delete': SEARCH_TRIGGERS['expenses_search_soft_delete'],
+    'expenses_search_restore': """CREATE TRIGGER IF NOT EXISTS expenses_search_restore AFTER UPDATE OF deleted_at ON expenses
+    WHEN old.deleted_at IS NOT NULL AND new.deleted_at IS NULL BEGIN
+        INSERT INTO expense_search (rowid, owner, description, category)
+        VALUES (new.id, 'u' || new.user_id, new.description,
+                (SELECT name FROM categories WHERE id = new.category_id));
+    END""",
+    'expenses_search_update': """CREATE TRIGGER IF NOT EXISTS expenses_search_update AFTER UPDATE OF description, category_id, user_id ON expenses BEGIN
+        UPDATE expense_search
+        SET owner = 'u' || new.user_id, description = new.description,
+            category = (SELECT name FROM categories WHERE id = new.category_id)
+        WHERE rowid = old.id;
+    END""",
+    'expenses_search_delete': SEARCH_TRIGGERS['expenses_search_delete'],
+    'categories_search_rename': """CREATE TRIGGER IF NOT EXISTS categories_search_rename AFTER UPDATE OF name ON categories BEGIN
+        UPDATE expense_search SET category = new.name
+        WHERE rowid IN (SELECT id FROM expenses
+                        WHERE user_id = new.user_id AND category_id = new.id AND deleted_at IS NULL);
+    END""",
+}
+
+
+def _drop(tables, triggers):
+    # Triggers first: they write to the tables
+    for trigger in triggers:
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    for table in tables:
+        op.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def upgrade():
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.create_index('ix_expenses_user_category', ['user_id', 'category_id'], unique=False, sqlite_where=sa.text('deleted_at IS NULL'), postgresql_where=sa.text('deleted_at IS NULL'))
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    _drop(['expense_search'], OLD_SEARCH_TRIGGERS)
+    for statement in SEARCH_TABLES.values():
+        op.execute(statement)
+    op.execute("""
+        INSERT INTO expense_search (rowid, owner, description)
+        SELECT id, 'u' || user_id, description FROM expenses WHERE deleted_at IS NULL
+    """)
+    op.execute("INSERT INTO category_search (rowid, owner, name) SELECT id, 'u' || user_id, name FROM categories")
+    for table in SEARCH_TABLES:
+        op.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+    for statement in SEARCH_TRIGGERS.values():
+        op.execute(statement)
+
+
+def downgrade():
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.drop_index('ix_expenses_user_category', sqlite_where=sa.text('deleted_at IS NULL'), postgresql_where=sa.text('deleted_at IS NULL'))
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    _drop(SEARCH_TABLES, SEARCH_TRIGGERS)
+    op.execute(OLD_SEARCH_TABLE)
+    op.execute("""
+        INSERT INTO expense_search (rowid, owner, description, category)
+        SELECT e.id, 'u' || e.user_id, e.description, c.name
+        FROM expenses e JOIN categories c ON c.id = e.category_id
+        WHERE e.deleted_at IS NULL
+    """)
+    op.execute("INSERT INTO expense_search (expense_search) VALUES ('optimize')")
+    for statement in OLD_SEARCH_TRIGGERS.values():
+        op.execute(statement)
@@ -0,0 +1,113 @@
+# backend/online_migrations.py
+"""Helpers for migrations that touch large tables while the app keeps running.
+
+Data changes go through ``batched_update`` so that each batch of rows is its
+own short transaction. In a dry run (``flask init-db --dry-run`` or
+``flask db upgrade -x dry_run=1``) the migrations run inside a transaction
+that is rolled back. Batched updates are not executed at all. Instead they
+count the rows they would touch. Every other row written along the way is
+counted too, such as the table copies SQLite makes when altering columns.
+"""
+import logging
+import time
+from contextlib import contextmanager
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import event
+
+logger = logging.getLogger('alembic.online_migrations')
+
+# Key in Connection.info holding the dry run's running row count
+DRY_RUN_ROWS = 'dry_run_rows'
+
+
+def is_dry_run():
+    return DRY_RUN_ROWS in op.get_bind().info
+
+
+def _count_rows(rows):
+    op.get_bind().info[DRY_RUN_ROWS] += rows
+
+
+def batched_update(table, values, where=None, batch_size=1000, key='id', pause_seconds=0):
+    """Run ``UPDATE table SET values WHERE where`` in ranges of ``batch_size`` keys.
+
+    ``values`` maps column names to values or SQL expressions, and ``where``
+    is an optional SQL string or expression. Each batch commits on its own,
+    so locks are held only briefly and a failure leaves the earlier batches
+    applied; write updates that are safe to run again. ``key`` must be an
+    integer column, normally the primary key. ``pause_seconds`` sleeps
+    between batches to leave the database room for live traffic. Returns the
+    number of rows updated, or the number that would be in a dry run.
+    """
+    columns = {key, *values}
+    target = sa.table(table, *(sa.column(name) for name in columns))
+    pk = target.c[key]
+    condition = sa.text(where) if isinstance(where, str) else where
+
+    if is_dry_run():
+        query = sa.select(sa.func.count()).select_from(target)
+        if condition is not None:
+            query = query.where(condition)
+        rows = op.get_bind().execute(query).scalar()
+        _count_rows(rows)
+        logger.info("Dry run: would update %d rows of %s in batches of %d", rows, table, batch_size)
+        return rows
+
+    low, high = op.get_bind().execute(sa.select(sa.func.min(pk), sa.func.max(pk))).one()
+    if low is None:
+        return 0
+
+    updated = 0
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        for start in range(low, high + 1, batch_size):
+            statement = sa.update(target).where(pk >= start, pk < start + batch_size).values(**values)
+            if condition is not None:
+                statement = statement.where(condition)
+            updated += bind.execute(statement).rowcount
+            if pause_seconds:
+                time.sleep(pause_seconds)
+    logger.info("Updated %d rows of %s", updated, table)
+    return updated
+
+
+def _count_written_rows(conn, cursor, statement, parameters, context, executemany):
+    verb = statement.lstrip()[:6].upper()
+    if verb in ('INSERT', 'UPDATE', 'DELETE') and 'alembic_version' not in statement and cursor.rowcount > 0:
+        conn.info[DRY_RUN_ROWS] += cursor.rowcount
+
+
+@contextmanager
+def dry_run(connection):
+    """Roll back everything, DDL included, that runs on ``connection`` inside the block."""
+    sqlite = connection.dialect.name == 'sqlite'
+    if sqlite:
+        # pysqlite only opens a transaction before DML, so DDL would commit
+        # as it runs; open one explicitly instead
+        driver = connection.connection.driver_connection
+        isolation_level = driver.isolation_level
+        driver.isolation_level = None
+        connection.exec_driver_sql('BEGIN')
+    else:
+        connection.begin()
+    connection.info[DRY_RUN_ROWS] = 0
+    event.listen(connection, 'after_cursor_execute', _count_written_rows)
+    try:
+        yield
+    finally:
+        event.remove(connection, 'after_cursor_execute', _count_written_rows)
+        del connection.info[DRY_RUN_ROWS]
+        connection.rollback()
+        if sqlite:
+            driver.isolation_level = isolation_level
+
+
+def report_step(connection):
+    """Return an ``on_version_apply`` callback that logs each revision's dry-run row count."""
+    def on_version_apply(ctx, step, heads, run_args):
+        rows = connection.info[DRY_RUN_ROWS]
+        connection.info[DRY_RUN_ROWS] = 0
+        logger.info("Dry run: revision %s (%s) would touch about %d rows",
+                    step.up_revision_id, step.up_revision.doc, rows)
+    return on_version_apply
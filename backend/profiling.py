@@ -0,0 +1,199 @@
+# backend/profiling.py
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from flask import Response, current_app, g, jsonify, request
+from flask_login import current_user, login_required
+from backend.decorators import admin_required
+from backend.logging_config import setup_logging
+
+
+logger = setup_logging()
+
+PROFILE_HEADER = 'X-Profile'
+
+
+class StackSampler(threading.Thread):
+    """Sample one thread's Python stack every ``interval`` seconds.
+
+    The counts are kept in the collapsed-stack format read by flamegraph.pl
+    and speedscope: ``outer;inner;leaf count`` per line.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class ProfileStore:
+    """Thread-safe ring buffer of the most recent request profiles."""
+
+    def __init__(self, size):
+        self.size = size
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles[profile['id']] = profile
+            while len(self._profiles) > self.size:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def summaries(self):
+        with self._lock:
+            profiles = list(self._profiles.values())
+        keys = ('id', 'method', 'path', 'endpoint', 'status', 'duration_ms', 'started_at', 'trigger', 'samples')
+        return [{key: profile[key] for key in keys} for profile in reversed(profiles)]
+
+
+def _should_profile():
+    """Return what triggered profiling for this request, or ``None``.
+
+    The header is honoured for admins only, so clients cannot make the server
+    do extra work; checking it costs a user lookup only when it is present.
+    """
+    if request.headers.get(PROFILE_HEADER) and current_user.is_authenticated and current_user.is_admin:
+        return 'header'
+    rate = current_app.config.get('PROFILE_SAMPLE_RATE', 0)
+    if rate and random.random() < rate:
+        return 'sample'
+    return None
+
+
+class _Snapshot:
+    # pstats.Stats() calls create_stats() on what it is given, which would
+    # discard an already-snapshotted cProfile.Profile's data.
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _render_text(profile, limit=50):
+    out = io.StringIO()
+    stats = pstats.Stats(_Snapshot(profile['stats']), stream=out)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return out.getvalue()
+
+
+def init_profiling(app):
+    """Install the opt-in request profiler and its admin endpoints on ``app``.
+
+    A request is profiled when an admin sends the ``X-Profile`` header or it
+    falls within ``PROFILE_SAMPLE_RATE``. Each profiled request records a
+    cProfile run (downloadable as a ``.pstats`` file) and a stack sample
+    (downloadable as collapsed stacks for flame graphs). Only one request is
+    profiled at a time because a profiler can only be attached to one thread
+    cleanly; others run unprofiled. Nothing is installed unless
+    ``PROFILING_ENABLED`` is set.
+    """
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+
+    store = ProfileStore(app.config.get('PROFILE_BUFFER_SIZE', 20))
+    active = threading.Lock()
+    interval = app.config.get('PROFILE_SAMPLE_INTERVAL_MS', 5) / 1000
+    app.extensions['profile_store'] = store
+
+    @app.before_request
+    def start_profile():
+        trigger = _should_profile()
+        if trigger is None or not active.acquire(blocking=False):
+            return
+        sampler = StackSampler(threading.get_ident(), interval)
+        profiler = cProfile.Profile()
+        g.profile = {'trigger': trigger, 'profiler': profiler, 'sampler': sampler,
+                     'started': time.perf_counter(), 'started_at': datetime.now(timezone.utc).isoformat()}
+        sampler.start()
+        profiler.enable()
+
+    @app.after_request
+    def record_profile_status(response):
+        if 'profile' in g:
+            g.profile['status'] = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_profile(exc):
+        state = g.pop('profile', None)
+        if state is None:
+            return
+        try:
+            state['profiler'].disable()
+            state['sampler'].stop()
+            state['profiler'].create_stats()
+            duration_ms = round((time.perf_counter() - state['started']) * 1000, 2)
+            store.add({
+                'id': g.get('request_id') or os.urandom(8).hex(),
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': state.get('status', 500),
+                'duration_ms': duration_ms,
+                'started_at': state['started_at'],
+                'trigger': state['trigger'],
+                'samples': sum(state['sampler'].stacks.values()),
+                'stats': state['profiler'].stats,
+                'stacks': state['sampler'].stacks,
+            })
+            logger.info("Profiled %s %s in %.1f ms", request.method, request.path, duration_ms)
+        finally:
+            active.release()
+
+    @app.route('/admin/profiles', methods=['GET'])
+    @login_required
+    @admin_required
+    def list_profiles():
+        return jsonify(store.summaries()), 200
+
+    @app.route('/admin/profiles/<profile_id>', methods=['GET'])
+    @login_required
+    @admin_required
+    def download_profile(profile_id):
+        profile = store.get(profile_id)
+        if not profile:
+            return jsonify({'message': 'Profile not found'}), 404
+
+        fmt = request.args.get('format', 'text')
+        if fmt == 'pstats':
+            # Same layout as cProfile's dump_stats(), readable by pstats/snakeviz
+            return Response(marshal.dumps(profile['stats']), mimetype='application/octet-stream',
+                            headers={'Content-Disposition': f'attachment; filename={profile_id}.pstats'})
+        if fmt == 'collapsed':
+            body = ''.join(f'{stack} {count}\n' for stack, count in profile['stacks'].most_common())
+            return Response(body, mimetype='text/plain',
+                            headers={'Content-Disposition': f'attachment; filename={profile_id}.folded'})
+        if fmt == 'text':
+            return Response(_render_text(profile), mimetype='text/plain')
+        return jsonify({'message': 'Invalid format. Use text, pstats or collapsed.'}), 400
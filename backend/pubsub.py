@@ -0,0 +1,131 @@
+# backend/pubsub.py
+import glob
+import os
+import socket
+import threading
+import time
+from backend.logging_config import setup_logging
+
+
+logger = setup_logging()
+
+
+class SocketDirBroker:
+    """Local pub/sub stand-in built on Unix datagram sockets in one directory.
+
+    Each subscriber process binds its own socket in ``directory``, and
+    publishers send every message to each socket they find there. That fans
+    messages out to all subscriber processes on the host without running a
+    broker. Sends never block: if a subscriber is not keeping up, its message
+    is dropped and logged.
+    """
+
+    def __init__(self, directory, rescan_seconds=2):
+        self.directory = directory
+        self.rescan_seconds = rescan_seconds
+        self._targets = []
+        self._scanned_at = 0
+        self._lock = threading.Lock()
+        self._socket = None
+
+    def _subscribers(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._scanned_at > self.rescan_seconds:
+                self._targets = glob.glob(os.path.join(self.directory, '*.sock'))
+                self._scanned_at = now
+            return self._targets
+
+    def has_subscribers(self):
+        return bool(self._subscribers())
+
+    def publish(self, message):
+        """Send ``message`` (bytes) to every subscriber process."""
+        targets = self._subscribers()
+        if not targets:
+            return
+        with self._lock:
+            if self._socket is None:
+                self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._socket.setblocking(False)
+        for path in targets:
+            try:
+                self._socket.sendto(message, path)
+            except BlockingIOError:
+                logger.warning("Live subscriber %s is not keeping up; dropped a message", path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a subscriber that exited without cleaning up
+                logger.info("Removing stale live subscriber socket %s", path)
+                with self._lock:
+                    self._scanned_at = 0
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+    def subscribe(self, loop, callback):
+        """Deliver every message to ``callback`` on ``loop``; returns a function that unsubscribes."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'live-{os.getpid()}.sock')
+        if os.path.exists(path):
+            os.unlink(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        sock.bind(path)
+        sock.setblocking(False)
+
+        def on_readable():
+            while True:
+                try:
+                    callback(sock.recv(65536))
+                except BlockingIOError:
+                    return
+
+        loop.add_reader(sock.fileno(), on_readable)
+
+        def unsubscribe():
+            loop.remove_reader(sock.fileno())
+            sock.close()
+            if os.path.exists(path):
+                os.unlink(path)
+        return unsubscribe
+
+
+class RedisBroker:
+    """Pub/sub through a Redis channel, reaching subscribers on every host."""
+
+    def __init__(self, url, channel='budgetbee:live'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError('LIVE_PUBSUB_URL points at Redis but the "redis" package is not installed.') from e
+        self.channel = channel
+        self._client = redis.Redis.from_url(url)
+
+    def has_subscribers(self):
+        return True
+
+    def publish(self, message):
+        try:
+            self._client.publish(self.channel, message)
+        except Exception as e:
+            logger.warning("Live pub/sub unavailable, dropped a message: %s", e)
+
+    def subscribe(self, loop, callback):
+        # One listener thread per subscriber process, however many clients it serves
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+
+        def listen():
+            for message in pubsub.listen():
+                loop.call_soon_threadsafe(callback, message['data'])
+
+        threading.Thread(target=listen, name='live-pubsub', daemon=True).start()
+        return pubsub.close
+
+
+def make_broker(app):
+    url = app.config.get('LIVE_PUBSUB_URL')
+    if url:
+        return RedisBroker(url)
+    return SocketDirBroker(app.config['LIVE_SOCKET_DIR'])
@@ -0,0 +1,175 @@
+# backend/ratelimit.py
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, jsonify, request
+from backend.logging_config import setup_logging
+from backend.metrics import RATE_LIMITED
+
+
+logger = setup_logging()
+
+
+class MemoryStore:
+    """In-process token buckets, evicting the least recently used past ``max_keys``.
+
+    Each worker process keeps its own buckets, so limits are per process;
+    use ``RedisStore`` to share them between workers.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, buckets, cost=1):
+        """Take ``cost`` tokens from every ``(key, capacity, rate)`` bucket, or from none of them.
+
+        Returns ``(denied, retry_after_seconds)``: ``denied`` is the index of
+        the first bucket short of tokens, or ``None`` when all were charged.
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            for key, capacity, rate in buckets:
+                tokens, updated = self._buckets.pop(key, (capacity, now))
+                levels.append(min(capacity, tokens + (now - updated) * rate))
+            denied = next((index for index, tokens in enumerate(levels) if tokens < cost), None)
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - cost if denied is None else tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        if denied is None:
+            return None, 0
+        return denied, (cost - levels[denied]) / buckets[denied][2]
+
+
+class RedisStore:
+    """Token buckets shared between workers through a Redis-compatible server.
+
+    Each check is one atomic Lua script call over all of a request's buckets
+    that uses the server's clock, so workers with skewed clocks agree. Keys
+    expire once a bucket would be full again. If the server is unreachable
+    requests are let through (fail open) rather than locking every user out.
+    """
+
+    # ARGV: cost, then capacity and rate for each key. Returns the 1-based
+    # index of the first bucket short of tokens (0 if none) and its level
+    SCRIPT = """
+        local cost = tonumber(ARGV[1])
+        local clock = redis.call('TIME')
+        local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+        local levels = {}
+        local denied = 0
+        for i, key in ipairs(KEYS) do
+            local capacity = tonumber(ARGV[2 * i])
+            local rate = tonumber(ARGV[2 * i + 1])
+            local state = redis.call('HMGET', key, 'tokens', 'updated')
+            local tokens = tonumber(state[1]) or capacity
+            local updated = tonumber(state[2]) or now
+            levels[i] = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+            if denied == 0 and levels[i] < cost then
+                denied = i
+            end
+        end
+        for i, key in ipairs(KEYS) do
+            local capacity = tonumber(ARGV[2 * i])
+            local rate = tonumber(ARGV[2 * i + 1])
+            local tokens = levels[i]
+            if denied == 0 then
+                tokens = tokens - cost
+            end
+            redis.call('HSET', key, 'tokens', tostring(tokens), 'updated', tostring(now))
+            redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+        end
+        return {denied, tostring(levels[math.max(denied, 1)])}
+    """
+
+    def __init__(self, url, prefix='budgetbee:ratelimit:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError('RATELIMIT_STORAGE_URL points at Redis but the "redis" package is not installed.') from e
+        self.prefix = prefix
+        self._script = redis.Redis.from_url(url).register_script(self.SCRIPT)
+
+    def consume(self, buckets, cost=1):
+        args = [cost]
+        for _, capacity, rate in buckets:
+            args += [capacity, rate]
+        try:
+            denied, tokens = self._script(keys=[self.prefix + key for key, _, _ in buckets], args=args)
+        except Exception as e:
+            logger.warning("Rate limit store unavailable, allowing request: %s", e)
+            return None, 0
+        if not denied:
+            return None, 0
+        return denied - 1, (cost - float(tokens)) / buckets[denied - 1][2]
+
+
+def _account(req):
+    # The submitted email, read from the body only: no user lookup happens here
+    data = req.get_json(silent=True) if req.is_json else req.form
+    email = (data or {}).get('email')
+    return str(email).strip().lower() if email else None
+
+
+SCOPES = {
+    'ip': lambda req: req.remote_addr or 'unknown',
+    'account': _account,
+    'endpoint': lambda req: '*',
+}
+
+
+def make_store(app):
+    url = app.config.get('RATELIMIT_STORAGE_URL')
+    if url:
+        return RedisStore(url)
+    return MemoryStore(app.config.get('RATELIMIT_MAX_KEYS', 100000))
+
+
+def init_rate_limits(app):
+    """Throttle the endpoints listed in ``RATE_LIMITS`` with token buckets.
+
+    ``RATE_LIMITS`` maps endpoint names to ``(scope, requests, seconds)``
+    rules, where scope is ``'ip'``, ``'account'`` (the submitted email) or
+    ``'endpoint'`` (all clients together). A bucket holds ``requests`` tokens
+    and refills at ``requests / seconds`` per second. A request takes a token
+    from each of its buckets only if every one of them has one, so a request
+    refused by one rule does not drain the others.
+
+    The check is registered right after ``init_request_ids``, ahead of every
+    other ``before_request`` hook, so a limited request is answered with 429
+    before any password hashing, email or database work. Client addresses
+    come from ``request.remote_addr``; behind a reverse proxy, set
+    ``PROXY_FIX_X_FOR`` so it is read from ``X-Forwarded-For``.
+    """
+    if not app.config.get('RATELIMIT_ENABLED', True):
+        return
+
+    store = make_store(app)
+    app.extensions['rate_limit_store'] = store
+
+    @app.before_request
+    def enforce_rate_limits():
+        rules = current_app.config.get('RATE_LIMITS', {}).get(request.endpoint)
+        if not rules:
+            return None
+        checks, buckets = [], []
+        for scope, requests, seconds in rules:
+            identity = SCOPES[scope](request)
+            if identity is not None:
+                checks.append((scope, identity))
+                buckets.append((f'{request.endpoint}:{scope}:{identity}', requests, requests / seconds))
+        if not buckets:
+            return None
+        denied, retry_after = store.consume(buckets)
+        if denied is None:
+            return None
+        scope, identity = checks[denied]
+        RATE_LIMITED.inc(endpoint=request.endpoint, scope=scope)
+        logger.warning("Rate limited %s by %s (%s)", request.endpoint, scope, identity)
+        response = jsonify({'message': 'Too many requests. Please try again later.'})
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response, 429
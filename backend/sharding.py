@@ -0,0 +1,413 @@
+# backend/sharding.py
+"""Horizontal sharding of per-user data across several databases.
+
+The per-user tables (``SHARDED_TABLES``) exist in every shard, and each
+user's rows live in exactly one of them. The default database is the shard
+named ``default``. The others are listed in the ``SHARDS`` config as
+name -> URI and are given engines as Flask-SQLAlchemy binds. Every shard is
+a complete database built by the same migrations, so the global tables also
+exist in the other shards but stay empty there.
+
+The ``user_shards`` table in the default database maps users to shards.
+Users without an entry, i.e. everyone who signed up before sharding was
+enabled, live on ``default``.
+
+``ShardedSession`` sends every statement on a sharded table to the current
+shard: the one chosen with ``use_shard``, or else the logged-in user's. Work
+that spans users, like background jobs and admin reports, loops over
+``shard_names()`` with ``use_shard``. ``move_user`` rebalances one user onto
+another shard while the app keeps serving; every transaction that writes a
+user's rows passes ``fence_writes`` first, so none can land on the old shard
+once the copy has started.
+"""
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import chain
+import sqlalchemy as sa
+from flask import current_app, has_app_context, has_request_context, jsonify, request
+from flask_login import current_user
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.util import find_tables
+from backend.logging_config import setup_logging
+
+
+logger = setup_logging()
+
+DEFAULT_SHARD = 'default'
+SHARDED_TABLES = frozenset({
+    'categories', 'income', 'expenses', 'recurring_rules', 'budgets', 'category_month_totals',
+    'sync_tombstones', 'sync_counters', 'feedback', 'archived_years', 'audit_events',
+})
+# Session.info keys: the shard chosen with use_shard, the logged-in user's
+# (shard, moving) entry once it has been looked up, and the users whose
+# writes the current transaction has fenced
+SHARD = 'shard'
+USER_SHARD = 'user_shard'
+FENCED = 'fenced_users'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+MOVING_MESSAGE = 'Your data is being moved. Please retry in a few seconds.'
+
+
+class UserMovingError(RuntimeError):
+    """Raised when a transaction writes rows of a user who is being moved to another shard."""
+
+
+def _db():
+    # The models and ``db`` import this module, so it cannot import them first
+    from backend.init_db import db
+    return db
+
+
+def sharding_enabled():
+    return bool(current_app.config.get('SHARDS'))
+
+
+def shard_names():
+    return [DEFAULT_SHARD, *sorted(current_app.config.get('SHARDS') or {})]
+
+
+def shard_engine(shard):
+    return _db().engines[None if shard == DEFAULT_SHARD else shard]
+
+
+def init_sharding(app):
+    """Register each shard's engine as a bind; call before ``db.init_app``."""
+    shards = app.config.get('SHARDS') or {}
+    if DEFAULT_SHARD in shards:
+        raise ValueError(f'"{DEFAULT_SHARD}" names the main database and cannot be listed in SHARDS.')
+    app.config['SQLALCHEMY_BINDS'] = {**(app.config.get('SQLALCHEMY_BINDS') or {}), **shards}
+
+
+def place_user(user_id):
+    """Pick the shard for a new user; new users are spread evenly by id."""
+    names = shard_names()
+    return names[user_id % len(names)]
+
+
+def lookup_shard(user_id):
+    """Return ``(shard, moving)`` for ``user_id`` from the shard map.
+
+    Reads through its own connection, so it is safe inside a flush.
+    """
+    if not sharding_enabled():
+        return DEFAULT_SHARD, False
+    from backend.authentication.models import UserShard
+
+    table = UserShard.__table__
+    with shard_engine(DEFAULT_SHARD).connect() as connection:
+        row = connection.execute(sa.select(table.c.shard, table.c.moving).where(table.c.user_id == user_id)).first()
+    return (row.shard, bool(row.moving)) if row else (DEFAULT_SHARD, False)
+
+
+def shard_for(user_id):
+    return lookup_shard(user_id)[0]
+
+
+def users_by_shard(user_ids):
+    """Group ``user_ids`` by the shard holding their rows: ``{shard: [user_id, ...]}``."""
+    if not sharding_enabled():
+        return {DEFAULT_SHARD: list(user_ids)}
+    from backend.authentication.models import UserShard
+
+    table = UserShard.__table__
+    with shard_engine(DEFAULT_SHARD).connect() as connection:
+        placed = dict(connection.execute(sa.select(table.c.user_id, table.c.shard).where(table.c.user_id.in_(user_ids))).all())
+    groups = {}
+    for user_id in user_ids:
+        groups.setdefault(placed.get(user_id, DEFAULT_SHARD), []).append(user_id)
+    return groups
+
+
+def moving_user_ids():
+    """Return the ids of users whose rows are being moved between shards."""
+    if not sharding_enabled():
+        return set()
+    from backend.authentication.models import UserShard
+
+    table = UserShard.__table__
+    with shard_engine(DEFAULT_SHARD).connect() as connection:
+        return set(connection.execute(sa.select(table.c.user_id).where(table.c.moving.is_(True))).scalars())
+
+
+def _current_user_shard(session):
+    if USER_SHARD not in session.info:
+        if not has_request_context() or not current_user.is_authenticated:
+            return DEFAULT_SHARD, False
+        session.info[USER_SHARD] = lookup_shard(current_user.id)
+    return session.info[USER_SHARD]
+
+
+def _is_sharded(mapper, clause):
+    if mapper is not None:
+        return sa.inspect(mapper).local_table.name in SHARDED_TABLES
+    if isinstance(clause, sa.Table):
+        return clause.name in SHARDED_TABLES
+    if isinstance(clause, sa.sql.ClauseElement):
+        return any(table.name in SHARDED_TABLES for table in find_tables(clause, include_crud=True))
+    return False
+
+
+class ShardedSession(Session):
+    """Flask-SQLAlchemy session that sends sharded tables to the current shard."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and current_app.config.get('SHARDS') and _is_sharded(mapper, clause):
+            shard = self.info.get(SHARD) or _current_user_shard(self)[0]
+            if shard != DEFAULT_SHARD:
+                return self._db.engines[shard]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _switch(session, shard):
+    if session.info.get(SHARD) == shard:
+        return
+    # Write what is pending to the shard it was loaded from, and forget rows
+    # from that shard: ids repeat across shards, so the identity map must not
+    # hand them out for another one
+    session.flush()
+    for obj in list(session.identity_map.values()):
+        if sa.inspect(obj).mapper.local_table.name in SHARDED_TABLES:
+            session.expunge(obj)
+    if shard is None:
+        session.info.pop(SHARD, None)
+    else:
+        session.info[SHARD] = shard
+
+
+@contextmanager
+def use_shard(shard):
+    """Route the current session's sharded statements to ``shard`` inside the block."""
+    if not sharding_enabled():
+        yield
+        return
+    session = _db().session()
+    previous = session.info.get(SHARD)
+    _switch(session, shard)
+    try:
+        yield
+    finally:
+        _switch(session, previous)
+
+
+def use_user_shard(user_id):
+    return use_shard(shard_for(user_id))
+
+
+def reject_writes_while_moving():
+    """``before_request`` hook: refuse writes from a user whose rows are being moved."""
+    if request.method in READ_METHODS or not sharding_enabled() or not current_user.is_authenticated:
+        return None
+    _, moving = _current_user_shard(_db().session())
+    if moving:
+        return jsonify({'message': MOVING_MESSAGE}), 503, {'Retry-After': '5'}
+    return None
+
+
+def moving_error_response(error):
+    """Error handler answering a write fenced off by ``fence_writes`` like ``reject_writes_while_moving``."""
+    _db().session.rollback()
+    return jsonify({'message': str(error)}), 503, {'Retry-After': '5'}
+
+
+def _counter_lock(dialect, user_ids):
+    # The upsert next_revisions runs, without the increment: it locks the
+    # users' sync counter rows, creating missing ones, until the transaction ends
+    if dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    counters = _db().metadata.tables['sync_counters']
+    stmt = insert(counters).values([{'user_id': user_id, 'revision': 1} for user_id in sorted(user_ids)])
+    return stmt.on_conflict_do_update(index_elements=[counters.c.user_id], set_={'revision': counters.c.revision})
+
+
+def fence_writes(session, user_ids, locked=False):
+    """Make sure this transaction may write rows of ``user_ids`` on the current shard.
+
+    Locks the users' sync counter rows, unless the caller already holds the
+    locks (``locked``), then checks the shard map. Raises ``UserMovingError``
+    if a user is being moved or no longer lives on this shard. ``move_user``
+    takes the same lock before copying, so a write that passed the check
+    commits before the copy starts, and any later one fails here.
+    """
+    if not sharding_enabled():
+        return
+    fenced = session.info.setdefault(FENCED, set())
+    pending = set(user_ids) - fenced
+    if not pending:
+        return
+    counters = _db().metadata.tables['sync_counters']
+    if not locked:
+        session.execute(_counter_lock(session.get_bind(clause=counters).dialect, pending))
+    shard = session.info.get(SHARD) or _current_user_shard(session)[0]
+    for user_id in pending:
+        placed, moving = lookup_shard(user_id)
+        if moving or placed != shard:
+            raise UserMovingError(MOVING_MESSAGE)
+    fenced.update(pending)
+
+
+@sa.event.listens_for(Session, 'before_flush')
+def fence_flushed_writes(session, flush_context, instances):
+    """Fence ORM writes to sharded rows; Core writes are fenced through ``next_revisions``."""
+    if not has_app_context() or not sharding_enabled():
+        return
+    user_ids = {obj.user_id for obj in chain(session.new, session.dirty, session.deleted)
+                if sa.inspect(obj).mapper.local_table.name in SHARDED_TABLES
+                and getattr(obj, 'user_id', None) is not None}
+    if user_ids:
+        fence_writes(session, user_ids)
+
+
+@sa.event.listens_for(Session, 'after_commit')
+@sa.event.listens_for(Session, 'after_rollback')
+def _forget_fenced(session):
+    session.info.pop(FENCED, None)
+
+
+def create_shard_schemas():
+    """Create every table in each shard other than ``default`` (for tests and benchmarks)."""
+    for shard in shard_names()[1:]:
+        _db().metadata.create_all(shard_engine(shard))
+
+
+def _sharded_tables():
+    # Parents before children, so remapped ids exist before they are
+    # referenced; tables naming rows by (entity, entity_id) come last
+    tables = [table for table in _db().metadata.sorted_tables if table.name in SHARDED_TABLES]
+    return sorted(tables, key=lambda table: 'entity_id' in table.c)
+
+
+def _set_shard(user_id, shard, moving):
+    from backend.authentication.models import UserShard
+
+    table = UserShard.__table__
+    with shard_engine(DEFAULT_SHARD).begin() as connection:
+        connection.execute(sa.delete(table).where(table.c.user_id == user_id))
+        connection.execute(sa.insert(table).values(user_id=user_id, shard=shard, moving=moving,
+                                                   updated_at=datetime.utcnow()))
+
+
+def _has_surrogate_id(table):
+    return [column.name for column in table.primary_key.columns] == ['id'] and isinstance(table.c.id.type, sa.Integer)
+
+
+def _delete_user_rows(connection, user_id):
+    from backend.expense_tracker.models import user_rows
+
+    for table in reversed(_sharded_tables()):
+        connection.execute(sa.delete(table).where(user_rows(table, user_id)))
+
+
+def _copy_user_rows(user_id, source, target, batch_size):
+    from backend.expense_tracker.models import user_rows
+    from backend.expense_tracker.sync import ENTITIES
+
+    tables = _sharded_tables()
+    entities = {model.__tablename__: name for name, model in ENTITIES.items()}
+    referenced = {fk.column.table.name for table in tables for fk in table.foreign_keys
+                  if fk.column.table.name in SHARDED_TABLES} | entities.keys()
+    id_maps = {name: {} for name in referenced}
+    entity_ids = {name: id_maps[table] for table, name in entities.items()}
+    counters = _db().metadata.tables['sync_counters']
+    tombstones = _db().metadata.tables['sync_tombstones']
+    copied = 0
+
+    with source.connect() as src, target.begin() as dst:
+        # Leftovers from an interrupted move would otherwise be duplicated
+        _delete_user_rows(dst, user_id)
+        revision = src.execute(sa.select(counters.c.revision).where(counters.c.user_id == user_id)).scalar() or 1
+        # Old ids are deleted in one revision and the copies created in the
+        # next, so a client never deletes a copy that reused an old id
+        deleted_at, created_at = revision + 1, revision + 2
+
+        for table in tables:
+            if table is counters:
+                continue
+            remap = [(column.name, fk.column.table.name) for column in table.columns for fk in column.foreign_keys
+                     if fk.column.table.name in referenced]
+            renumber = _has_surrogate_id(table)
+            result = src.execute(sa.select(table).where(user_rows(table, user_id))
+                                 .order_by(*table.primary_key.columns).execution_options(yield_per=batch_size))
+            for partition in result.partitions():
+                rows, removed = [], []
+                for row in partition:
+                    row = dict(row._mapping)
+                    for column, parent in remap:
+                        if row[column] is not None:
+                            row[column] = id_maps[parent][row[column]]
+                    if row.get('entity_id') is not None and row['entity'] in entity_ids:
+                        # Rows purged since have no copy: tombstones keep the
+                        # old id, which the move retires anyway, while audit
+                        # events drop it rather than name an unrelated copy
+                        fallback = None if table.c.entity_id.nullable else row['entity_id']
+                        row['entity_id'] = entity_ids[row['entity']].get(row['entity_id'], fallback)
+                    if table.name in entities:
+                        row['revision'] = created_at
+                        removed.append({'user_id': user_id, 'entity': entities[table.name], 'entity_id': row['id'],
+                                        'revision': deleted_at, 'deleted_at': datetime.utcnow()})
+                    rows.append(row)
+                old_ids = [row.pop('id') for row in rows] if renumber else None
+                if table.name in referenced:
+                    new_ids = dst.execute(sa.insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                                          rows).scalars().all()
+                    id_maps[table.name].update(zip(old_ids, new_ids))
+                else:
+                    dst.execute(sa.insert(table), rows)
+                if removed:
+                    dst.execute(sa.insert(tombstones), removed)
+                copied += len(rows)
+
+        dst.execute(sa.insert(counters).values(user_id=user_id, revision=created_at))
+    return copied
+
+
+def _drain_writes(user_id, engine):
+    # Granted once every transaction that passed fence_writes for the user
+    # has ended; later ones see the user moving and fail
+    with engine.begin() as connection:
+        connection.execute(_counter_lock(engine.dialect, [user_id]))
+
+
+def move_user(user_id, target, batch_size=1000):
+    """Move ``user_id``'s rows onto the ``target`` shard while the app keeps serving.
+
+    The user is first marked as moving. Their writes then get 503 responses
+    and background jobs skip them, but reads still go to the source shard.
+    Writes already under way are drained: ``fence_writes`` holds the user's
+    sync counter lock from its check until the writing transaction ends, so
+    taking that lock waits for them to commit, and any that had not reached
+    the check yet fail it. The rows are then copied to ``target`` in one
+    transaction, the shard map is switched and the source rows deleted. If
+    the copy fails, the user stays on the source shard.
+
+    Each shard numbers its rows independently, so the copies get new ids.
+    Synced clients see the old ids deleted and the copies created in the
+    user's next two revisions. Returns the number of rows copied.
+    """
+    if target not in shard_names():
+        raise ValueError(f'Unknown shard: {target}')
+    source, _ = lookup_shard(user_id)
+    if source == target:
+        return 0
+
+    _set_shard(user_id, source, moving=True)
+    try:
+        started = time.perf_counter()
+        _drain_writes(user_id, shard_engine(source))
+        copied = _copy_user_rows(user_id, shard_engine(source), shard_engine(target), batch_size)
+    except Exception:
+        _set_shard(user_id, source, moving=False)
+        raise
+    _set_shard(user_id, target, moving=False)
+    logger.info("Moved %d rows of user %s from %s to %s in %.2fs", copied, user_id, source, target,
+                time.perf_counter() - started)
+
+    try:
+        with shard_engine(source).begin() as connection:
+            _delete_user_rows(connection, user_id)
+    except Exception:
+        # The user is already served from the target; the old rows are only dead weight
+        logger.exception("User %s moved to %s, but deleting the old rows from %s failed", user_id, target, source)
+    return copied
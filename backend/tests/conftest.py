@@ -0,0 +1,73 @@
+# backend/tests/conftest.py
+import pytest
+from backend.config import Config
+
+PASSWORD = 'abc123!x'
+
+
+def make_config(database_path, data_dir):
+    """Return a test configuration bound to the SQLite file at ``database_path``."""
+
+    class TestConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test'
+        DATABASE_PATH = str(database_path)
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{database_path}'
+        EXPORT_DIR = str(data_dir / 'exports')
+        ARCHIVE_DIR = str(data_dir / 'archive')
+        FX_RATES_FILE = str(data_dir / 'fx_rates.csv')
+        RATELIMIT_ENABLED = False
+        LIVE_ENABLED = False
+
+    return TestConfig
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a fresh SQLite database built by create_all()."""
+    from backend.app_factory import create_app
+    from backend.expense_tracker.currency import fx_rates
+    from backend.expense_tracker.forecast import forecast_cache
+    from backend.init_db import db
+
+    # Both caches are per process and would otherwise outlive the database
+    fx_rates.invalidate()
+    forecast_cache.invalidate()
+    app = create_app(make_config(tmp_path / 'test.db', tmp_path))
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def login(app):
+    """Sign up (if needed) and log in ``email``; returns a test client holding the session."""
+
+    def login(email='user@example.com'):
+        client = app.test_client()
+        client.post('/signup', json={'email': email, 'name': 'Test', 'password': PASSWORD})
+        response = client.post('/login', json={'email': email, 'password': PASSWORD})
+        assert response.status_code == 200, response.get_json()
+        return client
+
+    return login
+
+
+@pytest.fixture
+def client(login):
+    return login()
+
+
+@pytest.fixture
+def load_rates(app, tmp_path):
+    """Load ``(date, currency, rate)`` rows through `flask load-fx-rates`."""
+
+    def load(rows):
+        path = tmp_path / 'fx.csv'
+        path.write_text('date,currency,rate\n' + ''.join(f'{day},{currency},{rate}\n' for day, currency, rate in rows))
+        result = app.test_cli_runner().invoke(args=['load-fx-rates', str(path)])
+        assert result.exit_code == 0, result.output
+
+    return load
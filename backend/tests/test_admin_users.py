@@ -0,0 +1,102 @@
+# backend/tests/test_admin_users.py
+import csv
+import io
+from unittest import mock
+
+import pytest
+
+from backend.tests.conftest import PASSWORD
+
+E = '/expense-tracker'
+NAMES = ['Alice Smith', 'Bob Stone', 'alina', 'Carol', 'Smythe', 'Dave', 'Eve', 'Sam']
+
+
+@pytest.fixture
+def admin(app):
+    """An admin client, after users 2-9 signed up under ``NAMES``."""
+    from backend.authentication.models import User
+    from backend.init_db import db
+
+    admin = app.test_client()
+    for i, name in enumerate(['Admin'] + NAMES):
+        email = f"{name.split()[0].lower()}{i}@example.com"
+        assert admin.post('/signup', json={'email': email, 'name': name, 'password': PASSWORD}).status_code == 201
+    with app.app_context():
+        db.session.get(User, 1).is_admin = True
+        db.session.commit()
+    assert admin.post('/login', json={'email': 'admin0@example.com', 'password': PASSWORD}).status_code == 200
+    return admin
+
+
+def listed(client, **params):
+    response = client.get('/admin/users', query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_pages_cover_every_user_once(admin):
+    seen, after, pages = [], None, 0
+    while True:
+        page = listed(admin, limit=3, **({'after': after} if after else {}))
+        seen += [user['id'] for user in page['users']]
+        pages += 1
+        after = page['next_cursor']
+        if after is None:
+            break
+    assert seen == list(range(1, 10)) and pages == 3
+    assert listed(admin, limit=9)['next_cursor'] is None
+    assert listed(admin, limit=500, after=9) == {'users': [], 'next_cursor': None}
+    assert admin.get('/admin/users?limit=0').status_code == 400
+    assert admin.get('/admin/users?limit=501').status_code == 400
+
+
+def test_prefix_matches_email_or_name(admin):
+    names = lambda **params: [user['name'] for user in listed(admin, **params)['users']]
+    # Only from the start: 'Alice Smith' is not an 'sm' match
+    assert names(q='sm') == ['Smythe']
+    assert names(q='ALI') == ['Alice Smith', 'alina']
+    # Email only, then name only
+    assert names(q='bob2@') == ['Bob Stone']
+    assert names(q='alice s') == ['Alice Smith']
+    assert names(q='s') == ['Smythe', 'Sam']
+    assert names(q='s', limit=1) == ['Smythe']
+    assert listed(admin, q='s', limit=1, after=listed(admin, q='s', limit=1)['next_cursor'])['users'][0]['name'] == 'Sam'
+    assert names(q='zz') == []
+
+
+def test_stats_leave_out_soft_deleted_rows(app, admin, login):
+    client = login('carol4@example.com')
+    for day in (1, 2, 3):
+        assert client.post(f'{E}/expense', json={'description': 'x' * day * 10, 'amount': 5, 'category': 'Food',
+                                                 'date': f'2026-03-0{day}'}).status_code == 201
+    assert client.post(f'{E}/income', json={'amount': 100, 'category': 'Salary',
+                                            'date': '2026-03-01'}).status_code == 201
+    assert client.delete(f'{E}/expense/3').status_code == 200
+
+    users = {user['id']: user for user in listed(admin, stats='true')['users']}
+    assert users[5]['transactions'] == 3
+    assert users[5]['storage_bytes'] == 3 * 64 + 10 + 20
+    assert users[5]['last_activity'] is not None
+    assert users[6] == {'id': 6, 'name': 'Smythe', 'email': 'smythe5@example.com', 'is_admin': False,
+                        'transactions': 0, 'last_activity': None, 'storage_bytes': 0}
+    assert 'transactions' not in listed(admin)['users'][0]
+
+
+def test_export_streams_every_match_as_csv(admin):
+    with mock.patch('backend.authentication.routes.USER_EXPORT_BATCH', 2):
+        response = admin.get('/admin/users/export?stats=true')
+        assert response.status_code == 200 and response.mimetype == 'text/csv'
+        assert response.headers['Content-Disposition'] == 'attachment; filename=users.csv'
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        assert [int(row['id']) for row in rows] == list(range(1, 10))
+        assert rows[0]['is_admin'] == 'True' and rows[1]['transactions'] == '0'
+
+        rows = list(csv.reader(io.StringIO(admin.get('/admin/users/export?q=ali').get_data(as_text=True))))
+    assert rows == [['id', 'name', 'email', 'is_admin'], ['2', 'Alice Smith', 'alice1@example.com', 'False'],
+                    ['4', 'alina', 'alina3@example.com', 'False']]
+
+
+def test_admins_only(login):
+    client = login()
+    assert client.get('/admin/users').status_code == 403
+    assert client.get('/admin/users/export').status_code == 403
@@ -0,0 +1,113 @@
+# backend/tests/test_archive.py
+import io
+import os
+import time
+from datetime import date
+
+import pytest
+
+from backend.expense_tracker.archive import archive_closed_years, user_dir
+from backend.expense_tracker.models import ArchivedYear, Expense, Income
+
+E = '/expense-tracker'
+# With two years kept live, the two years before last are archived
+OLD, OLDER = date.today().year - 2, date.today().year - 3
+
+
+@pytest.fixture
+def client(login):
+    client = login()
+    for year in (OLDER, OLD, OLD + 2):
+        for month in (1, 3, 12):
+            for category, day in (('Food', 5), ('Home', 20)):
+                response = client.post(f'{E}/expense', json={'description': f'{category} {year}-{month}',
+                                                             'amount': month + day, 'category': category,
+                                                             'date': f'{year}-{month:02d}-{day}'})
+                assert response.status_code == 201
+            assert client.post(f'{E}/income', json={'amount': 1000, 'category': 'Salary',
+                                                    'date': f'{year}-{month:02d}-01'}).status_code == 201
+    # Soft-deleted rows are not archived
+    assert client.delete(f'{E}/expense/2').status_code == 200
+    assert client.post(f'{E}/budgets', json={'category': 'Food', 'limit': 20}).status_code == 200
+    return client
+
+
+def xlsx_rows(data):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(data))
+    return {sheet.title: list(sheet.values) for sheet in workbook.worksheets}
+
+
+def export_csv(client, body):
+    job = client.post(f'{E}/exports', json={**body, 'format': 'csv'}).get_json()
+    for _ in range(200):
+        job = client.get(f"{E}/exports/{job['id']}").get_json()
+        if job['status'] not in ('queued', 'running'):
+            break
+        time.sleep(0.02)
+    assert job['status'] == 'done', job
+    return client.get(job['download_url']).data
+
+
+def snapshot(client):
+    """Everything the API reads for the archived years."""
+    reads = {}
+    for year in (OLDER, OLD):
+        for month in ('01', '03', '12'):
+            for path in ('monthly-expenses', 'monthly-income', 'balance', 'budgets'):
+                reads[path, year, month] = client.get(f'{E}/{path}?month={year}-{month}').get_json()
+            reads['csv', year, month] = export_csv(client, {'month': f'{year}-{month}'})
+        reads['xlsx', year] = xlsx_rows(client.get(f'{E}/export-yearly?year={year}').data)
+        reads['csv', year] = export_csv(client, {'year': year})
+    return reads
+
+
+def archive(app):
+    with app.app_context():
+        stats = archive_closed_years(keep_years=2)
+        live = {model.__tablename__: model.query.filter(model.deleted_at.is_(None)).count()
+                for model in (Income, Expense)}
+        years = [(row.year, row.generation, row.income_rows, row.expense_rows) for row in
+                 ArchivedYear.query.order_by(ArchivedYear.year)]
+        return stats, live, years, sorted(os.listdir(user_dir(1)))
+
+
+def test_archived_years_read_the_same(app, client):
+    before = snapshot(client)
+    assert len(before['monthly-expenses', OLDER, '01']) == 1
+    # A sheet per month and the summary
+    assert len(before['xlsx', OLD]) == 4
+
+    stats, live, years, files = archive(app)
+    assert (stats['years'], stats['income'], stats['expenses']) == (2, 6, 11)
+    # Only the years kept live, and the soft-deleted row, are left in the tables
+    assert live == {'income': 3, 'expenses': 6}
+    assert years == [(OLDER, 1, 3, 5), (OLD, 1, 3, 6)]
+    assert files == [f'{year}.1.{table}.parquet' for year in (OLDER, OLD) for table in ('expenses', 'income')]
+
+    assert snapshot(client) == before
+    # Reads that stay within the live years are unaffected
+    assert len(client.get(f'{E}/monthly-expenses?month={OLD + 2}-03').get_json()) == 2
+
+
+def test_back_dated_rows_go_into_a_new_generation(app, client):
+    archive(app)
+    assert client.post(f'{E}/expense', json={'description': 'late', 'amount': 7, 'category': 'Food',
+                                             'date': f'{OLD}-03-07'}).status_code == 201
+    # Until the next run the row is live, and read alongside the archive
+    expenses = client.get(f'{E}/monthly-expenses?month={OLD}-03').get_json()
+    assert [expense['description'] for expense in expenses] == [f'Food {OLD}-3', 'late', f'Home {OLD}-3']
+    before = snapshot(client)
+
+    stats, live, years, files = archive(app)
+    assert (stats['years'], stats['income'], stats['expenses']) == (1, 0, 1)
+    assert live == {'income': 3, 'expenses': 6}
+    assert years == [(OLDER, 1, 3, 5), (OLD, 2, 3, 7)]
+    # The new generation replaced the old files
+    assert files == [f'{OLDER}.1.expenses.parquet', f'{OLDER}.1.income.parquet',
+                     f'{OLD}.2.expenses.parquet', f'{OLD}.2.income.parquet']
+    assert snapshot(client) == before
+
+    # Nothing new: nothing is rewritten
+    assert archive(app)[2] == years
@@ -0,0 +1,77 @@
+# backend/tests/test_audit.py
+from backend.expense_tracker.models import Expense
+
+E = '/expense-tracker'
+
+
+def add_expense(client, description, amount, day, category='Food'):
+    response = client.post(f'{E}/expense', json={'description': description, 'amount': amount,
+                                                 'category': category, 'date': day})
+    assert response.status_code == 201, response.get_json()
+
+
+def all_expenses(app):
+    with app.app_context():
+        return {expense.id: expense.deleted_at for expense in
+                Expense.query.execution_options(include_deleted=True).order_by(Expense.id)}
+
+
+def test_deleted_expense_is_hidden_but_kept(app, client):
+    add_expense(client, 'tea', 10, '2026-03-04')
+    add_expense(client, 'cake', 5, '2026-03-05')
+
+    assert client.delete(f'{E}/expense/1').status_code == 200
+    assert client.delete(f'{E}/expense/1').status_code == 404
+    assert client.put(f'{E}/expense/1', json={'description': 'x', 'amount': 1, 'category': 'Food',
+                                              'date': '2026-03-04'}).status_code == 404
+
+    expenses = client.get(f'{E}/monthly-expenses?month=2026-03').get_json()
+    assert [expense['description'] for expense in expenses] == ['cake']
+    assert client.get(f'{E}/balance?month=2026-03').get_json()['total_expense'] == '5.0'
+    assert client.get(f'{E}/search?q=tea').get_json()['results'] == []
+
+    deleted_at = all_expenses(app)
+    assert deleted_at[1] is not None and deleted_at[2] is None
+
+
+def test_reset_and_undo_restore_the_month(client, login):
+    for day in range(1, 4):
+        add_expense(client, f'tea {day}', 10, f'2026-03-0{day}')
+    add_expense(client, 'rent', 100, '2026-04-01')
+    assert client.post(f'{E}/budgets', json={'category': 'Food', 'limit': 100}).status_code == 200
+    # Deleted on its own before the reset, so undoing the reset leaves it deleted
+    assert client.delete(f'{E}/expense/3').status_code == 200
+
+    response = client.post(f'{E}/reset_expenses', json={'month': '2026-03'})
+    assert response.status_code == 200
+    assert client.get(f'{E}/monthly-expenses?month=2026-03').get_json() == []
+    assert client.get(f'{E}/budgets?month=2026-03').get_json()[0]['spent'] == '0'
+    assert client.post(f'{E}/reset_expenses', json={'month': '2026-03'}).status_code == 404
+
+    # Another user has nothing to undo
+    assert login('other@example.com').post(f'{E}/reset_expenses/undo', json={'month': '2026-03'}).status_code == 404
+
+    response = client.post(f'{E}/reset_expenses/undo', json={'month': '2026-03'})
+    assert response.status_code == 200
+    assert response.get_json()['restored'] == 2
+    expenses = client.get(f'{E}/monthly-expenses?month=2026-03').get_json()
+    assert sorted(expense['description'] for expense in expenses) == ['tea 1', 'tea 2']
+    assert client.get(f'{E}/budgets?month=2026-03').get_json()[0]['spent'] == '20.0'
+    assert len(client.get(f'{E}/monthly-expenses?month=2026-04').get_json()) == 1
+
+    assert client.post(f'{E}/reset_expenses/undo', json={'month': '2026-03'}).status_code == 404
+
+
+def test_purge_removes_rows_past_retention(app, client):
+    from datetime import datetime, timedelta
+    from backend.expense_tracker.audit import purge_deleted
+
+    add_expense(client, 'tea', 10, '2026-03-04')
+    add_expense(client, 'cake', 5, '2026-03-05')
+    assert client.delete(f'{E}/expense/1').status_code == 200
+
+    with app.app_context():
+        assert purge_deleted() == {'income': 0, 'expenses': 0}
+        later = datetime.utcnow() + timedelta(days=app.config['DELETED_RETENTION_DAYS'] + 1)
+        assert purge_deleted(now=later) == {'income': 0, 'expenses': 1}
+    assert list(all_expenses(app)) == [2]
@@ -0,0 +1,75 @@
+# backend/tests/test_batch.py
+E = '/expense-tracker'
+
+
+def create(kind, **data):
+    return {'op': 'create', 'type': kind, 'data': data}
+
+
+def expense(description, amount, day='2026-03-05', category='Food'):
+    return create('expense', description=description, amount=amount, category=category, date=day)
+
+
+def test_batch_applies_every_operation(client):
+    for description in ('tea', 'cake'):
+        assert client.post(f'{E}/expense', json={'description': description, 'amount': 10, 'category': 'Food',
+                                                 'date': '2026-03-04'}).status_code == 201
+    assert client.post(f'{E}/budgets', json={'category': 'Food', 'limit': 100}).status_code == 200
+    revision = client.get(f'{E}/sync?since=0').get_json()['revision']
+
+    operations = [expense(f'lunch {i}', 20, category='Food' if i % 2 else 'Travel') for i in range(4)]
+    operations += [create('income', amount=1000, category='Salary', date='2026-03-01'),
+                   {'op': 'update', 'type': 'expense', 'id': 1,
+                    'data': {'description': 'coffee', 'amount': 5, 'category': 'Food', 'date': '2026-03-04'}},
+                   {'op': 'delete', 'type': 'expense', 'id': 2}]
+    response = client.post(f'{E}/batch', json={'operations': operations})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert [(result['index'], result['op'], result['type']) for result in body['results']] == [
+        (index, operation['op'], operation['type']) for index, operation in enumerate(operations)]
+    # Food: 5 (updated) + 2 * 20 created; the deleted expense no longer counts
+    assert [(budget['category'], budget['spent']) for budget in body['budgets']] == [('Food', '45.0')]
+
+    expenses = client.get(f'{E}/monthly-expenses?month=2026-03').get_json()
+    assert sorted(expense['description'] for expense in expenses) == [
+        'coffee', 'lunch 0', 'lunch 1', 'lunch 2', 'lunch 3']
+    assert client.get(f'{E}/balance?month=2026-03').get_json()['income'] == '1,000.0'
+
+    # Every row the batch wrote shares one sync revision
+    changes = client.get(f'{E}/sync?since={revision}').get_json()['changes']
+    rows = [change for change in changes if change['type'] != 'category']
+    assert len(rows) == 7 and len({change['revision'] for change in rows}) == 1
+
+
+def test_failed_batch_saves_nothing(client):
+    assert client.post(f'{E}/expense', json={'description': 'tea', 'amount': 10, 'category': 'Food',
+                                             'date': '2026-03-04'}).status_code == 201
+    revision = client.get(f'{E}/sync?since=0').get_json()['revision']
+
+    operations = [expense('lunch', 20),
+                  {'op': 'delete', 'type': 'expense', 'id': 1},
+                  {'op': 'delete', 'type': 'expense', 'id': 1},
+                  {'op': 'update', 'type': 'income', 'id': 99,
+                   'data': {'amount': 1, 'category': 'Salary', 'date': '2026-03-01'}}]
+    response = client.post(f'{E}/batch', json={'operations': operations})
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['message'] == 'Batch rejected; no changes were saved.'
+    assert [(error['index'], error['status']) for error in body['errors']] == [(2, 404), (3, 404)]
+
+    expenses = client.get(f'{E}/monthly-expenses?month=2026-03').get_json()
+    assert [expense['description'] for expense in expenses] == ['tea']
+    assert client.get(f'{E}/sync?since={revision}').get_json()['changes'] == []
+
+
+def test_batch_validates_every_operation(client):
+    operations = [{'op': 'nope'},
+                  create('expense', description='x', amount='lots', category='Food', date='2026-03-01'),
+                  expense('fine', 1)]
+    response = client.post(f'{E}/batch', json={'operations': operations})
+    assert response.status_code == 400
+    assert [error['index'] for error in response.get_json()['errors']] == [0, 1]
+    assert client.get(f'{E}/monthly-expenses?month=2026-03').get_json() == []
+
+    assert client.post(f'{E}/batch', json={'operations': []}).status_code == 400
+    assert client.post(f'{E}/batch', json={}).status_code == 400
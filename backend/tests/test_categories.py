@@ -0,0 +1,119 @@
+# backend/tests/test_categories.py
+from datetime import date
+
+from sqlalchemy import text
+
+from backend.expense_tracker.models import Category, CategoryMonthTotal, Expense, RecurringRule
+
+E = '/expense-tracker'
+
+
+def add_expense(client, description, amount, day, category):
+    response = client.post(f'{E}/expense', json={'description': description, 'amount': amount,
+                                                 'category': category, 'date': day})
+    assert response.status_code == 201, response.get_json()
+
+
+def category_ids(client):
+    return {category['name']: category['id'] for category in client.get(f'{E}/categories').get_json()}
+
+
+def test_merge_moves_everything_to_the_target(app, client):
+    add_expense(client, 'bread', 10, '2026-03-01', 'Food')
+    add_expense(client, 'milk', 3, '2026-03-02', 'Groceries')
+    add_expense(client, 'eggs', 4, '2026-04-02', 'Groceries')
+    add_expense(client, 'pizza', 20, '2026-03-03', 'Takeaway')
+    add_expense(client, 'kebab', 8, '2026-03-04', 'Takeaway')
+    assert client.delete(f'{E}/expense/5').status_code == 200
+    assert client.post(f'{E}/budgets', json={'category': 'Food', 'limit': 100}).status_code == 200
+    assert client.post(f'{E}/budgets', json={'category': 'Groceries', 'limit': 50}).status_code == 200
+    assert client.post(f'{E}/recurring', json={'type': 'expense', 'amount': 9, 'category': 'Groceries',
+                                               'start_date': '2030-01-01'}).status_code == 201
+    ids = category_ids(client)
+    revision = client.get(f'{E}/sync?since=0').get_json()['revision']
+
+    response = client.post(f'{E}/categories/merge',
+                           json={'sources': [ids['Groceries'], ids['Takeaway']], 'target': ids['Food']})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['moved'] == {'income': 0, 'expenses': 4, 'recurring_rules': 1}
+
+    assert list(category_ids(client)) == ['Food']
+    expenses = client.get(f'{E}/monthly-expenses?month=2026-03').get_json()
+    assert {expense['category'] for expense in expenses} == {'Food'}
+    # The target keeps its own budget, now charged with the merged spending
+    budgets = client.get(f'{E}/budgets?month=2026-03').get_json()
+    assert [(budget['category'], budget['spent']) for budget in budgets] == [('Food', '33.0')]
+
+    with app.app_context():
+        # Soft-deleted rows move too, so undoing a reset never points at a missing category
+        assert Expense.query.execution_options(include_deleted=True).filter_by(id=5).one().category_id == ids['Food']
+        assert RecurringRule.query.one().category_id == ids['Food']
+        assert Category.query.count() == 1
+        assert sorted((total.month_start, total.spent) for total in CategoryMonthTotal.query) == [
+            (date(2026, 3, 1), 33.0), (date(2026, 4, 1), 4.0)]
+
+    changes = client.get(f'{E}/sync?since={revision}').get_json()['changes']
+    assert sorted((change['type'], change['op'], change['id']) for change in changes
+                  if change['type'] == 'category') == [
+        ('category', 'delete', ids['Groceries']), ('category', 'delete', ids['Takeaway'])]
+    assert sorted(change['id'] for change in changes if change['type'] == 'expense') == [2, 3, 4]
+
+
+def test_merge_validates_the_categories(client, login):
+    add_expense(client, 'bread', 10, '2026-03-01', 'Food')
+    add_expense(client, 'milk', 3, '2026-03-02', 'Groceries')
+    ids = category_ids(client)
+    other = login('other@example.com')
+    add_expense(other, 'tea', 1, '2026-03-01', 'Drinks')
+    other_id = category_ids(other)['Drinks']
+
+    def merge(sources, target):
+        return client.post(f'{E}/categories/merge', json={'sources': sources, 'target': target})
+
+    assert merge([ids['Food']], ids['Food']).status_code == 400
+    assert merge(['Groceries'], ids['Food']).status_code == 400
+    assert merge([], ids['Food']).status_code == 400
+    assert merge([999], ids['Food']).status_code == 404
+    # Another user's category is not found either
+    assert merge([other_id], ids['Food']).status_code == 404
+    assert category_ids(client) == ids
+
+
+def index_segments():
+    """The FTS5 segment rows of the expense search index, which every write to it adds to."""
+    from backend.init_db import db
+
+    return db.session.execute(text('SELECT id, block FROM expense_search_data ORDER BY id')).all()
+
+
+def test_search_follows_renames_and_merges(app, client, login):
+    add_expense(client, 'bread', 10, '2026-03-01', 'Food')
+    add_expense(client, 'milk', 3, '2026-03-02', 'Groceries')
+    add_expense(client, 'pizza', 20, '2026-03-03', 'Takeaway')
+    add_expense(login('other@example.com'), 'tea', 1, '2026-03-01', 'Groceries')
+    ids = category_ids(client)
+
+    def found(query):
+        results = client.get(f'{E}/search', query_string={'q': query}).get_json()['results']
+        return sorted(result['description'] for result in results)
+
+    # Every word in the description, or every word in the category name
+    assert found('groc') == ['milk']
+    assert found('bread food') == []
+    assert client.put(f"{E}/categories/{ids['Groceries']}", json={'name': 'Dairy Shop'}).status_code == 200
+    assert found('groceries') == []
+    assert found('dairy sh') == ['milk']
+
+    with app.app_context():
+        segments = index_segments()
+    assert client.post(f'{E}/categories/merge', json={'sources': [ids['Groceries'], ids['Takeaway']],
+                                                       'target': ids['Food']}).status_code == 200
+    with app.app_context():
+        # Expense documents hold no category name, so the merge left the index alone
+        assert index_segments() == segments
+    assert found('dairy') == [] and found('takeaway') == []
+    assert found('food') == ['bread', 'milk', 'pizza']
+    # A match on both description and category ranks first
+    add_expense(client, 'food court', 7, '2026-03-05', 'Food')
+    results = client.get(f'{E}/search?q=food').get_json()['results']
+    assert results[0]['description'] == 'food court' and len(results) == 4
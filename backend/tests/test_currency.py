@@ -0,0 +1,73 @@
+# backend/tests/test_currency.py
+from datetime import date
+
+import pytest
+
+from backend.expense_tracker.currency import MissingRateError, fx_rates, normalize_currency, require_rate
+
+E = '/expense-tracker'
+
+# Units of each currency per US dollar
+RATES = [('2024-12-01', 'INR', 80), ('2024-12-01', 'EUR', 0.9), ('2024-12-10', 'INR', 85)]
+
+
+def test_convert_uses_the_latest_rate_on_or_before_the_date(app, load_rates):
+    load_rates(RATES)
+    with app.app_context():
+        assert fx_rates.convert(100, 'USD', 'INR', date(2024, 12, 5)) == 8000
+        assert fx_rates.convert(90, 'EUR', 'INR', date(2024, 12, 11)) == pytest.approx(8500)
+        assert fx_rates.convert(85, 'INR', 'EUR', date(2025, 6, 1)) == pytest.approx(0.9)
+        assert fx_rates.convert(7, 'JPY', 'JPY', date(2024, 1, 1)) == 7
+        assert fx_rates.total([('USD', date(2024, 12, 5), 100), ('INR', date(2024, 12, 5), 1000)], 'INR') == 9000
+
+        require_rate('EUR', 'INR', date(2024, 12, 1))
+        with pytest.raises(MissingRateError):
+            require_rate('EUR', 'INR', date(2024, 11, 30))
+        with pytest.raises(MissingRateError):
+            require_rate('JPY', 'INR', date(2024, 12, 5))
+
+
+def test_normalize_currency():
+    assert normalize_currency(' eur ') == 'EUR'
+    assert normalize_currency(None, default='INR') == 'INR'
+    with pytest.raises(ValueError):
+        normalize_currency('EURO')
+
+
+def test_totals_are_converted_into_the_base_currency(client, load_rates):
+    load_rates(RATES)
+    assert client.post(f'{E}/income', json={'amount': 100, 'category': 'Salary', 'date': '2024-12-05',
+                                            'currency': 'usd'}).status_code == 201
+    assert client.post(f'{E}/income', json={'amount': 1000, 'category': 'Salary', 'date': '2024-12-05'}).status_code == 201
+    assert client.post(f'{E}/expense', json={'description': 'dinner', 'amount': 90, 'category': 'Food',
+                                             'date': '2024-12-11', 'currency': 'EUR'}).status_code == 201
+
+    assert client.get(f'{E}/balance?month=2024-12').get_json() == {
+        'balance': '500.0', 'currency': 'INR', 'income': '9,000.0', 'total_expense': '8,500.0'}
+    # Amounts are listed as entered
+    expenses = client.get(f'{E}/monthly-expenses?month=2024-12').get_json()
+    assert [(expense['amount'], expense['currency']) for expense in expenses] == [('90.0', 'EUR')]
+
+    assert client.put(f'{E}/base-currency', json={'currency': 'EUR'}).status_code == 200
+    assert client.get(f'{E}/balance?month=2024-12').get_json() == {
+        'balance': '11.25', 'currency': 'EUR', 'income': '101.25', 'total_expense': '90.0'}
+
+
+def test_writes_without_a_rate_are_refused(client, load_rates):
+    load_rates(RATES)
+    entry = {'description': 'dinner', 'amount': 9, 'category': 'Food', 'date': '2024-12-11'}
+
+    response = client.post(f'{E}/expense', json={**entry, 'currency': 'JPY'})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'No exchange rate for JPY on or before 2024-12-11.'
+    assert client.post(f'{E}/expense', json={**entry, 'date': '2024-11-11', 'currency': 'EUR'}).status_code == 400
+    assert client.post(f'{E}/expense', json={**entry, 'currency': 'EURO'}).status_code == 400
+    assert client.post(f'{E}/recurring', json={'type': 'expense', 'amount': 5, 'category': 'Gym',
+                                               'start_date': '2024-12-02', 'currency': 'JPY'}).status_code == 400
+    batch = {'operations': [{'op': 'create', 'type': 'expense', 'data': {**entry, 'currency': 'JPY'}}]}
+    assert client.post(f'{E}/batch', json=batch).status_code == 400
+
+    assert client.post(f'{E}/expense', json={**entry, 'currency': 'EUR'}).status_code == 201
+    response = client.put(f'{E}/expense/1', json={**entry, 'currency': 'JPY'})
+    assert response.status_code == 400
+    assert client.get(f'{E}/monthly-expenses?month=2024-12').get_json()[0]['currency'] == 'EUR'
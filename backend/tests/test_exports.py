@@ -0,0 +1,137 @@
+# backend/tests/test_exports.py
+import os
+import time
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from backend.expense_tracker import exports
+from backend.expense_tracker.models import ExportJob
+
+E = '/expense-tracker'
+MARCH = {'month': '2026-03', 'format': 'csv'}
+
+
+def add_expense(client, description, day='2026-03-04'):
+    response = client.post(f'{E}/expense', json={'description': description, 'amount': 10,
+                                                 'category': 'Food', 'date': day})
+    assert response.status_code == 201, response.get_json()
+
+
+def wait_for(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f'{E}/exports/{job_id}').get_json()
+        if job['status'] not in ('queued', 'running') or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def export(client, body=MARCH):
+    """Request ``body`` and wait for it; returns ``(status code of the request, finished job)``."""
+    response = client.post(f'{E}/exports', json=body)
+    assert response.status_code in (200, 202), response.get_json()
+    return response.status_code, wait_for(client, response.get_json()['id'])
+
+
+def add_job(app, user_id=1, **values):
+    with app.app_context():
+        from backend.init_db import db
+        job = ExportJob(id=values.pop('id', 'job1'), user_id=user_id, period_start=date(2026, 3, 1),
+                        period_end=date(2026, 4, 1), format='csv', filename='march.csv', progress=0,
+                        data_version=exports.data_version(user_id, date(2026, 3, 1), date(2026, 4, 1)), **values)
+        db.session.add(job)
+        db.session.commit()
+
+
+def test_export_is_built_once_and_reused(client):
+    add_expense(client, 'tea')
+    status, job = export(client)
+    assert status == 202 and job['status'] == 'done' and job['progress'] == 100 and job['rows_total'] == 1
+
+    response = client.post(f'{E}/exports', json=MARCH)
+    assert response.status_code == 200 and response.get_json()['id'] == job['id']
+    # Another format or period is another export
+    assert export(client, {**MARCH, 'format': 'xlsx'})[1]['id'] != job['id']
+
+    # Changed data is exported afresh
+    add_expense(client, 'cake')
+    status, fresh = export(client)
+    assert status == 202 and fresh['id'] != job['id'] and fresh['rows_total'] == 2
+
+
+def test_concurrent_requests_share_one_pending_job(app, client):
+    add_expense(client, 'tea')
+    add_job(app, status='queued')
+
+    # This request looked before the other one's job existed, so its insert loses
+    lookups = [None]
+    lookup = exports._reusable_job
+
+    def reusable(*args):
+        return lookups.pop() if lookups else lookup(*args)
+
+    with app.test_request_context(), mock.patch.object(exports, '_reusable_job', side_effect=reusable), \
+            mock.patch.object(exports, '_get_executor') as executor:
+        job, created = exports.find_or_create_job(1, date(2026, 3, 1), date(2026, 4, 1), 'csv', 'march.csv')
+        assert (job.id, created) == ('job1', False)
+        assert not executor.called
+        assert ExportJob.query.count() == 1
+
+    # The index itself refuses a second pending copy
+    with pytest.raises(IntegrityError):
+        add_job(app, id='job2', status='running')
+
+
+def test_orphaned_and_timed_out_jobs_are_redone(app, client):
+    add_expense(client, 'tea')
+    hour_ago = datetime.utcnow() - timedelta(hours=1)
+    # Lost with a restarted worker: no heartbeat for an hour
+    add_job(app, status='running', created_at=hour_ago, heartbeat_at=hour_ago)
+
+    job = client.get(f'{E}/exports/job1').get_json()
+    assert job['status'] == 'failed' and 'interrupted' in job['error']
+    status, fresh = export(client)
+    assert status == 202 and fresh['id'] != 'job1' and fresh['status'] == 'done'
+
+    # Still reporting progress, but past EXPORT_JOB_TIMEOUT_SECONDS
+    add_expense(client, 'cake')
+    day_ago = datetime.utcnow() - timedelta(days=1)
+    add_job(app, id='job2', status='running', created_at=day_ago, heartbeat_at=datetime.utcnow())
+    status, fresh = export(client)
+    assert status == 202 and fresh['id'] != 'job2' and fresh['status'] == 'done'
+    assert 'took too long' in client.get(f'{E}/exports/job2').get_json()['error']
+
+
+def test_download_serves_ranges_and_410_once_the_artifact_is_gone(app, client):
+    for i in range(20):
+        add_expense(client, f'expense {i}')
+    _, job = export(client)
+    response = client.get(job['download_url'])
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    body = response.data
+    assert len(body) == job['size'] and b'expense 19' in body
+
+    response = client.get(job['download_url'], headers={'Range': 'bytes=10-29'})
+    assert response.status_code == 206
+    assert response.data == body[10:30]
+    assert response.headers['Content-Range'] == f'bytes 10-29/{len(body)}'
+
+    with app.app_context():
+        os.remove(exports.artifact_path(ExportJob.query.get(job['id'])))
+    response = client.get(job['download_url'])
+    assert response.status_code == 410
+    # Requesting it again rebuilds it
+    status, fresh = export(client)
+    assert status == 202 and fresh['id'] != job['id'] and client.get(fresh['download_url']).data == body
+
+
+def test_exports_belong_to_their_user(client, login):
+    add_expense(client, 'tea')
+    _, job = export(client)
+    other = login('other@example.com')
+    assert other.get(f"{E}/exports/{job['id']}").status_code == 404
+    assert other.get(job['download_url']).status_code == 404
+    assert client.post(f'{E}/exports', json={'format': 'pdf', 'month': '2026-03'}).status_code == 400
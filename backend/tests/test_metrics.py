@@ -0,0 +1,46 @@
+# backend/tests/test_metrics.py
+import pytest
+
+from backend.tests.conftest import make_config
+
+SCRAPER = {'REMOTE_ADDR': '10.1.2.3'}
+
+
+def make_app(tmp_path, **settings):
+    from backend.app_factory import create_app
+
+    return create_app(type('MetricsConfig', (make_config(tmp_path / 'test.db', tmp_path),), settings))
+
+
+def test_metrics_are_served_to_local_scrapers_only(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    assert 'budgetbee_request_duration_seconds' in response.data.decode()
+
+    response = client.get('/metrics', environ_base=SCRAPER)
+    assert response.status_code == 403
+    assert 'Access denied' in response.get_json()['message']
+
+
+@pytest.mark.parametrize('settings, headers, expected', [
+    ({'METRICS_TOKEN': 's3cret'}, {'Authorization': 'Bearer s3cret'}, 200),
+    ({'METRICS_TOKEN': 's3cret'}, {'Authorization': 'Bearer wrong'}, 403),
+    ({'METRICS_TOKEN': 's3cret'}, {}, 403),
+    # No token configured: a bearer header is no way in
+    ({}, {'Authorization': 'Bearer '}, 403),
+    ({'METRICS_ALLOWED_IPS': ['10.0.0.0/8']}, {}, 200),
+    ({'METRICS_ALLOWED_IPS': ['10.1.2.4', '::1']}, {}, 403),
+])
+def test_remote_scrapers_need_a_token_or_an_allowed_address(tmp_path, settings, headers, expected):
+    client = make_app(tmp_path, **settings).test_client()
+    assert client.get('/metrics', headers=headers, environ_base=SCRAPER).status_code == expected
+
+
+def test_metrics_can_be_switched_off(tmp_path):
+    client = make_app(tmp_path, METRICS_ENABLED=False).test_client()
+    assert client.get('/metrics').status_code == 404
+
+
+def test_a_mistyped_allowed_address_stops_the_app(tmp_path):
+    with pytest.raises(ValueError):
+        make_app(tmp_path, METRICS_ALLOWED_IPS=['not an address'])
@@ -0,0 +1,158 @@
+# backend/tests/test_migrations.py
+import sqlite3
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from werkzeug.security import generate_password_hash
+
+from backend.tests.conftest import PASSWORD, make_config
+
+# The schema create_all() built before migrations existed, as shipped in the
+# first release; income and expenses still store month and year
+BASELINE_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    email VARCHAR(100) NOT NULL,
+    password VARCHAR(100) NOT NULL,
+    is_admin BOOLEAN,
+    otp VARCHAR(6),
+    otp_created_at DATETIME,
+    PRIMARY KEY (id),
+    UNIQUE (email)
+);
+CREATE TABLE feedback (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    created_at DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE TABLE categories (
+    id INTEGER NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE income (
+    id INTEGER NOT NULL,
+    amount FLOAT NOT NULL,
+    date DATE NOT NULL,
+    month VARCHAR(20) NOT NULL,
+    year INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    created_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(category_id) REFERENCES categories (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE expenses (
+    id INTEGER NOT NULL,
+    description VARCHAR(255) NOT NULL,
+    amount FLOAT NOT NULL,
+    date DATE NOT NULL,
+    month VARCHAR(20) NOT NULL,
+    year INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    created_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(category_id) REFERENCES categories (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+"""
+
+
+@pytest.fixture
+def migrated_app(tmp_path):
+    """Return a factory for an app on ``tmp_path/<name>.db``, which is left as the caller built it."""
+    from backend.app_factory import create_app
+    from backend.expense_tracker.currency import fx_rates
+
+    fx_rates.invalidate()
+    apps = []
+
+    def build(name):
+        app = create_app(make_config(tmp_path / f'{name}.db', tmp_path))
+        apps.append(app)
+        return app
+
+    yield build
+    from backend.init_db import db
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+
+
+def init_db(app):
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def current_and_head(app):
+    from backend.init_db import db
+
+    with app.app_context():
+        config = app.extensions['migrate'].migrate.get_config()
+        head = ScriptDirectory.from_config(config).get_current_head()
+        with db.engine.connect() as connection:
+            return MigrationContext.configure(connection).get_current_revision(), head
+
+
+def test_init_db_builds_a_fresh_database(migrated_app):
+    from flask_migrate import check
+
+    app = migrated_app('fresh')
+    assert 'Database initialized.' in init_db(app)
+    current, head = current_and_head(app)
+    assert current == head
+
+    # The migrated schema matches the models
+    with app.app_context():
+        check()
+
+
+def test_init_db_upgrades_a_baseline_database(tmp_path, migrated_app):
+    with sqlite3.connect(tmp_path / 'legacy.db') as connection:
+        connection.executescript(BASELINE_SCHEMA)
+        connection.execute("INSERT INTO user (id, name, email, password, is_admin) VALUES (1, 'Old', 'old@example.com', ?, 0)",
+                           (generate_password_hash(PASSWORD, method='pbkdf2:sha256'),))
+        connection.execute("INSERT INTO categories (id, name, user_id) VALUES (1, 'Food', 1)")
+        connection.execute("INSERT INTO expenses (id, description, amount, date, month, year, category_id, user_id) "
+                           "VALUES (1, 'green tea', 12.5, '2024-05-02', 'May', 2024, 1, 1)")
+        connection.execute("INSERT INTO income (id, amount, date, month, year, category_id, user_id) "
+                           "VALUES (1, 100, '2024-05-01', 'May', 2024, 1, 1)")
+    connection.close()
+
+    app = migrated_app('legacy')
+    output = init_db(app)
+    assert 'Stamped existing schema' in output
+    current, head = current_and_head(app)
+    assert current == head
+
+    from backend.init_db import db
+    with app.app_context():
+        columns = {column['name'] for column in inspect(db.engine).get_columns('expenses')}
+    assert not columns & {'month', 'year'}
+
+    client = app.test_client()
+    assert client.post('/login', json={'email': 'old@example.com', 'password': PASSWORD}).status_code == 200
+    response = client.post('/expense-tracker/expense',
+                           json={'description': 'black tea', 'amount': 7.5, 'category': 'Food', 'date': '2024-05-03'})
+    assert response.status_code == 201, response.get_json()
+
+    expenses = client.get('/expense-tracker/monthly-expenses?month=2024-05').get_json()
+    assert sorted(expense['description'] for expense in expenses) == ['black tea', 'green tea']
+    # Rows from before the search index existed are indexed too
+    results = client.get('/expense-tracker/search?q=tea').get_json()['results']
+    assert sorted(result['description'] for result in results) == ['black tea', 'green tea']
+    balance = client.get('/expense-tracker/balance?month=2024-05').get_json()
+    assert balance['total_expense'] == '20.0' and balance['income'] == '100.0'
+
+    # Running it again is a no-op
+    assert 'Stamped' not in init_db(app)
@@ -0,0 +1,95 @@
+# backend/tests/test_ratelimit.py
+from unittest import mock
+
+import pytest
+
+from backend.ratelimit import MemoryStore
+from backend.tests.conftest import PASSWORD, make_config
+
+LOGIN_LIMITS = {'auth.login_post': [('ip', 10, 3600), ('account', 3, 3600)]}
+
+
+def make_app(tmp_path, **settings):
+    from backend.app_factory import create_app
+    from backend.init_db import db
+
+    config = type('RateLimitConfig', (make_config(tmp_path / 'test.db', tmp_path),),
+                  {'RATELIMIT_ENABLED': True, 'RATE_LIMITS': LOGIN_LIMITS, **settings})
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    yield app
+    from backend.init_db import db
+    with app.app_context():
+        db.engine.dispose()
+
+
+def login(client, email, **kwargs):
+    return client.post('/login', json={'email': email, 'password': 'wrong!pw1'}, **kwargs)
+
+
+def test_memory_store_charges_every_bucket_or_none():
+    store = MemoryStore()
+    assert store.consume([('a', 1, 0.001)]) == (None, 0)
+
+    # 'b' has tokens but 'a' is empty: the request is refused and 'b' keeps its tokens
+    for _ in range(3):
+        denied, retry_after = store.consume([('b', 5, 0.001), ('a', 1, 0.001)])
+        assert denied == 1 and retry_after > 0
+    assert store._buckets['b'][0] == pytest.approx(5)
+
+    assert store.consume([('b', 5, 0.001), ('c', 1, 1)]) == (None, 0)
+    assert store._buckets['b'][0] == pytest.approx(4)
+    assert store.consume([]) == (None, 0)
+
+
+def test_memory_store_evicts_the_least_recently_used_keys():
+    store = MemoryStore(max_keys=3)
+    for key in 'abc':
+        store.consume([(key, 1, 1)])
+    store.consume([('a', 1, 1)])
+    store.consume([('d', 1, 1)])
+    assert list(store._buckets) == ['c', 'a', 'd']
+
+
+def test_limited_requests_get_429_before_any_work(app):
+    client = app.test_client()
+    client.post('/signup', json={'email': 'user@example.com', 'name': 'Test', 'password': PASSWORD})
+    with mock.patch('backend.authentication.routes.check_password_hash', return_value=False) as check:
+        statuses = [login(client, 'user@example.com').status_code for _ in range(5)]
+    assert statuses == [400, 400, 400, 429, 429]
+    assert check.call_count == 3
+
+    response = login(client, 'user@example.com')
+    assert response.status_code == 429
+    assert response.get_json() == {'message': 'Too many requests. Please try again later.'}
+    assert 1 <= int(response.headers['Retry-After']) <= 1200
+
+    # Refused attempts took nothing from the ip bucket: 3 of its 10 tokens are
+    # spent, so 7 more logins for other accounts go through, and no more
+    statuses = [login(client, f'other{i}@example.com').status_code for i in range(8)]
+    assert statuses == [400] * 7 + [429]
+
+
+def test_disabled_rate_limits_let_everything_through(tmp_path):
+    app = make_app(tmp_path, RATELIMIT_ENABLED=False)
+    client = app.test_client()
+    assert {login(client, 'user@example.com').status_code for _ in range(6)} == {400}
+    client.post('/signup', json={'email': 'user@example.com', 'name': 'Test', 'password': PASSWORD})
+    assert client.post('/login', json={'email': 'user@example.com', 'password': PASSWORD}).status_code == 200
+
+
+@pytest.mark.parametrize('proxies, expected', [(0, [400, 429, 429]), (1, [400, 400, 429])])
+def test_client_address_behind_a_proxy(tmp_path, proxies, expected):
+    app = make_app(tmp_path, PROXY_FIX_X_FOR=proxies, RATE_LIMITS={'auth.login_post': [('ip', 1, 3600)]})
+    client = app.test_client()
+    # Without PROXY_FIX_X_FOR every client shares the proxy's address
+    statuses = [login(client, 'user@example.com', headers={'X-Forwarded-For': address}).status_code
+                for address in ('203.0.113.1', '203.0.113.2', '203.0.113.1')]
+    assert statuses == expected
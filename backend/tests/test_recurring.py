@@ -0,0 +1,75 @@
+# backend/tests/test_recurring.py
+from datetime import date
+
+from sqlalchemy import text
+
+from backend.expense_tracker.recurring import materialize_due_rules
+
+E = '/expense-tracker'
+
+
+def add_rule(client, **rule):
+    response = client.post(f'{E}/recurring', json=rule)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['id']
+
+
+def test_due_occurrences_are_materialized_once(app, client):
+    add_rule(client, type='expense', amount=50, category='Netflix', start_date='2024-01-31')
+    add_rule(client, type='income', amount=1000, category='Salary', start_date='2024-01-01',
+             frequency='weekly', interval=2, end_date='2024-03-01')
+
+    with app.app_context():
+        stats = materialize_due_rules(date(2024, 4, 15), batch_size=1)
+        assert (stats['rules'], stats['income'], stats['expenses'], stats['batches']) == (2, 5, 3, 2)
+        # Everything due is already there
+        assert materialize_due_rules(date(2024, 4, 15))['rules'] == 0
+
+    # Month-end occurrences are clamped to shorter months
+    expenses = client.get(f'{E}/monthly-expenses?month=2024-02').get_json()
+    assert [(expense['date'], expense['description']) for expense in expenses] == [('2024-02-29', 'Netflix')]
+    income = client.get(f'{E}/monthly-income?month=2024-02').get_json()
+    assert [row['date'] for row in income] == ['2024-02-12', '2024-02-26']
+
+    rules = {rule['type']: rule for rule in client.get(f'{E}/recurring').get_json()}
+    assert rules['expense']['next_run'] == '2024-04-30' and rules['expense']['active']
+    # Past its end date, so the rule retires
+    assert rules['income']['next_run'] is None and not rules['income']['active']
+
+
+def test_missed_periods_are_caught_up(app, client):
+    add_rule(client, type='expense', amount=5, category='Rent', start_date='2026-01-01')
+    revision = client.get(f'{E}/sync?since=0').get_json()['revision']
+
+    with app.app_context():
+        assert materialize_due_rules(date(2026, 3, 1))['expenses'] == 3
+        assert materialize_due_rules(date(2026, 4, 1))['expenses'] == 1
+
+    changes = client.get(f'{E}/sync?since={revision}').get_json()['changes']
+    assert sorted(change['data']['date'] for change in changes) == [
+        '2026-01-01', '2026-02-01', '2026-03-01', '2026-04-01']
+
+
+def test_rule_without_a_rate_is_skipped(app, client, login, load_rates):
+    load_rates([('2024-12-01', 'INR', 80), ('2024-12-01', 'EUR', 0.9)])
+    add_rule(client, type='expense', amount=5, category='Gym', start_date='2024-12-02', currency='EUR')
+    add_rule(login('other@example.com'), type='expense', amount=5, category='Gym', start_date='2024-12-02')
+
+    # Rates are checked when a rule is added, so this is a rule stored before that
+    with app.app_context():
+        from backend.init_db import db
+        db.session.execute(text("UPDATE recurring_rules SET currency = 'JPY' WHERE id = 1"))
+        db.session.commit()
+
+        stats = materialize_due_rules(date(2024, 12, 20), batch_size=1)
+        assert (stats['missing_rate'], stats['expenses']) == (1, 1)
+
+    result = app.test_cli_runner().invoke(args=['materialize-recurring', '--date', '2024-12-20'])
+    assert '1 skipped for missing FX rates' in result.output
+    assert client.get(f'{E}/monthly-expenses?month=2024-12').get_json() == []
+
+    # Once the rate is loaded the rule catches up
+    load_rates([('2024-12-01', 'JPY', 150)])
+    with app.app_context():
+        assert materialize_due_rules(date(2024, 12, 20))['expenses'] == 1
+    assert len(client.get(f'{E}/monthly-expenses?month=2024-12').get_json()) == 1
@@ -0,0 +1,184 @@
+# backend/tests/test_sharding.py
+from unittest import mock
+
+import pytest
+import sqlalchemy as sa
+
+from backend.tests.conftest import make_config
+
+E = '/expense-tracker'
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app with two SQLite shards next to the default database."""
+    from backend.app_factory import create_app
+    from backend.expense_tracker.currency import fx_rates
+    from backend.init_db import db
+    from backend.sharding import create_shard_schemas
+
+    class ShardedConfig(make_config(tmp_path / 'test.db', tmp_path)):
+        SHARDS = {'s1': f'sqlite:///{tmp_path / "s1.db"}', 's2': f'sqlite:///{tmp_path / "s2.db"}'}
+
+    fx_rates.invalidate()
+    app = create_app(ShardedConfig)
+    with app.app_context():
+        db.create_all()
+        create_shard_schemas()
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    # init_app registered a metadata per bind on the shared db, which later
+    # apps without these binds would try to create
+    for shard in ShardedConfig.SHARDS:
+        db.metadatas.pop(shard, None)
+
+
+@pytest.fixture
+def users(login):
+    """Users 1 and 2, placed on s1 and s2, each with a month of data."""
+    clients = [login(f'user{i}@example.com') for i in (1, 2)]
+    for client, prefix in zip(clients, ('rent', 'tea')):
+        for day in range(1, 4):
+            response = client.post(f'{E}/expense', json={'description': f'{prefix} {day}', 'amount': day,
+                                                         'category': 'Food' if day % 2 else 'Home',
+                                                         'date': f'2026-03-0{day}'})
+            assert response.status_code == 201
+        assert client.post(f'{E}/income', json={'amount': 100, 'category': 'Salary',
+                                                'date': '2026-03-01'}).status_code == 201
+        assert client.post(f'{E}/budgets', json={'category': 'Food', 'limit': 50}).status_code == 200
+    return clients
+
+
+def user_rows(app, shard, table_name, user_id=2):
+    from backend.init_db import db
+    from backend.sharding import shard_engine
+
+    with app.app_context():
+        table = db.metadata.tables[table_name]
+        with shard_engine(shard).connect() as connection:
+            return [dict(row._mapping) for row in
+                    connection.execute(sa.select(table).where(table.c.user_id == user_id).order_by(*table.primary_key))]
+
+
+def move(app, user_id, target):
+    from backend.sharding import move_user, shard_for
+
+    with app.app_context():
+        copied = move_user(user_id, target)
+        return copied, shard_for(user_id)
+
+
+def test_new_users_are_spread_over_the_shards(app, users):
+    from backend.sharding import shard_for
+
+    with app.app_context():
+        assert [shard_for(user_id) for user_id in (1, 2)] == ['s1', 's2']
+    assert len(user_rows(app, 's2', 'expenses')) == 3 and not user_rows(app, 's1', 'expenses')
+
+
+def test_move_copies_rows_and_remaps_ids(app, users):
+    client = users[1]
+    assert client.delete(f'{E}/expense/2').status_code == 200
+    before = {path: client.get(f'{E}/{path}').get_json() for path in (
+        'monthly-expenses?month=2026-03', 'monthly-income?month=2026-03', 'balance?month=2026-03',
+        'budgets?month=2026-03', 'categories')}
+    old_expenses = user_rows(app, 's2', 'expenses')
+
+    copied, shard = move(app, 2, 's1')
+    assert shard == 's1' and copied > 0
+    assert not user_rows(app, 's2', 'expenses') and not user_rows(app, 's2', 'categories')
+
+    # s1 already numbered user 1's rows, so the copies get new ids
+    categories = {row['id']: row['name'] for row in user_rows(app, 's1', 'categories')}
+    user1_categories = {row['id'] for row in user_rows(app, 's1', 'categories', user_id=1)}
+    assert sorted(categories.values()) == ['Food', 'Home', 'Salary'] and not categories.keys() & user1_categories
+    new_expenses = user_rows(app, 's1', 'expenses')
+    assert ([(row['description'], row['amount'], row['deleted_at'] is None) for row in new_expenses]
+            == [(row['description'], row['amount'], row['deleted_at'] is None) for row in old_expenses])
+    old_categories = {row['description']: row['category_id'] for row in old_expenses}
+    assert {row['description']: categories[row['category_id']] for row in new_expenses} == {
+        'tea 1': 'Food', 'tea 2': 'Home', 'tea 3': 'Food'}
+    assert len(set(old_categories.values())) == 2
+    for table in ('income', 'budgets', 'category_month_totals'):
+        assert all(row['category_id'] in categories for row in user_rows(app, 's1', table)), table
+
+    after = {path: client.get(f'{E}/{path}').get_json() for path in before}
+    # Ids changed; everything else reads the same
+    for path in ('categories', 'budgets?month=2026-03'):
+        for row in before[path] + after[path]:
+            row.pop('id')
+    assert after == before
+    results = client.get(f'{E}/search?q=tea').get_json()['results']
+    assert sorted(result['description'] for result in results) == ['tea 1', 'tea 3']
+    # The other user on s1 is untouched
+    assert len(users[0].get(f'{E}/monthly-expenses?month=2026-03').get_json()) == 3
+
+
+def test_sync_sees_old_ids_deleted_and_copies_created(app, users):
+    client = users[1]
+    revision = client.get(f'{E}/sync?since=0').get_json()['revision']
+    old_ids = {row['id'] for row in user_rows(app, 's2', 'expenses')}
+
+    move(app, 2, 's1')
+    new_ids = {row['id'] for row in user_rows(app, 's1', 'expenses')}
+    changes = client.get(f'{E}/sync?since={revision}').get_json()
+    expenses = [change for change in changes['changes'] if change['type'] == 'expense']
+    deletes = {change['id'] for change in expenses if change['op'] == 'delete'}
+    upserts = {change['id'] for change in expenses if change['op'] == 'upsert'}
+    assert deletes == old_ids and upserts == new_ids
+    assert {change['revision'] for change in expenses if change['op'] == 'delete'} == {revision + 1}
+    assert {change['revision'] for change in expenses if change['op'] == 'upsert'} == {revision + 2}
+    assert changes['revision'] == revision + 2
+
+    # New writes carry on from the copied counter
+    assert client.post(f'{E}/expense', json={'description': 'later', 'amount': 1, 'category': 'Food',
+                                             'date': '2026-03-09'}).status_code == 201
+    later = client.get(f'{E}/sync?since={revision + 2}').get_json()['changes']
+    assert [(change['op'], change['revision']) for change in later] == [('upsert', revision + 3)]
+
+
+def test_writes_are_refused_while_moving(app, users):
+    from backend.sharding import _set_shard
+
+    client = users[1]
+    with app.app_context():
+        _set_shard(2, 's2', moving=True)
+    response = client.post(f'{E}/expense', json={'description': 'x', 'amount': 1, 'category': 'Food',
+                                                 'date': '2026-03-04'})
+    assert response.status_code == 503 and response.headers['Retry-After'] == '5'
+    assert client.delete(f'{E}/expense/1').status_code == 503
+    # Reads keep working from the source shard
+    assert len(client.get(f'{E}/monthly-expenses?month=2026-03').get_json()) == 3
+    # Other users are not affected
+    assert users[0].post(f'{E}/expense', json={'description': 'x', 'amount': 1, 'category': 'Food',
+                                               'date': '2026-03-04'}).status_code == 201
+
+    # A request that got past the hook before the move began is fenced at its write
+    with app.app_context():
+        _set_shard(2, 's2', moving=False)
+    with mock.patch('backend.sharding.lookup_shard', return_value=('s2', True)):
+        response = client.post(f'{E}/income', json={'amount': 1, 'category': 'Salary', 'date': '2026-03-04'})
+    assert response.status_code == 503
+    assert len(client.get(f'{E}/monthly-income?month=2026-03').get_json()) == 1
+
+
+def test_failed_copy_leaves_the_user_on_the_source(app, users):
+    from backend.sharding import lookup_shard, move_user, shard_engine
+
+    client = users[1]
+    with app.app_context():
+        # Audit events are copied last, after every other table
+        with shard_engine('s1').begin() as connection:
+            connection.execute(sa.text('DROP TABLE audit_events'))
+        with pytest.raises(sa.exc.OperationalError):
+            move_user(2, 's1')
+        assert lookup_shard(2) == ('s2', False)
+
+    assert len(user_rows(app, 's2', 'expenses')) == 3
+    # The partial copy was rolled back
+    assert not user_rows(app, 's1', 'expenses') and not user_rows(app, 's1', 'categories')
+    assert client.post(f'{E}/expense', json={'description': 'x', 'amount': 1, 'category': 'Food',
+                                             'date': '2026-03-04'}).status_code == 201
+    assert len(client.get(f'{E}/monthly-expenses?month=2026-03').get_json()) == 4
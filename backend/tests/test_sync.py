@@ -0,0 +1,71 @@
+# backend/tests/test_sync.py
+E = '/expense-tracker'
+
+
+def add_expense(client, description, amount, day):
+    response = client.post(f'{E}/expense', json={'description': description, 'amount': amount,
+                                                 'category': 'Food', 'date': day})
+    assert response.status_code == 201, response.get_json()
+
+
+def read_pages(client, url, limit):
+    """Follow ``next_cursor`` from ``url``; returns the changes and the final revision."""
+    changes = []
+    page = client.get(f'{url}&limit={limit}').get_json()
+    while True:
+        changes += page['changes']
+        if page['next_cursor'] is None:
+            return changes, page['revision']
+        # Only the last page carries a revision to resume from
+        assert 'revision' not in page
+        page = client.get(f"{E}/sync?cursor={page['next_cursor']}&limit={limit}").get_json()
+
+
+def test_full_sync_and_pages_agree(client):
+    for day in range(1, 6):
+        add_expense(client, f'tea {day}', day, f'2026-03-0{day}')
+    assert client.post(f'{E}/income', json={'amount': 100, 'category': 'Salary', 'date': '2026-03-01'}).status_code == 201
+
+    full = client.get(f'{E}/sync?since=0').get_json()
+    assert full['next_cursor'] is None
+    assert [(change['type'], change['id']) for change in full['changes']] == [
+        ('category', 1), ('expense', 1), ('expense', 2), ('expense', 3), ('expense', 4), ('expense', 5),
+        ('category', 2), ('income', 1)]
+    revisions = [change['revision'] for change in full['changes']]
+    assert revisions == sorted(revisions) and full['revision'] == revisions[-1]
+
+    for limit in (1, 3, 8):
+        assert read_pages(client, f'{E}/sync?since=0', limit) == (full['changes'], full['revision'])
+
+
+def test_incremental_sync_reports_updates_and_deletes(client):
+    for day in range(1, 4):
+        add_expense(client, f'tea {day}', day, f'2026-03-0{day}')
+    revision = client.get(f'{E}/sync?since=0').get_json()['revision']
+
+    assert client.put(f'{E}/expense/1', json={'description': 'coffee', 'amount': 9, 'category': 'Food',
+                                              'date': '2026-03-01'}).status_code == 200
+    assert client.delete(f'{E}/expense/2').status_code == 200
+    changes = client.get(f'{E}/sync?since={revision}').get_json()
+    assert [(change['op'], change['id']) for change in changes['changes']] == [('upsert', 1), ('delete', 2)]
+    assert changes['changes'][0]['data']['description'] == 'coffee'
+    revision = changes['revision']
+
+    assert client.get(f'{E}/sync?since={revision}').get_json() == {'changes': [], 'next_cursor': None,
+                                                                     'revision': revision}
+
+    # A reset deletes the month in one revision, which still pages cleanly
+    assert client.post(f'{E}/reset_expenses', json={'month': '2026-03'}).status_code == 200
+    changes, last = read_pages(client, f'{E}/sync?since={revision}', 1)
+    assert sorted((change['op'], change['id']) for change in changes) == [('delete', 1), ('delete', 3)]
+    assert {change['revision'] for change in changes} == {last}
+
+
+def test_sync_is_per_user_and_validates_input(client, login):
+    add_expense(client, 'tea', 1, '2026-03-01')
+
+    other = login('other@example.com')
+    assert other.get(f'{E}/sync').get_json()['changes'] == []
+
+    assert client.get(f'{E}/sync?cursor=nonsense').status_code == 400
+    assert client.get(f'{E}/sync?limit=0').status_code == 400